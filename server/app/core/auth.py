@@ -6,7 +6,7 @@ from datetime import datetime, timedelta
 from typing import Optional
 import uuid
 from app.core.config import settings
-from app.database.connection import get_supabase_admin
+from app.database.dataloader import DataLoader, get_loader
 
 security = HTTPBearer()
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -76,7 +76,10 @@ class AuthService:
 
 auth_service = AuthService()
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    loader: DataLoader = Depends(get_loader)
+):
     """Get current authenticated user"""
     
     token = credentials.credentials
@@ -91,18 +94,16 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
                 detail="Invalid authentication credentials"
             )
         
-        # Get user from database
-        supabase_admin = get_supabase_admin()
-        
+        # Get user from database; the request's loader keeps the row for handlers that need it
         # Try students table first
-        student_result = supabase_admin.table("students").select("*").eq("id", user_id).execute()
-        if student_result.data:
-            return {"user_id": student_result.data[0]["id"], "user_type": "student"}
+        student = await loader.load("students", user_id)
+        if student:
+            return {"user_id": student["id"], "user_type": "student"}
         
         # Try teachers table
-        teacher_result = supabase_admin.table("teachers").select("*").eq("id", user_id).execute()
-        if teacher_result.data:
-            return {"user_id": teacher_result.data[0]["id"], "user_type": "teacher"}
+        teacher = await loader.load("teachers", user_id)
+        if teacher:
+            return {"user_id": teacher["id"], "user_type": "teacher"}
         
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -1,6 +1,7 @@
 # app/core/config.py
 from pydantic_settings import BaseSettings
 from pathlib import Path
+from typing import Optional
 
 class Settings(BaseSettings):
     SUPABASE_URL: str
@@ -15,6 +16,80 @@ class Settings(BaseSettings):
     HOST: str = "0.0.0.0"
     PORT: int = 8000
     DEBUG: bool = True
+    # OCR
+    TESSERACT_CMD: Optional[str] = None
+    TESSERACT_CONFIG: str = ""  # Extra command-line options passed to Tesseract
+    OCR_WORKERS: int = 2  # Tesseract worker processes
+    OCR_MAX_QUEUE_DEPTH: int = 32  # Jobs allowed to wait for a worker before rejecting
+    OCR_JOB_TIMEOUT_SECONDS: int = 120
+    OCR_MAX_PAGES_PER_UPLOAD: int = 4  # Pages of one PDF OCR'd concurrently
+    OCR_PDF_DPI: int = 200
+    OCR_MIN_TEXT_LAYER_CHARS: int = 20  # Pages with less embedded text than this are OCR'd
+    OCR_CACHE_ENABLED: bool = True
+    OCR_CACHE_DIR: str = "cache/ocr/"
+    OCR_CACHE_MAX_MB: int = 256
+    OCR_MEMORY_LIMIT_MB: int = 1024  # Estimated page memory across all in-flight OCR jobs (0 = unlimited)
+    # AI grading
+    EMBEDDING_MODEL_NAME: str = "all-MiniLM-L6-v2"
+    EMBEDDING_BACKEND: str = "torch"  # torch or onnx
+    EMBEDDING_ONNX_DIR: str = "models/all-MiniLM-L6-v2-onnx/"
+    EMBEDDING_ONNX_QUANTIZED: bool = True  # Use the int8 dynamically quantized export
+    EMBEDDING_ONNX_THREADS: int = 0  # onnxruntime intra-op threads (0 = all cores)
+    EMBEDDING_WARMUP_ON_STARTUP: bool = True
+    EMBEDDING_MAX_BATCH_SIZE: int = 64  # Texts per batched forward pass
+    EMBEDDING_MAX_WAIT_MS: float = 5  # How long a request waits for others to share its batch
+    EMBEDDING_STORAGE_DTYPE: str = "float16"  # float16 or float32 for persisted model-answer embeddings
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_PATH: str = "cache/embeddings.sqlite3"
+    EMBEDDING_CACHE_MEMORY_ITEMS: int = 50000  # In-memory LRU entries (~1.5 KB each for 384-d vectors)
+    EMBEDDING_CACHE_DISK_MAX_MB: int = 512
+    EMBEDDING_CACHE_LOWERCASE: bool = True  # Safe for uncased models such as all-MiniLM-L6-v2
+    KEYWORD_MATCH_WORD_BOUNDARY: bool = False  # Only count keywords that are whole words
+    KEYWORD_MATCH_STEMMING: bool = False  # Compare stemmed words, e.g. "cells" matches "cell"
+    # Background jobs (run `python -m app.worker`)
+    JOB_QUEUE_PATH: str = "data/jobs.sqlite3"
+    JOB_WORKER_PROCESSES: int = 1
+    JOB_WORKER_CONCURRENCY: int = 8  # Jobs each worker process runs at once (uploads in flight across pipeline stages)
+    JOB_LEASE_SECONDS: int = 300  # Renewed while a job runs; an expired lease makes the job claimable again
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_RETRY_BACKOFF_SECONDS: int = 30  # Doubled after each failed attempt
+    JOB_POLL_INTERVAL_SECONDS: float = 1.0
+    JOB_RETENTION_HOURS: int = 72  # Finished jobs are purged after this long
+    JOB_PRIORITY_PROCESS_UPLOAD: int = 10
+    JOB_PRIORITY_GRADE_UPLOAD: int = 5
+    JOB_PRIORITY_GRADE_EXAM: int = 0
+    JOB_WORKER_STATS_SECONDS: int = 15  # How often workers publish their metrics for /metrics
+    # Upload pipeline stages (workers per stage in each worker process)
+    PIPELINE_OCR_WORKERS: int = 2
+    PIPELINE_SEGMENT_WORKERS: int = 2
+    PIPELINE_EMBED_WORKERS: int = 1
+    PIPELINE_SCORE_WORKERS: int = 1
+    PIPELINE_PERSIST_WORKERS: int = 2
+    PIPELINE_QUEUE_SIZE: int = 8  # Uploads waiting between two stages before the earlier stage blocks
+    PIPELINE_EMBED_MAX_UPLOADS: int = 16  # Uploads embedded together in one model call
+    PIPELINE_PERSIST_MAX_UPLOADS: int = 8  # Uploads whose rows are written with one insert per table
+    # Data backend
+    DATA_BACKEND: str = "supabase"  # "supabase", or "sql" for a local database (offline load testing)
+    DATABASE_URL: str = "sqlite+aiosqlite:///data/autograder.sqlite3"  # Used when DATA_BACKEND=sql; postgresql+asyncpg://... also works
+    DATABASE_CREATE_SCHEMA: bool = True  # Create missing tables on first use of the SQL backend
+    # Exam, question and subject metadata
+    METADATA_CACHE_TTL_SECONDS: float = 300  # 0 disables caching
+    METADATA_CACHE_MAX_ITEMS: int = 10000
+    METADATA_INVALIDATION_LOG_PATH: Optional[str] = "data/metadata_invalidations.sqlite3"  # Shared by API and workers on one host; empty for in-process only
+    METADATA_INVALIDATION_POLL_SECONDS: float = 1.0
+    # Database access
+    DB_THREAD_POOL_SIZE: int = 16  # Threads running blocking supabase calls; caps concurrent DB requests
+    DB_HTTP_MAX_CONNECTIONS: int = 64  # Shared by every supabase client
+    DB_HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 32
+    DB_HTTP_KEEPALIVE_EXPIRY_SECONDS: float = 30.0
+    DB_HTTP_TIMEOUT_SECONDS: float = 120.0
+    DB_USER_CLIENT_POOL_SIZE: int = 256  # Per-user clients kept, keyed by token hash
+    DB_USER_CLIENT_MAX_TTL_SECONDS: int = 3600  # Cap for tokens whose expiry cannot be read
+    DATALOADER_MAX_BATCH: int = 100  # Values per batched `in` lookup
+    # Database writes
+    DB_WRITE_CHUNK_SIZE: int = 500  # Rows per multi-row insert/upsert request
+    DB_WRITE_MAX_RETRIES: int = 3
+    DB_WRITE_RETRY_BACKOFF_SECONDS: float = 0.5  # Doubled after each retry
     class Config:
         env_file = str(Path(__file__).resolve().parents[2] / ".env")  # Make sure this points to your .env file
         extra = "ignore" 
@@ -0,0 +1,66 @@
+# app/database/async_db.py
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from typing import Any, Callable, Dict
+import asyncio
+import time
+from app.core.config import settings
+
+
+class AsyncDB:
+    """Runs blocking supabase calls on a bounded pool of DB threads
+
+    The supabase client is synchronous, so calling .execute() inside a
+    handler stalls the event loop for the whole PostgREST round-trip. Queries
+    are built as usual and handed to execute(), which waits on a DB thread
+    instead; concurrent requests overlap their DB latency while the pool size
+    caps how many requests are in flight against the database at once.
+    """
+
+    def __init__(self, max_workers: int = None):
+        self.max_workers = max_workers or settings.DB_THREAD_POOL_SIZE
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="db")
+        self._latencies = deque(maxlen=1000)
+        self._stats = {"calls": 0, "errors": 0, "in_flight": 0, "max_in_flight": 0, "wait_seconds": 0.0}
+
+    async def execute(self, query: Any) -> Any:
+        """Execute a built query (anything with .execute()) without blocking the event loop"""
+        return await self.run(query.execute)
+
+    async def run(self, fn: Callable[..., Any], *args) -> Any:
+        """Run any other blocking client call (auth, storage, rpc) on a DB thread"""
+        loop = asyncio.get_running_loop()
+        submitted_at = time.perf_counter()
+        self._stats["calls"] += 1
+        self._stats["in_flight"] += 1
+        self._stats["max_in_flight"] = max(self._stats["max_in_flight"], self._stats["in_flight"])
+        try:
+            return await loop.run_in_executor(self._executor, self._timed, fn, args, submitted_at)
+        except Exception:
+            self._stats["errors"] += 1
+            raise
+        finally:
+            self._stats["in_flight"] -= 1
+            self._latencies.append(time.perf_counter() - submitted_at)
+
+    def _timed(self, fn: Callable[..., Any], args: tuple, submitted_at: float) -> Any:
+        # Time spent queued behind other calls, i.e. how saturated the pool is
+        self._stats["wait_seconds"] += time.perf_counter() - submitted_at
+        return fn(*args)
+
+    def stats(self) -> Dict[str, Any]:
+        """Call counts, pool saturation and round-trip latency"""
+        latencies = sorted(self._latencies)
+        return {
+            "max_workers": self.max_workers,
+            **self._stats,
+            "wait_seconds": round(self._stats["wait_seconds"], 3),
+            "latency_ms_p50": round(latencies[len(latencies) // 2] * 1000, 1) if latencies else None,
+            "latency_ms_p95": round(latencies[int(len(latencies) * 0.95)] * 1000, 1) if latencies else None,
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+db = AsyncDB()
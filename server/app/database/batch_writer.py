@@ -0,0 +1,121 @@
+# app/database/batch_writer.py
+from typing import Any, Callable, Dict, List, Optional
+import asyncio
+import httpx
+from postgrest.exceptions import APIError
+from supabase import Client
+from app.core.config import settings
+from app.database.async_db import db
+from app.database.connection import get_supabase_admin
+from app.utils.exceptions import DatabaseError
+
+# SQLSTATE classes that will fail the same way on every retry:
+# data exceptions, integrity violations, syntax/undefined objects
+PERMANENT_SQLSTATE_CLASSES = ("22", "23", "42")
+
+# Transport errors raised before the request was sent: nothing can have been written
+UNSENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+class BatchWriter:
+    """Multi-row inserts and upserts with retries
+
+    Rows are written in chunks of chunk_size, one request each. A chunk that
+    keeps failing is split in half and each half retried, so one bad row only
+    costs its own write; rows that still fail are reported in a DatabaseError
+    after everything else has been written.
+
+    A plain insert is only replayed when the request can't have been applied:
+    the server rejected it (APIError) or it never left this process. After a
+    read timeout or dropped connection the rows may already be stored, so the
+    chunk is reported as failed rather than written twice. Upserts are
+    idempotent and are retried after any transport error.
+    """
+
+    def __init__(
+        self,
+        client_factory: Callable[[], Client] = None,
+        chunk_size: int = None,
+        max_retries: int = None,
+        retry_backoff: float = None
+    ):
+        self.client_factory = client_factory or get_supabase_admin
+        self.chunk_size = chunk_size or settings.DB_WRITE_CHUNK_SIZE
+        self.max_retries = max_retries if max_retries is not None else settings.DB_WRITE_MAX_RETRIES
+        self.retry_backoff = retry_backoff if retry_backoff is not None else settings.DB_WRITE_RETRY_BACKOFF_SECONDS
+        self._stats = {"rows": 0, "requests": 0, "retries": 0, "splits": 0, "failed_rows": 0}
+
+    async def insert(self, table: str, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Insert rows; returns the stored rows in input order"""
+        return await self._write(table, rows, None)
+
+    async def upsert(self, table: str, rows: List[Dict[str, Any]], on_conflict: str) -> List[Dict[str, Any]]:
+        """Insert or update rows on the on_conflict columns; returns the stored rows in input order"""
+        return await self._write(table, rows, on_conflict)
+
+    async def _write(self, table: str, rows: List[Dict[str, Any]], on_conflict: Optional[str]) -> List[Dict[str, Any]]:
+        written: List[Dict[str, Any]] = []
+        failed: List[Dict[str, Any]] = []
+        errors: List[str] = []
+        for start in range(0, len(rows), self.chunk_size):
+            await self._write_chunk(table, rows[start:start + self.chunk_size], on_conflict, written, failed, errors)
+
+        if failed:
+            self._stats["failed_rows"] += len(failed)
+            raise DatabaseError(
+                f"Failed to write {len(failed)} of {len(rows)} rows to {table}: {errors[-1]}"
+            )
+        return written
+
+    async def _write_chunk(self, table, chunk, on_conflict, written, failed, errors):
+        error = None
+        for attempt in range(self.max_retries + 1):
+            try:
+                query = self.client_factory().table(table)
+                query = query.upsert(chunk, on_conflict=on_conflict) if on_conflict else query.insert(chunk)
+                self._stats["requests"] += 1
+                result = await db.execute(query)
+                written.extend(result.data or [])
+                self._stats["rows"] += len(chunk)
+                return
+            except Exception as e:
+                error = e
+                if not self._is_transient(e, on_conflict is not None) or attempt == self.max_retries:
+                    break
+                self._stats["retries"] += 1
+                await asyncio.sleep(self.retry_backoff * 2 ** attempt)
+
+        # Splitting would rewrite rows the server may already hold
+        if len(chunk) == 1 or (on_conflict is None and self._may_have_written(error)):
+            failed.extend(chunk)
+            errors.append(str(error))
+            return
+
+        # Halve the chunk to isolate the rows that keep failing
+        self._stats["splits"] += 1
+        middle = len(chunk) // 2
+        await self._write_chunk(table, chunk[:middle], on_conflict, written, failed, errors)
+        await self._write_chunk(table, chunk[middle:], on_conflict, written, failed, errors)
+
+    @staticmethod
+    def _is_transient(error: Exception, idempotent: bool) -> bool:
+        if isinstance(error, APIError):
+            return not str(error.code or "").startswith(PERMANENT_SQLSTATE_CLASSES)
+        if isinstance(error, UNSENT_ERRORS):
+            return True
+        return idempotent and isinstance(error, httpx.TransportError)
+
+    @staticmethod
+    def _may_have_written(error: Exception) -> bool:
+        """Whether the failed request may still have been committed"""
+        return not isinstance(error, (APIError,) + UNSENT_ERRORS)
+
+    def stats(self) -> Dict[str, Any]:
+        """Rows written, requests made and retry/split counts"""
+        return {
+            **self._stats,
+            "rows_per_request": round(self._stats["rows"] / self._stats["requests"], 2) if self._stats["requests"] else 0.0,
+        }
+
+
+batch_writer = BatchWriter()
@@ -1,42 +1,136 @@
-from supabase import create_client, Client
+from supabase import create_client, Client, ClientOptions
 from app.core.config import settings
-from typing import Optional
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from jose import jwt
+import hashlib
+import httpx
+import threading
+import time
 
 class SupabaseManager:
     def __init__(self):
         self.url = settings.SUPABASE_URL
         self.anon_key = settings.SUPABASE_ANON_KEY
         self.service_role_key = settings.SUPABASE_SERVICE_ROLE_KEY
+        self.max_user_clients = settings.DB_USER_CLIENT_POOL_SIZE
         self._client: Optional[Client] = None
         self._service_client: Optional[Client] = None
+        self._http_client: Optional[httpx.Client] = None
+        # token hash -> (client, expires_at), least recently used first
+        self._user_clients: "OrderedDict[str, Tuple[Client, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "evicted": 0}
+
+    @property
+    def http_client(self) -> httpx.Client:
+        """One keep-alive connection pool shared by every client the manager hands out"""
+        if self._http_client is None:
+            self._http_client = httpx.Client(
+                timeout=settings.DB_HTTP_TIMEOUT_SECONDS,
+                limits=httpx.Limits(
+                    max_connections=settings.DB_HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.DB_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=settings.DB_HTTP_KEEPALIVE_EXPIRY_SECONDS
+                ),
+                follow_redirects=True
+            )
+        return self._http_client
 
     @property
     def client(self) -> Client:
         """Get Supabase client with anon key"""
         if self._client is None:
-            self._client = create_client(self.url, self.anon_key)
+            self._client = create_client(self.url, self.anon_key, self._options())
         return self._client
 
     @property
     def service_client(self) -> Client:
         """Get Supabase client with service role key for admin operations"""
         if self._service_client is None:
-            self._service_client = create_client(self.url, self.service_role_key)
+            self._service_client = create_client(self.url, self.service_role_key, self._options())
         return self._service_client
 
     def get_user_client(self, access_token: str, refresh_token: str = None) -> Client:
-        """Get Supabase client with user's session tokens"""
+        """Get Supabase client acting as the token's user, reused until the token expires"""
         if not access_token:
             raise ValueError("Access token is required")
-    
-        client = create_client(self.url, self.anon_key)
-    
-        # Use set_session with proper tokens
-        client.auth.set_session(access_token, refresh_token or "")
-    
+
+        key = hashlib.sha256(access_token.encode()).hexdigest()
+        now = time.time()
+        with self._lock:
+            cached = self._user_clients.get(key)
+            if cached is not None:
+                client, expires_at = cached
+                if expires_at > now:
+                    self._user_clients.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return client
+                del self._user_clients[key]
+                self._stats["expired"] += 1
+            self._stats["misses"] += 1
+
+        # The token goes straight into the request headers: no auth round-trip to set up a session
+        client = create_client(self.url, self.anon_key, self._options(access_token))
+        expires_at = self._token_expiry(access_token, now)
+        if expires_at <= now:
+            # Already expired; PostgREST will reject it, and it is not worth a pool slot
+            return client
+
+        with self._lock:
+            self._user_clients[key] = (client, expires_at)
+            self._user_clients.move_to_end(key)
+            self._evict(now)
         return client
-    
-        
+
+    def _options(self, access_token: str = None) -> ClientOptions:
+        headers = {"Authorization": f"Bearer {access_token}"} if access_token else {}
+        return ClientOptions(
+            headers=headers,
+            auto_refresh_token=False,
+            persist_session=False,
+            httpx_client=self.http_client
+        )
+
+    def _evict(self, now: float):
+        # Drop expired entries first, then the least recently used ones over capacity
+        for key in [key for key, (_, expires_at) in self._user_clients.items() if expires_at <= now]:
+            del self._user_clients[key]
+            self._stats["expired"] += 1
+        while len(self._user_clients) > self.max_user_clients:
+            self._user_clients.popitem(last=False)
+            self._stats["evicted"] += 1
+
+    @staticmethod
+    def _token_expiry(access_token: str, now: float) -> float:
+        """The token's own exp claim, capped at DB_USER_CLIENT_MAX_TTL_SECONDS from now"""
+        latest = now + settings.DB_USER_CLIENT_MAX_TTL_SECONDS
+        try:
+            exp = jwt.get_unverified_claims(access_token).get("exp")
+        except Exception:
+            return latest
+        return min(float(exp), latest) if exp else latest
+
+    def stats(self) -> Dict[str, Any]:
+        """User client pool hits, misses and evictions"""
+        lookups = self._stats["hits"] + self._stats["misses"]
+        return {
+            **self._stats,
+            "size": len(self._user_clients),
+            "max_size": self.max_user_clients,
+            "hit_ratio": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+        }
+
+    def close(self):
+        with self._lock:
+            self._user_clients.clear()
+        if self._http_client is not None:
+            self._http_client.close()
+            self._http_client = None
+            self._client = None
+            self._service_client = None
+
+
 supabase_manager = SupabaseManager()
 
 def get_supabase() -> Client:
@@ -49,4 +143,4 @@ def get_supabase_admin() -> Client:
 
 def get_user_supabase(access_token: str) -> Client:
     """Get Supabase client with user's access token using the manager"""
-    return supabase_manager.get_user_client(access_token)
\ No newline at end of file
+    return supabase_manager.get_user_client(access_token)
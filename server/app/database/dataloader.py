@@ -0,0 +1,121 @@
+# app/database/dataloader.py
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+import asyncio
+from app.core.config import settings
+from app.repositories.base import Repository, get_repository
+
+# Lookups and queries across every loader since startup, for /metrics
+_totals = {"loaders": 0, "loads": 0, "cache_hits": 0, "queries": 0, "rows": 0}
+
+
+class DataLoader:
+    """Request- or job-scoped row loader that coalesces and batches lookups
+
+    Lookups of the same (table, column, value) share one fetch, and every
+    lookup made in the same event loop tick against a table and column is sent
+    to the repository as a single get_rows call, so it works on either
+    backend. Rows are remembered for the loader's lifetime, so
+    a loader belongs to one request or job; call clear() after writing rows
+    that may be read again.
+    """
+
+    def __init__(self, repository: Repository = None, max_batch: int = None):
+        self._repository = repository
+        self.max_batch = max_batch or settings.DATALOADER_MAX_BATCH
+        self._rows: Dict[Tuple[str, str, Any], asyncio.Future] = {}
+        self._pending: Dict[Tuple[str, str], Dict[Any, asyncio.Future]] = {}
+        self._dispatch_scheduled = False
+        self._stats = {"loads": 0, "cache_hits": 0, "queries": 0, "rows": 0}
+        _totals["loaders"] += 1
+
+    @property
+    def repository(self) -> Repository:
+        if self._repository is None:
+            self._repository = get_repository()
+        return self._repository
+
+    async def load(self, table: str, value: Any, column: str = "id") -> Optional[Dict[str, Any]]:
+        """The row whose column equals value, or None"""
+        rows = await self.load_all(table, value, column)
+        return rows[0] if rows else None
+
+    async def load_all(self, table: str, value: Any, column: str = "id") -> List[Dict[str, Any]]:
+        """Every row whose column equals value"""
+        self._stats["loads"] += 1
+        key = (table, column, value)
+        future = self._rows.get(key)
+        if future is not None:
+            self._stats["cache_hits"] += 1
+            return await asyncio.shield(future)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._rows[key] = future
+        self._pending.setdefault((table, column), {})[value] = future
+        if not self._dispatch_scheduled:
+            # Let every coroutine that is ready this tick add its lookups first
+            self._dispatch_scheduled = True
+            loop.call_soon(lambda: loop.create_task(self._dispatch()))
+        return await asyncio.shield(future)
+
+    def prime(self, table: str, row: Dict[str, Any], column: str = "id"):
+        """Remember a row fetched some other way so later loads reuse it"""
+        future = asyncio.get_running_loop().create_future()
+        future.set_result([row])
+        self._rows[(table, column, row[column])] = future
+
+    def clear(self, table: str, value: Any = None, column: str = "id"):
+        """Forget cached rows of a table (all of them, or one value) after a write"""
+        for key in [key for key in self._rows if key[0] == table and key[1] == column and (value is None or key[2] == value)]:
+            del self._rows[key]
+
+    async def _dispatch(self):
+        self._dispatch_scheduled = False
+        pending, self._pending = self._pending, {}
+        await asyncio.gather(*[
+            self._fetch(table, column, dict(list(futures.items())[start:start + self.max_batch]))
+            for (table, column), futures in pending.items()
+            for start in range(0, len(futures), self.max_batch)
+        ])
+
+    async def _fetch(self, table: str, column: str, futures: Dict[Any, asyncio.Future]):
+        try:
+            rows = await self.repository.get_rows(table, column, list(futures))
+        except Exception as e:
+            for value, future in futures.items():
+                # Failed lookups are not cached, so a retry queries again
+                self._rows.pop((table, column, value), None)
+                future.set_exception(e)
+            return
+
+        rows_by_value: Dict[Any, List[Dict[str, Any]]] = {}
+        for row in rows:
+            rows_by_value.setdefault(row.get(column), []).append(row)
+        for value, future in futures.items():
+            # PostgREST's in_ compares as text, so match string forms too (e.g. integer ids)
+            future.set_result(rows_by_value.get(value) or rows_by_value.get(str(value)) or [])
+
+        self._stats["queries"] += 1
+        self._stats["rows"] += len(rows)
+
+    def stats(self) -> Dict[str, Any]:
+        """Lookups served, queries sent and queries saved by coalescing and batching"""
+        return {**self._stats, "queries_saved": self._stats["loads"] - self._stats["queries"]}
+
+    def close(self):
+        for name in ("loads", "cache_hits", "queries", "rows"):
+            _totals[name] += self._stats[name]
+
+
+async def get_loader() -> AsyncIterator[DataLoader]:
+    """FastAPI dependency: one loader per request, shared by every dependency that asks for it"""
+    loader = DataLoader()
+    try:
+        yield loader
+    finally:
+        loader.close()
+
+
+def loader_stats() -> Dict[str, Any]:
+    """Totals over every closed loader since startup"""
+    return {**_totals, "queries_saved": _totals["loads"] - _totals["queries"]}
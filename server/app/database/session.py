@@ -1,5 +1,6 @@
 from typing import Dict, Any, Optional
 from app.database.connection import supabase_manager
+from app.database.async_db import db
 from fastapi import HTTPException, status
 
 class DatabaseSession:
@@ -17,7 +18,7 @@ class DatabaseSession:
     async def create_exam_session(self, exam_data: Dict[str, Any]) -> Dict[str, Any]:
         """Create a new exam session"""
         try:
-            result = self.client.table("exam_sessions").insert(exam_data).execute()
+            result = await db.execute(self.client.table("exam_sessions").insert(exam_data))
             return result.data[0] if result.data else None
         except Exception as e:
             raise HTTPException(
@@ -28,7 +29,7 @@ class DatabaseSession:
     async def get_user_exams(self, user_id: str) -> list:
         """Get all exams for a user"""
         try:
-            result = self.client.table("exam_sessions").select("*").eq("user_id", user_id).execute()
+            result = await db.execute(self.client.table("exam_sessions").select("*").eq("user_id", user_id))
             return result.data
         except Exception as e:
             raise HTTPException(
@@ -39,7 +40,7 @@ class DatabaseSession:
     async def save_grading_result(self, result_data: Dict[str, Any]) -> Dict[str, Any]:
         """Save grading results"""
         try:
-            result = self.client.table("grading_results").insert(result_data).execute()
+            result = await db.execute(self.client.table("grading_results").insert(result_data))
             return result.data[0] if result.data else None
         except Exception as e:
             raise HTTPException(
@@ -1,9 +1,23 @@
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 import uvicorn
+import asyncio
 import os
 from app.core.config import settings
+from app.database.async_db import db
+from app.database.connection import supabase_manager
+from app.database.dataloader import loader_stats
+from app.services.ocr_executor import ocr_executor
+from app.services.ocr_cache import ocr_cache
+from app.services.model_registry import model_registry
+from app.services.embedding_batcher import embedding_batcher
+from app.services.embedding_cache import embedding_cache
+from app.services.scoring_engine import scoring_engine
+from app.services.job_queue import job_queue
+from app.services.metadata_cache import metadata_cache
+from app.repositories.base import get_repository
 from app.routers import upload, grading, results, auth, admin  # Added auth
 
 # Initialize FastAPI app
@@ -46,6 +60,63 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/ready")
+async def readiness_check():
+    """Ready once the shared embedding model is loaded (and warmed up, if EMBEDDING_WARMUP_ON_STARTUP)"""
+    model_status = model_registry.status()
+    if not model_status["ready"]:
+        return JSONResponse(status_code=503, content={"status": "loading", "models": model_status})
+    return {"status": "ready", "models": model_status}
+
+@app.get("/metrics")
+async def metrics():
+    # Both read the SQLite job queue; keep that off the event loop
+    loop = asyncio.get_running_loop()
+    queue_stats, worker_stats = await asyncio.gather(
+        loop.run_in_executor(None, job_queue.stats),
+        loop.run_in_executor(None, job_queue.worker_stats)
+    )
+    return {
+        "db": db.stats(),
+        "supabase_clients": supabase_manager.stats(),
+        "repository": get_repository().stats(),
+        "dataloader": loader_stats(),
+        "metadata_cache": metadata_cache.stats(),
+        "ocr_executor": ocr_executor.stats(),
+        "ocr_cache": ocr_cache.stats(),
+        "embedding_batcher": embedding_batcher.stats(),
+        "embedding_cache": embedding_cache.stats(),
+        "scoring_engine": scoring_engine.stats(),
+        "job_queue": queue_stats,
+        # Uploads are processed in `python -m app.worker` processes, which publish their own figures
+        "workers": worker_stats
+    }
+
+@app.on_event("startup")
+async def warmup_models():
+    if not settings.EMBEDDING_WARMUP_ON_STARTUP:
+        return
+    def warmup():
+        try:
+            model_registry.warmup()
+        except Exception as e:
+            # /ready keeps reporting the error; grading retries the load on first use
+            print(f"Model warmup failed: {str(e)}")
+    
+    # Load in the background so the server starts accepting requests (and /ready polls) right away
+    loop = asyncio.get_running_loop()
+    app.state.model_warmup = loop.run_in_executor(None, warmup)
+
+@app.on_event("shutdown")
+async def shutdown_workers():
+    ocr_executor.shutdown()
+    embedding_batcher.shutdown()
+    embedding_cache.shutdown()
+    db.shutdown()
+    metadata_cache.shutdown()
+    await get_repository().close()
+    supabase_manager.close()
+
 if __name__ == "__main__":
     uvicorn.run(
         "app.main:app",
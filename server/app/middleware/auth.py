@@ -12,6 +12,7 @@ class AuthMiddleware(BaseHTTPMiddleware):
         r"^/redoc.*",
         r"^/openapi\.json$",
         r"^/health$",
+        r"^/ready$",
         # Add any other public routes here
     ]
 
@@ -1,43 +1,185 @@
-from pydantic import BaseModel
-from typing import Dict, Any, List, Optional
-from datetime import datetime
-from sqlalchemy import Column, String, Float, Integer, DateTime, JSON, Text
-from sqlalchemy.ext.declarative import declarative_base
+from datetime import datetime, timezone
+from uuid import uuid4
+from sqlalchemy import (
+    Boolean,
+    Column,
+    Date,
+    DateTime,
+    Float,
+    ForeignKey,
+    Integer,
+    JSON,
+    String,
+    Text,
+    Time,
+    UniqueConstraint,
+)
+from sqlalchemy.orm import declarative_base
 
+# Tables as the routers use them in Supabase, for the local SQL backend (DATA_BACKEND=sql)
 Base = declarative_base()
 
+
+def new_id() -> str:
+    return str(uuid4())
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class Subject(Base):
+    __tablename__ = "subjects"
+
+    id = Column(String(36), primary_key=True, default=new_id)
+    subject_code = Column(String, nullable=False, unique=True)
+    subject_name = Column(String, nullable=False)
+    department = Column(String, nullable=True)
+    description = Column(Text, nullable=True)
+    credits = Column(Integer, default=3)
+    semester = Column(Integer, nullable=True)
+    course = Column(String, nullable=True)
+    is_active = Column(Boolean, default=True)
+    created_at = Column(DateTime(timezone=True), default=utcnow)
+
+
+class Student(Base):
+    __tablename__ = "students"
+
+    id = Column(String(36), primary_key=True, default=new_id)
+    student_id = Column(String, nullable=False, unique=True)
+    full_name = Column(String, nullable=False)
+    email = Column(String, nullable=False, unique=True)
+    password_hash = Column(String, nullable=False)
+    phone = Column(String, nullable=True)
+    course = Column(String, nullable=True)
+    status = Column(String, default="active")
+    created_at = Column(DateTime(timezone=True), default=utcnow)
+
+
+class Teacher(Base):
+    __tablename__ = "teachers"
+
+    id = Column(String(36), primary_key=True, default=new_id)
+    teacher_id = Column(String, nullable=False, unique=True)
+    full_name = Column(String, nullable=False)
+    email = Column(String, nullable=False, unique=True)
+    password_hash = Column(String, nullable=False)
+    phone = Column(String, nullable=True)
+    department = Column(String, nullable=True)
+    status = Column(String, default="active")
+    created_at = Column(DateTime(timezone=True), default=utcnow)
+
+
+class Exam(Base):
+    __tablename__ = "exams"
+
+    id = Column(String(36), primary_key=True, default=new_id)
+    exam_code = Column(String, nullable=False, unique=True)
+    subject_id = Column(String(36), ForeignKey("subjects.id"), nullable=False)
+    exam_name = Column(String, nullable=False)
+    exam_type = Column(String, default="midterm")
+    exam_date = Column(Date, nullable=True)
+    start_time = Column(Time, nullable=True)
+    duration_minutes = Column(Integer, nullable=True)
+    total_marks = Column(Integer, nullable=False)
+    passing_marks = Column(Integer, nullable=True)
+    instructions = Column(Text, nullable=True)
+    is_auto_grading_enabled = Column(Boolean, default=True)
+    status = Column(String, default="active", index=True)
+    created_by = Column(String(36), ForeignKey("teachers.id"), nullable=True, index=True)
+    created_at = Column(DateTime(timezone=True), default=utcnow)
+
+
+class Question(Base):
+    __tablename__ = "questions"
+
+    id = Column(String(36), primary_key=True, default=new_id)
+    exam_id = Column(String(36), ForeignKey("exams.id"), nullable=False, index=True)
+    question_number = Column(Integer, nullable=False)
+    question_text = Column(Text, nullable=False)
+    question_type = Column(String, default="descriptive")
+    max_marks = Column(Float, nullable=False)
+    marking_scheme = Column(Text, nullable=True)
+    sample_answer = Column(Text, nullable=True)
+    sample_answer_embedding = Column(JSON, nullable=True)  # pack_embedding record
+    keywords = Column(JSON, nullable=True)
+    created_at = Column(DateTime(timezone=True), default=utcnow)
+
+
+class ExamUpload(Base):
+    __tablename__ = "exam_uploads"
+
+    id = Column(String(36), primary_key=True, default=new_id)
+    exam_id = Column(String(36), ForeignKey("exams.id"), nullable=False, index=True)
+    student_id = Column(String(36), ForeignKey("students.id"), nullable=False, index=True)
+    file_name = Column(String, nullable=True)
+    file_path = Column(String, nullable=False)
+    file_size = Column(Integer, nullable=True)
+    file_type = Column(String, nullable=True)
+    processing_status = Column(String, default="uploaded")
+    error_message = Column(Text, nullable=True)
+    ocr_extracted_text = Column(Text, nullable=True)
+    ocr_pages = Column(JSON, nullable=True)
+    confidence_score = Column(Float, nullable=True)
+    uploaded_at = Column(DateTime(timezone=True), default=utcnow)
+    processed_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class StudentAnswer(Base):
+    __tablename__ = "student_answers"
+    # One answer per upload and question
+    __table_args__ = (UniqueConstraint("upload_id", "question_id"),)
+
+    id = Column(String(36), primary_key=True, default=new_id)
+    upload_id = Column(String(36), ForeignKey("exam_uploads.id"), nullable=False, index=True)
+    question_id = Column(String(36), ForeignKey("questions.id"), nullable=False)
+    student_id = Column(String(36), ForeignKey("students.id"), nullable=False)
+    extracted_answer = Column(Text, nullable=True)
+    raw_image_path = Column(String, nullable=True)
+    confidence_score = Column(Float, nullable=True)
+    processing_notes = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), default=utcnow)
+
+
+class GradingResult(Base):
+    __tablename__ = "grading_results"
+
+    id = Column(String(36), primary_key=True, default=new_id)
+    question_id = Column(String(36), ForeignKey("questions.id"), nullable=False)
+    student_id = Column(String(36), ForeignKey("students.id"), nullable=False, index=True)
+    exam_id = Column(String(36), ForeignKey("exams.id"), nullable=False, index=True)
+    student_answer_id = Column(String(36), ForeignKey("student_answers.id"), nullable=False, index=True)
+    ai_assigned_marks = Column(Float, nullable=True)
+    final_marks = Column(Float, nullable=True)
+    ai_feedback = Column(Text, nullable=True)
+    ai_confidence = Column(Float, nullable=True)
+    similarity_score = Column(Float, nullable=True)
+    grading_criteria_met = Column(JSON, nullable=True)
+    is_reviewed_by_teacher = Column(Boolean, default=False)
+    is_disputed = Column(Boolean, default=False)
+    graded_at = Column(DateTime(timezone=True), default=utcnow)
+
+
+class ExamGradingStats(Base):
+    __tablename__ = "exam_grading_stats"
+
+    exam_id = Column(String(36), ForeignKey("exams.id"), primary_key=True)
+    total_answers = Column(Integer, nullable=False)
+    distinct_answers = Column(Integer, nullable=False)
+    dedup_ratio = Column(Float, nullable=False)
+    decided_by = Column(JSON, nullable=True)
+    updated_at = Column(DateTime(timezone=True), default=utcnow)
+
+
 class ExamSession(Base):
-    tablename = "exam_sessions"
-    
-    id = Column(String, primary_key=True)
-    exam_id = Column(String, nullable=False)
-    student_id = Column(String, nullable=False)
+    __tablename__ = "exam_sessions"
+
+    id = Column(String(36), primary_key=True, default=new_id)
+    exam_id = Column(String(36), nullable=False)
+    student_id = Column(String(36), nullable=False)
     file_path = Column(String, nullable=False)
     status = Column(String, default="uploaded")
-    uploaded_at = Column(DateTime, default=datetime.utcnow)
-    graded_at = Column(DateTime, nullable=True)
-
-class GradingResults(Base):
-    tablename = "grading_results"
-    
-    id = Column(String, primary_key=True)
-    exam_session_id = Column(String, nullable=False)
-    total_marks = Column(Float, nullable=False)
-    max_marks = Column(Float, nullable=False)
-    percentage = Column(Float, nullable=False)
-    question_results = Column(JSON, nullable=False)
-    overall_feedback = Column(Text, nullable=True)
-    confidence_score = Column(Float, nullable=True)
-    graded_at = Column(DateTime, default=datetime.utcnow)
-
-class Exams(Base):
-    tablename = "exams"
-    
-    id = Column(String, primary_key=True)
-    title = Column(String, nullable=False)
-    subject = Column(String, nullable=False)
-    teacher_id = Column(String, nullable=False)
-    total_marks = Column(Integer, nullable=False)
-    marking_scheme = Column(JSON, nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, nullable=True)
\ No newline at end of file
+    uploaded_at = Column(DateTime(timezone=True), default=utcnow)
+    graded_at = Column(DateTime(timezone=True), nullable=True)
+
@@ -0,0 +1,165 @@
+# app/repositories/base.py
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Set
+
+Row = Dict[str, Any]
+
+# Compare-and-set attempts for accumulating exam_grading_stats under concurrent writers
+STATS_UPDATE_ATTEMPTS = 10
+
+
+def merge_grading_stats(existing: Optional[Row], exam_id: str, counts: Row) -> Row:
+    """exam_grading_stats row with counts (total_answers, distinct_answers, decided_by) added to existing"""
+    total = (existing or {}).get("total_answers", 0) + counts["total_answers"]
+    distinct = (existing or {}).get("distinct_answers", 0) + counts["distinct_answers"]
+    decided_by = dict((existing or {}).get("decided_by") or {})
+    for tier, count in counts["decided_by"].items():
+        decided_by[tier] = decided_by.get(tier, 0) + count
+    return {
+        "exam_id": exam_id,
+        "total_answers": total,
+        "distinct_answers": distinct,
+        "dedup_ratio": round(1 - distinct / total, 4) if total else 0.0,
+        "decided_by": decided_by,
+        "updated_at": "now()"
+    }
+
+
+class Repository(ABC):
+    """Data access for the tables the upload pipeline, grading jobs and routers use
+
+    Rows are plain dicts shaped like Supabase's JSON responses, including the
+    embedded `subjects` of an exam and `student_answers` of an upload, so
+    callers do not depend on which backend is configured (DATA_BACKEND).
+    """
+
+    # Users
+    @abstractmethod
+    async def get_user(self, user_type: str, user_id: str) -> Optional[Row]:
+        """Student or teacher row by id"""
+
+    @abstractmethod
+    async def get_user_by_email(self, user_type: str, email: str) -> Optional[Row]:
+        """Student or teacher row by email"""
+
+    @abstractmethod
+    async def create_user(self, user_type: str, row: Row) -> Row:
+        """Insert a student or teacher; returns the stored row"""
+
+    # Exam metadata
+    @abstractmethod
+    async def get_subject_by_code(self, subject_code: str) -> Optional[Row]:
+        """Subject row by subject code"""
+
+    @abstractmethod
+    async def create_subject(self, row: Row) -> Row:
+        """Insert a subject; returns the stored row"""
+
+    @abstractmethod
+    async def get_exam(self, exam_id: str) -> Optional[Row]:
+        """Exam row with its subject under `subjects`"""
+
+    @abstractmethod
+    async def get_exam_by_code(self, exam_code: str) -> Optional[Row]:
+        """Exam row by exam code"""
+
+    @abstractmethod
+    async def list_exams(self, status: str = None, created_by: str = None) -> List[Row]:
+        """Exams with their subjects, filtered by status and/or creator"""
+
+    @abstractmethod
+    async def create_exam(self, row: Row) -> Row:
+        """Insert an exam; returns the stored row"""
+
+    @abstractmethod
+    async def list_questions(self, exam_id: str) -> List[Row]:
+        """Questions of an exam ordered by question number"""
+
+    @abstractmethod
+    async def create_questions(self, rows: List[Row]) -> List[Row]:
+        """Insert questions; returns the stored rows in input order"""
+
+    @abstractmethod
+    async def update_question(self, exam_id: str, question_id: str, fields: Row) -> Optional[Row]:
+        """Update a question of an exam; None if there is no such question"""
+
+    # Uploads and answers
+    @abstractmethod
+    async def get_upload(self, upload_id: str, include_answers: bool = False) -> Optional[Row]:
+        """Upload row, with its answers under `student_answers` if include_answers"""
+
+    @abstractmethod
+    async def list_uploads(self, exam_id: str = None, student_id: str = None, processing_status: str = None) -> List[Row]:
+        """Uploads filtered by exam, student and/or processing status"""
+
+    @abstractmethod
+    async def create_upload(self, row: Row) -> Row:
+        """Insert an upload; returns the stored row"""
+
+    @abstractmethod
+    async def update_upload(self, upload_id: str, fields: Row) -> None:
+        """Update an upload; the value "now()" sets a timestamp column to the current time"""
+
+    @abstractmethod
+    async def list_answers(self, upload_ids: List[str]) -> List[Row]:
+        """Answers of the given uploads"""
+
+    @abstractmethod
+    async def create_answers(self, rows: List[Row]) -> List[Row]:
+        """Insert answers; returns the stored rows in input order"""
+
+    @abstractmethod
+    async def delete_answers(self, upload_ids: List[str]) -> None:
+        """Delete every answer of the given uploads"""
+
+    # Lookups by key
+    @abstractmethod
+    async def get_rows(self, table: str, column: str, values: List[Any]) -> List[Row]:
+        """Every row of a table whose column is one of values, however many values there are"""
+
+    # Grading
+    @abstractmethod
+    async def list_graded_answer_ids(self, exam_id: str) -> Set[str]:
+        """Ids of the exam's answers that already have a grading result"""
+
+    @abstractmethod
+    async def create_grading_results(self, rows: List[Row]) -> List[Row]:
+        """Insert grading results; returns the stored rows in input order"""
+
+    @abstractmethod
+    async def delete_grading_results(self, answer_ids: List[str]) -> None:
+        """Delete the grading results of the given answers"""
+
+    @abstractmethod
+    async def add_exam_grading_stats(self, exam_id: str, counts: Row) -> None:
+        """Add one grading run's counts (total_answers, distinct_answers, decided_by) to the exam's totals
+
+        Every grading path reports here, so the totals cover all of them.
+        Concurrent writers must not lose each other's counts.
+        """
+
+    def stats(self) -> Dict[str, Any]:
+        """Backend-specific figures for /metrics"""
+        return {}
+
+    async def close(self) -> None:
+        """Release connections"""
+
+
+_repository: Optional[Repository] = None
+
+
+def get_repository() -> Repository:
+    """The configured backend: Supabase by default, or local SQL with DATA_BACKEND=sql"""
+    global _repository
+    if _repository is None:
+        from app.core.config import settings
+        if settings.DATA_BACKEND == "sql":
+            from app.repositories.sql_repository import SQLRepository
+            _repository = SQLRepository(settings.DATABASE_URL)
+        elif settings.DATA_BACKEND == "supabase":
+            from app.repositories.supabase_repository import SupabaseRepository
+            _repository = SupabaseRepository()
+        else:
+            raise ValueError(f"Unknown DATA_BACKEND: {settings.DATA_BACKEND}")
+    return _repository
@@ -0,0 +1,279 @@
+# app/repositories/sql_repository.py
+from datetime import date, datetime, time, timezone
+from typing import Any, Dict, List, Optional, Set
+import asyncio
+from sqlalchemy import Date, DateTime, Table, Time, delete, event, insert, select, update
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from app.core.config import settings
+from app.models.grading import Base, utcnow
+from app.repositories.base import STATS_UPDATE_ATTEMPTS, Repository, Row, merge_grading_stats
+
+TABLES = Base.metadata.tables
+USER_TABLES = {"student": "students", "teacher": "teachers"}
+
+# Bound parameters per statement; SQLite allows 32766, keep statements small anyway
+IN_CHUNK_SIZE = 500
+
+
+class SQLRepository(Repository):
+    """Repository over a local SQL database through SQLAlchemy's async engine
+
+    Lets the API, workers and benchmarks run on one machine without the
+    hosted service: SQLite (aiosqlite) by default, or Postgres (asyncpg).
+    The schema comes from app.models.grading and is created on first use.
+    """
+
+    def __init__(self, url: str, create_schema: bool = None):
+        self.url = url
+        self.create_schema = settings.DATABASE_CREATE_SCHEMA if create_schema is None else create_schema
+        self._engine: Optional[AsyncEngine] = None
+        self._ready: Optional[asyncio.Event] = None
+        self._schema_lock: Optional[asyncio.Lock] = None
+        self._stats = {"statements": 0, "rows_written": 0}
+
+    async def _connect(self) -> AsyncEngine:
+        if self._engine is None:
+            url = make_url(self.url)
+            if url.get_backend_name() == "sqlite":
+                if url.database:
+                    from pathlib import Path
+                    Path(url.database).parent.mkdir(parents=True, exist_ok=True)
+                engine = create_async_engine(url, connect_args={"timeout": 30})
+
+                @event.listens_for(engine.sync_engine, "connect")
+                def _sqlite_pragmas(connection, _):
+                    # WAL lets the API and worker processes read while one of them writes
+                    cursor = connection.cursor()
+                    cursor.execute("PRAGMA journal_mode=WAL")
+                    cursor.execute("PRAGMA foreign_keys=ON")
+                    cursor.close()
+            else:
+                engine = create_async_engine(url, pool_size=settings.DB_THREAD_POOL_SIZE, pool_pre_ping=True)
+            self._engine = engine
+            self._schema_lock = asyncio.Lock()
+
+        if self.create_schema and self._ready is None:
+            async with self._schema_lock:
+                if self._ready is None:
+                    async with self._engine.begin() as connection:
+                        await connection.run_sync(Base.metadata.create_all)
+                    self._ready = asyncio.Event()
+        return self._engine
+
+    async def create_all(self):
+        """Create any missing tables"""
+        engine = await self._connect()
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+
+    async def _fetch(self, statement) -> List[Row]:
+        engine = await self._connect()
+        self._stats["statements"] += 1
+        async with engine.connect() as connection:
+            result = await connection.execute(statement)
+            return [_to_json(dict(row._mapping)) for row in result]
+
+    async def _write(self, statement, parameters=None) -> List[Row]:
+        engine = await self._connect()
+        self._stats["statements"] += 1
+        async with engine.begin() as connection:
+            result = await connection.execute(statement, parameters) if parameters is not None else await connection.execute(statement)
+            return [_to_json(dict(row._mapping)) for row in result] if result.returns_rows else []
+
+    async def _insert(self, table_name: str, rows: List[Row]) -> List[Row]:
+        if not rows:
+            return []
+        table = TABLES[table_name]
+        parameters = [_coerce(table, row) for row in rows]
+        self._stats["rows_written"] += len(rows)
+        # One multi-row statement; ids and defaults come back in input order
+        return await self._write(insert(table).returning(*table.c, sort_by_parameter_order=True), parameters)
+
+    async def _first(self, statement) -> Optional[Row]:
+        rows = await self._fetch(statement.limit(1))
+        return rows[0] if rows else None
+
+    async def _exams(self, *conditions) -> List[Row]:
+        exams, subjects = TABLES["exams"], TABLES["subjects"]
+        statement = select(
+            exams, subjects.c.subject_name.label("_subject_name"), subjects.c.subject_code.label("_subject_code")
+        ).select_from(exams.outerjoin(subjects, exams.c.subject_id == subjects.c.id)).where(*conditions)
+        rows = await self._fetch(statement)
+        for row in rows:
+            # Same shape as PostgREST's embedded `subjects (subject_name, subject_code)`
+            name, code = row.pop("_subject_name"), row.pop("_subject_code")
+            row["subjects"] = {"subject_name": name, "subject_code": code} if code is not None else None
+        return rows
+
+    async def get_user(self, user_type: str, user_id: str) -> Optional[Row]:
+        table = TABLES[USER_TABLES[user_type]]
+        return await self._first(select(table).where(table.c.id == user_id))
+
+    async def get_user_by_email(self, user_type: str, email: str) -> Optional[Row]:
+        table = TABLES[USER_TABLES[user_type]]
+        return await self._first(select(table).where(table.c.email == email))
+
+    async def create_user(self, user_type: str, row: Row) -> Row:
+        return (await self._insert(USER_TABLES[user_type], [row]))[0]
+
+    async def get_subject_by_code(self, subject_code: str) -> Optional[Row]:
+        table = TABLES["subjects"]
+        return await self._first(select(table).where(table.c.subject_code == subject_code))
+
+    async def create_subject(self, row: Row) -> Row:
+        return (await self._insert("subjects", [row]))[0]
+
+    async def get_exam(self, exam_id: str) -> Optional[Row]:
+        exams = await self._exams(TABLES["exams"].c.id == exam_id)
+        return exams[0] if exams else None
+
+    async def get_exam_by_code(self, exam_code: str) -> Optional[Row]:
+        table = TABLES["exams"]
+        return await self._first(select(table).where(table.c.exam_code == exam_code))
+
+    async def list_exams(self, status: str = None, created_by: str = None) -> List[Row]:
+        table = TABLES["exams"]
+        conditions = []
+        if status is not None:
+            conditions.append(table.c.status == status)
+        if created_by is not None:
+            conditions.append(table.c.created_by == created_by)
+        return await self._exams(*conditions)
+
+    async def create_exam(self, row: Row) -> Row:
+        return (await self._insert("exams", [row]))[0]
+
+    async def list_questions(self, exam_id: str) -> List[Row]:
+        table = TABLES["questions"]
+        return await self._fetch(select(table).where(table.c.exam_id == exam_id).order_by(table.c.question_number))
+
+    async def create_questions(self, rows: List[Row]) -> List[Row]:
+        return await self._insert("questions", rows)
+
+    async def update_question(self, exam_id: str, question_id: str, fields: Row) -> Optional[Row]:
+        table = TABLES["questions"]
+        rows = await self._write(
+            update(table).where(table.c.id == question_id, table.c.exam_id == exam_id)
+            .values(_coerce(table, fields)).returning(*table.c)
+        )
+        return rows[0] if rows else None
+
+    async def get_upload(self, upload_id: str, include_answers: bool = False) -> Optional[Row]:
+        table = TABLES["exam_uploads"]
+        upload = await self._first(select(table).where(table.c.id == upload_id))
+        if upload is not None and include_answers:
+            upload["student_answers"] = await self.list_answers([upload_id])
+        return upload
+
+    async def list_uploads(self, exam_id: str = None, student_id: str = None, processing_status: str = None) -> List[Row]:
+        table = TABLES["exam_uploads"]
+        conditions = [
+            table.c[column] == value
+            for column, value in (("exam_id", exam_id), ("student_id", student_id), ("processing_status", processing_status))
+            if value is not None
+        ]
+        return await self._fetch(select(table).where(*conditions))
+
+    async def create_upload(self, row: Row) -> Row:
+        return (await self._insert("exam_uploads", [row]))[0]
+
+    async def update_upload(self, upload_id: str, fields: Row) -> None:
+        table = TABLES["exam_uploads"]
+        await self._write(update(table).where(table.c.id == upload_id).values(_coerce(table, fields)))
+
+    async def list_answers(self, upload_ids: List[str]) -> List[Row]:
+        table = TABLES["student_answers"]
+        answers = []
+        for start in range(0, len(upload_ids), IN_CHUNK_SIZE):
+            answers.extend(await self._fetch(
+                select(table).where(table.c.upload_id.in_(upload_ids[start:start + IN_CHUNK_SIZE]))
+            ))
+        return answers
+
+    async def create_answers(self, rows: List[Row]) -> List[Row]:
+        return await self._insert("student_answers", rows)
+
+    async def delete_answers(self, upload_ids: List[str]) -> None:
+        table = TABLES["student_answers"]
+        for start in range(0, len(upload_ids), IN_CHUNK_SIZE):
+            await self._write(delete(table).where(table.c.upload_id.in_(upload_ids[start:start + IN_CHUNK_SIZE])))
+
+    async def list_graded_answer_ids(self, exam_id: str) -> Set[str]:
+        table = TABLES["grading_results"]
+        rows = await self._fetch(select(table.c.student_answer_id).where(table.c.exam_id == exam_id))
+        return {row["student_answer_id"] for row in rows}
+
+    async def create_grading_results(self, rows: List[Row]) -> List[Row]:
+        return await self._insert("grading_results", rows)
+
+    async def delete_grading_results(self, answer_ids: List[str]) -> None:
+        table = TABLES["grading_results"]
+        for start in range(0, len(answer_ids), IN_CHUNK_SIZE):
+            await self._write(delete(table).where(table.c.student_answer_id.in_(answer_ids[start:start + IN_CHUNK_SIZE])))
+
+    async def get_rows(self, table: str, column: str, values: List[Any]) -> List[Row]:
+        sql_table = TABLES[table]
+        rows = []
+        for start in range(0, len(values), IN_CHUNK_SIZE):
+            rows.extend(await self._fetch(
+                select(sql_table).where(sql_table.c[column].in_(values[start:start + IN_CHUNK_SIZE]))
+            ))
+        return rows
+
+    async def add_exam_grading_stats(self, exam_id: str, counts: Row) -> None:
+        # Compare-and-set on total_answers, which only grows, as the Supabase backend does
+        table = TABLES["exam_grading_stats"]
+        for _ in range(STATS_UPDATE_ATTEMPTS):
+            existing = await self._first(select(table).where(table.c.exam_id == exam_id))
+            values = _coerce(table, merge_grading_stats(existing, exam_id, counts))
+            if existing is None:
+                try:
+                    await self._write(insert(table).values(values))
+                    return
+                except IntegrityError:
+                    continue  # another writer created the row first
+            rows = await self._write(
+                update(table).where(table.c.exam_id == exam_id, table.c.total_answers == existing["total_answers"])
+                .values(values).returning(table.c.exam_id)
+            )
+            if rows:
+                return
+        raise RuntimeError(f"Could not update grading stats for exam {exam_id}: too many concurrent writers")
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "sql", "dialect": make_url(self.url).get_backend_name(), **self._stats}
+
+    async def close(self) -> None:
+        if self._engine is not None:
+            await self._engine.dispose()
+            self._engine = None
+            self._ready = None
+
+
+def _coerce(table: Table, row: Row) -> Row:
+    """Turn Supabase-style values (ISO strings, "now()") into what the column types expect"""
+    values = {}
+    for column, value in row.items():
+        column_type = table.c[column].type
+        if isinstance(value, str):
+            if isinstance(column_type, DateTime):
+                value = utcnow() if value == "now()" else datetime.fromisoformat(value)
+            elif isinstance(column_type, Date):
+                value = date.fromisoformat(value)
+            elif isinstance(column_type, Time):
+                value = time.fromisoformat(value)
+        values[column] = value
+    return values
+
+
+def _to_json(row: Row) -> Row:
+    """Dates and times as ISO strings, as PostgREST returns them"""
+    values = {}
+    for column, value in row.items():
+        # SQLite drops the offset; every timestamp is stored in UTC
+        if isinstance(value, datetime) and value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        values[column] = value.isoformat() if isinstance(value, (datetime, date, time)) else value
+    return values
@@ -0,0 +1,185 @@
+# app/repositories/supabase_repository.py
+from typing import Any, Callable, Dict, List, Optional, Set
+from supabase import Client
+from app.database.async_db import db
+from app.database.batch_writer import BatchWriter, batch_writer
+from app.database.connection import get_supabase_admin
+from postgrest.exceptions import APIError
+from app.repositories.base import STATS_UPDATE_ATTEMPTS, Repository, Row, merge_grading_stats
+
+USER_TABLES = {"student": "students", "teacher": "teachers"}
+
+EXAM_COLUMNS = """
+    *,
+    subjects (subject_name, subject_code)
+"""
+
+# Values per PostgREST request for `in` filters
+IN_CHUNK_SIZE = 100
+
+# PostgREST returns at most this many rows per request (its default max-rows)
+PAGE_SIZE = 1000
+
+
+class SupabaseRepository(Repository):
+    """Repository over the hosted Supabase database (service role client)"""
+
+    def __init__(self, client_factory: Callable[[], Client] = None, writer: BatchWriter = None):
+        self.client_factory = client_factory or get_supabase_admin
+        self.writer = writer or batch_writer
+
+    def _table(self, name: str):
+        return self.client_factory().table(name)
+
+    async def _first(self, query) -> Optional[Row]:
+        result = await db.execute(query)
+        return result.data[0] if result.data else None
+
+    async def _all(self, query) -> List[Row]:
+        result = await db.execute(query)
+        return result.data or []
+
+    async def _all_pages(self, make_query: Callable[[], Any]) -> List[Row]:
+        """Every row of a read, PAGE_SIZE rows per request until a short page comes back
+
+        make_query builds a fresh query ordered on a unique column, so pages
+        neither overlap nor skip rows.
+        """
+        rows: List[Row] = []
+        while True:
+            page = await self._all(make_query().range(len(rows), len(rows) + PAGE_SIZE - 1))
+            rows.extend(page)
+            if len(page) < PAGE_SIZE:
+                return rows
+
+    async def get_user(self, user_type: str, user_id: str) -> Optional[Row]:
+        return await self._first(self._table(USER_TABLES[user_type]).select("*").eq("id", user_id))
+
+    async def get_user_by_email(self, user_type: str, email: str) -> Optional[Row]:
+        return await self._first(self._table(USER_TABLES[user_type]).select("*").eq("email", email))
+
+    async def create_user(self, user_type: str, row: Row) -> Row:
+        return await self._first(self._table(USER_TABLES[user_type]).insert(row))
+
+    async def get_subject_by_code(self, subject_code: str) -> Optional[Row]:
+        return await self._first(self._table("subjects").select("*").eq("subject_code", subject_code))
+
+    async def create_subject(self, row: Row) -> Row:
+        return await self._first(self._table("subjects").insert(row))
+
+    async def get_exam(self, exam_id: str) -> Optional[Row]:
+        return await self._first(self._table("exams").select(EXAM_COLUMNS).eq("id", exam_id))
+
+    async def get_exam_by_code(self, exam_code: str) -> Optional[Row]:
+        return await self._first(self._table("exams").select("*").eq("exam_code", exam_code))
+
+    async def list_exams(self, status: str = None, created_by: str = None) -> List[Row]:
+        query = self._table("exams").select(EXAM_COLUMNS)
+        if status is not None:
+            query = query.eq("status", status)
+        if created_by is not None:
+            query = query.eq("created_by", created_by)
+        return await self._all(query)
+
+    async def create_exam(self, row: Row) -> Row:
+        return await self._first(self._table("exams").insert(row))
+
+    async def list_questions(self, exam_id: str) -> List[Row]:
+        return await self._all(self._table("questions").select("*").eq("exam_id", exam_id).order("question_number"))
+
+    async def create_questions(self, rows: List[Row]) -> List[Row]:
+        return await self.writer.insert("questions", rows)
+
+    async def update_question(self, exam_id: str, question_id: str, fields: Row) -> Optional[Row]:
+        return await self._first(self._table("questions").update(fields).eq("id", question_id).eq("exam_id", exam_id))
+
+    async def get_upload(self, upload_id: str, include_answers: bool = False) -> Optional[Row]:
+        # Answers are embedded so the upload and its answers cost one request
+        columns = "*, student_answers(*)" if include_answers else "*"
+        return await self._first(self._table("exam_uploads").select(columns).eq("id", upload_id))
+
+    async def list_uploads(self, exam_id: str = None, student_id: str = None, processing_status: str = None) -> List[Row]:
+        def make_query():
+            query = self._table("exam_uploads").select("*")
+            for column, value in (("exam_id", exam_id), ("student_id", student_id), ("processing_status", processing_status)):
+                if value is not None:
+                    query = query.eq(column, value)
+            return query.order("id")
+        return await self._all_pages(make_query)
+
+    async def create_upload(self, row: Row) -> Row:
+        return await self._first(self._table("exam_uploads").insert(row))
+
+    async def update_upload(self, upload_id: str, fields: Row) -> None:
+        await db.execute(self._table("exam_uploads").update(fields).eq("id", upload_id))
+
+    async def list_answers(self, upload_ids: List[str]) -> List[Row]:
+        answers = []
+        for start in range(0, len(upload_ids), IN_CHUNK_SIZE):
+            # One chunk of uploads can hold more answers than a page
+            chunk = upload_ids[start:start + IN_CHUNK_SIZE]
+            answers.extend(await self._all_pages(
+                lambda: self._table("student_answers").select("*").in_("upload_id", chunk).order("id")
+            ))
+        return answers
+
+    async def create_answers(self, rows: List[Row]) -> List[Row]:
+        return await self.writer.insert("student_answers", rows)
+
+    async def delete_answers(self, upload_ids: List[str]) -> None:
+        # Chunked like the reads: ids go in the URL, which PostgREST and proxies cap
+        for start in range(0, len(upload_ids), IN_CHUNK_SIZE):
+            await db.execute(
+                self._table("student_answers").delete().in_("upload_id", upload_ids[start:start + IN_CHUNK_SIZE])
+            )
+
+    async def list_graded_answer_ids(self, exam_id: str) -> Set[str]:
+        rows = await self._all_pages(
+            lambda: self._table("grading_results").select("id, student_answer_id").eq("exam_id", exam_id).order("id")
+        )
+        return {row["student_answer_id"] for row in rows}
+
+    async def create_grading_results(self, rows: List[Row]) -> List[Row]:
+        return await self.writer.insert("grading_results", rows)
+
+    async def delete_grading_results(self, answer_ids: List[str]) -> None:
+        for start in range(0, len(answer_ids), IN_CHUNK_SIZE):
+            await db.execute(
+                self._table("grading_results").delete().in_("student_answer_id", answer_ids[start:start + IN_CHUNK_SIZE])
+            )
+
+    async def get_rows(self, table: str, column: str, values: List[Any]) -> List[Row]:
+        def query(chunk):
+            query = self._table(table).select("*")
+            query = query.eq(column, chunk[0]) if len(chunk) == 1 else query.in_(column, chunk)
+            return query.order("id")
+
+        rows = []
+        for start in range(0, len(values), IN_CHUNK_SIZE):
+            chunk = values[start:start + IN_CHUNK_SIZE]
+            rows.extend(await self._all_pages(lambda: query(chunk)))
+        return rows
+
+    async def add_exam_grading_stats(self, exam_id: str, counts: Row) -> None:
+        # PostgREST has no atomic increment: compare-and-set on total_answers, which only grows
+        for _ in range(STATS_UPDATE_ATTEMPTS):
+            existing = await self._first(self._table("exam_grading_stats").select("*").eq("exam_id", exam_id))
+            row = merge_grading_stats(existing, exam_id, counts)
+            if existing is None:
+                try:
+                    await db.execute(self._table("exam_grading_stats").insert(row))
+                    return
+                except APIError as e:
+                    if e.code != "23505":  # another writer created the row first
+                        raise
+                    continue
+            result = await db.execute(
+                self._table("exam_grading_stats").update(row).eq("exam_id", exam_id)
+                .eq("total_answers", existing["total_answers"])
+            )
+            if result.data:
+                return
+        raise RuntimeError(f"Could not update grading stats for exam {exam_id}: too many concurrent writers")
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "supabase", "writer": self.writer.stats()}
@@ -1,10 +1,13 @@
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
-from app.database.connection import get_supabase_admin
+from app.repositories.base import get_repository
 from app.routers.auth import get_current_user
+from app.services.ai_service import AIGradingService
+from app.services.metadata_cache import metadata_cache
 from typing import Optional
 
 router = APIRouter()
+ai_service = AIGradingService()
 
 # Use unique names to avoid conflicts with app.schemas.exam
 class AdminSubjectCreate(BaseModel):
@@ -34,6 +37,13 @@ class AdminQuestionCreate(BaseModel):
     sample_answer: Optional[str] = None
     keywords: Optional[list] = []
 
+class AdminQuestionUpdate(BaseModel):
+    question_number: Optional[int] = None
+    question_text: Optional[str] = None
+    max_marks: Optional[float] = None
+    sample_answer: Optional[str] = None
+    keywords: Optional[list] = None
+
 @router.post("/subjects")
 async def create_subject(
     subject_data: AdminSubjectCreate,
@@ -45,24 +55,21 @@ async def create_subject(
     if user_type != "teacher":
         raise HTTPException(status_code=403, detail="Only teachers can create subjects")
     
-    supabase_admin = get_supabase_admin()
+    repository = get_repository()
     
     try:
         # Check if subject already exists
-        existing = supabase_admin.table("subjects").select("*").eq(
-            "subject_code", subject_data.subject_code
-        ).execute()
-        
-        if existing.data:
+        if await metadata_cache.subject_by_code(subject_data.subject_code):
             raise HTTPException(status_code=400, detail="Subject code already exists")
         
         # Create subject
         subject_dict = subject_data.model_dump()
-        result = supabase_admin.table("subjects").insert(subject_dict).execute()
+        subject = await repository.create_subject(subject_dict)
+        await metadata_cache.invalidate_subjects(subject_data.subject_code)
         
         return {
             "message": "Subject created successfully",
-            "subject": result.data[0]
+            "subject": subject
         }
         
     except HTTPException:
@@ -81,28 +88,22 @@ async def create_exam(
     if user_type != "teacher":
         raise HTTPException(status_code=403, detail="Only teachers can create exams")
     
-    supabase_admin = get_supabase_admin()
+    repository = get_repository()
     
     try:
         # Get subject ID from subject_code
-        subject_result = supabase_admin.table("subjects").select("id").eq(
-            "subject_code", exam_data.subject_code
-        ).execute()
+        subject = await metadata_cache.subject_by_code(exam_data.subject_code)
         
-        if not subject_result.data:
+        if not subject:
             raise HTTPException(
                 status_code=404, 
                 detail=f"Subject with code '{exam_data.subject_code}' not found"
             )
         
-        subject_id = subject_result.data[0]["id"]
+        subject_id = subject["id"]
         
         # Check if exam code already exists
-        existing = supabase_admin.table("exams").select("*").eq(
-            "exam_code", exam_data.exam_code
-        ).execute()
-        
-        if existing.data:
+        if await repository.get_exam_by_code(exam_data.exam_code):
             raise HTTPException(status_code=400, detail="Exam code already exists")
         
         # Prepare exam data - exclude subject_code, add subject_id
@@ -113,11 +114,12 @@ async def create_exam(
         exam_dict["status"] = "active"
         
         # Create exam
-        result = supabase_admin.table("exams").insert(exam_dict).execute()
+        exam = await repository.create_exam(exam_dict)
+        await metadata_cache.invalidate_exam(exam["id"], teacher_id)
         
         return {
             "message": "Exam created successfully",
-            "exam": result.data[0]
+            "exam": exam
         }
         
     except HTTPException:
@@ -137,30 +139,33 @@ async def add_questions_to_exam(
     if user_type != "teacher":
         raise HTTPException(status_code=403, detail="Only teachers can add questions")
     
-    supabase_admin = get_supabase_admin()
+    repository = get_repository()
     
     try:
         # Verify exam exists and teacher owns it
         teacher_id = current_user.get("user_id", current_user.get("id"))
-        exam_result = supabase_admin.table("exams").select("*").eq(
-            "id", exam_id
-        ).eq("created_by", teacher_id).execute()
+        exam = await metadata_cache.exam(exam_id)
         
-        if not exam_result.data:
+        if not exam or exam["created_by"] != teacher_id:
             raise HTTPException(status_code=404, detail="Exam not found or access denied")
         
+        # Embed all model answers once, here, instead of for every student who answers
+        embeddings = await ai_service.try_embed_model_answers([q.sample_answer for q in questions])
+        
         # Add questions
         questions_data = []
-        for q in questions:
+        for q, embedding in zip(questions, embeddings):
             q_dict = q.model_dump()
             q_dict["exam_id"] = exam_id
+            q_dict["sample_answer_embedding"] = embedding
             questions_data.append(q_dict)
         
-        result = supabase_admin.table("questions").insert(questions_data).execute()
+        stored_questions = await repository.create_questions(questions_data)
+        await metadata_cache.invalidate_questions(exam_id)
         
         return {
             "message": f"Added {len(questions)} questions successfully",
-            "questions": result.data
+            "questions": stored_questions
         }
         
     except HTTPException:
@@ -168,6 +173,55 @@ async def add_questions_to_exam(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to add questions: {str(e)}")
 
+@router.put("/exams/{exam_id}/questions/{question_id}")
+async def update_question(
+    exam_id: str,
+    question_id: str,
+    question_data: AdminQuestionUpdate,
+    current_user: dict = Depends(get_current_user)
+):
+    """Update a question of an exam (teachers only)"""
+    
+    user_type = current_user.get("user_type", current_user.get("role"))
+    if user_type != "teacher":
+        raise HTTPException(status_code=403, detail="Only teachers can edit questions")
+    
+    repository = get_repository()
+    
+    try:
+        # Verify exam exists and teacher owns it
+        teacher_id = current_user.get("user_id", current_user.get("id"))
+        exam = await metadata_cache.exam(exam_id)
+        
+        if not exam or exam["created_by"] != teacher_id:
+            raise HTTPException(status_code=404, detail="Exam not found or access denied")
+        
+        update_dict = question_data.model_dump(exclude_unset=True)
+        if not update_dict:
+            raise HTTPException(status_code=400, detail="No fields to update")
+        
+        # The stored embedding belongs to the old model answer: replace it
+        if "sample_answer" in update_dict:
+            update_dict["sample_answer_embedding"] = (
+                await ai_service.try_embed_model_answers([update_dict["sample_answer"]])
+            )[0]
+        
+        question = await repository.update_question(exam_id, question_id, update_dict)
+        
+        if not question:
+            raise HTTPException(status_code=404, detail="Question not found")
+        await metadata_cache.invalidate_questions(exam_id)
+        
+        return {
+            "message": "Question updated successfully",
+            "question": question
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to update question: {str(e)}")
+
 @router.get("/exams/teacher")
 async def get_teacher_exams(
     current_user: dict = Depends(get_current_user)
@@ -178,18 +232,12 @@ async def get_teacher_exams(
     if user_type != "teacher":
         raise HTTPException(status_code=403, detail="Only teachers can access this endpoint")
     
-    supabase_admin = get_supabase_admin()
-    
     try:
         teacher_id = current_user.get("user_id", current_user.get("id"))
-        result = supabase_admin.table("exams").select("""
-            *,
-            subjects (subject_name, subject_code)
-        """).eq("created_by", teacher_id).execute()
         
         return {
             "teacher_id": teacher_id,
-            "exams": result.data
+            "exams": await metadata_cache.teacher_exams(teacher_id)
         }
         
     except Exception as e:
@@ -205,30 +253,25 @@ async def get_available_exams(
     if user_type != "student":
         raise HTTPException(status_code=403, detail="Only students can access this endpoint")
     
-    supabase_admin = get_supabase_admin()
+    repository = get_repository()
     
     try:
         # Get all active exams
-        result = supabase_admin.table("exams").select("""
-            *,
-            subjects (subject_name, subject_code)
-        """).eq("status", "active").execute()
+        exams = await metadata_cache.active_exams()
         
         # Check which exams student has already uploaded for
         student_id = current_user.get("user_id", current_user.get("id"))
-        student_uploads = supabase_admin.table("exam_uploads").select(
-            "exam_id"
-        ).eq("student_id", student_id).execute()
+        student_uploads = await repository.list_uploads(student_id=student_id)
         
-        uploaded_exam_ids = [upload["exam_id"] for upload in student_uploads.data]
+        uploaded_exam_ids = [upload["exam_id"] for upload in student_uploads]
         
         # Add upload status to each exam
-        for exam in result.data:
+        for exam in exams:
             exam["already_uploaded"] = exam["id"] in uploaded_exam_ids
         
         return {
             "student_id": student_id,
-            "available_exams": result.data
+            "available_exams": exams
         }
         
     except Exception as e:
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, HTTPException, Depends, status
 from pydantic import BaseModel, EmailStr
-from app.database.connection import get_supabase_admin
+from app.repositories.base import get_repository
 from app.core.auth import auth_service, get_current_user
 from datetime import timedelta
 from typing import Optional
@@ -35,20 +35,17 @@ class Token(BaseModel):
 async def register_user(user_data: UserRegister):
     """Register new user"""
     
-    supabase_admin = get_supabase_admin()
+    repository = get_repository()
     
     try:
         # Hash password
         hashed_password = auth_service.get_password_hash(user_data.password)
         
         # Check if user already exists
-        existing_user = None
-        if user_data.user_type == "student":
-            existing_user = supabase_admin.table("students").select("*").eq("email", user_data.email).execute()
-        else:
-            existing_user = supabase_admin.table("teachers").select("*").eq("email", user_data.email).execute()
+        user_type = "student" if user_data.user_type == "student" else "teacher"
+        existing_user = await repository.get_user_by_email(user_type, user_data.email)
         
-        if existing_user.data:
+        if existing_user:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="User with this email already exists"
@@ -72,7 +69,7 @@ async def register_user(user_data: UserRegister):
                 "status": "active"
             }
             
-            result = supabase_admin.table("students").insert(user_record).execute()
+            created_user = await repository.create_user("student", user_record)
             
         else:  # teacher
             if not user_data.teacher_id:
@@ -91,9 +88,7 @@ async def register_user(user_data: UserRegister):
                 "status": "active"
             }
             
-            result = supabase_admin.table("teachers").insert(user_record).execute()
-        
-        created_user = result.data[0]
+            created_user = await repository.create_user("teacher", user_record)
         
         # Create access token
         access_token = auth_service.create_access_token(
@@ -127,23 +122,19 @@ async def register_user(user_data: UserRegister):
 async def login_user(user_credentials: UserLogin):
     """Authenticate user and return token"""
     
-    supabase_admin = get_supabase_admin()
+    repository = get_repository()
     
     try:
         # Get user from appropriate table
-        if user_credentials.user_type == "student":
-            result = supabase_admin.table("students").select("*").eq("email", user_credentials.email).execute()
-        else:
-            result = supabase_admin.table("teachers").select("*").eq("email", user_credentials.email).execute()
+        user_type = "student" if user_credentials.user_type == "student" else "teacher"
+        user = await repository.get_user_by_email(user_type, user_credentials.email)
         
-        if not result.data:
+        if not user:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid email or password"
             )
         
-        user = result.data[0]
-        
         # Verify password
         if not auth_service.verify_password(user_credentials.password, user["password_hash"]):
             raise HTTPException(
@@ -1,7 +1,15 @@
-from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Depends
 from app.database.connection import get_supabase, get_supabase_admin
+from app.database.async_db import db
+from app.database.dataloader import DataLoader, get_loader
 from app.services.grading_service import GradingService
 from app.schema.grading import GradingRequest, GradingResponse
+from app.services.job_queue import JOB_GRADE_EXAM, JOB_GRADE_UPLOAD, JOB_PROCESS_UPLOAD, job_queue
+from app.services.metadata_cache import metadata_cache
+from app.repositories.base import get_repository
+from app.routers.auth import get_current_user
+from app.core.config import settings
+from app.services.ai_service import record_grading_stats
 import asyncio
 from app.schema.exam import (
     SubjectCreate, 
@@ -21,144 +29,240 @@ grading_service = GradingService()
 @router.post("/grade/{upload_id}")
 async def start_grading(
     upload_id: str,
-    background_tasks: BackgroundTasks,
-    # supabase_client = Depends(get_supabase)
+    loader: DataLoader = Depends(get_loader)
 ):
     """Start grading process for an upload"""
     
-    supabase_admin = get_supabase_admin()
     # Verify upload exists and is processed
-    upload_result = supabase_admin.table("exam_uploads").select("*").eq("id", upload_id).execute()
+    upload = await loader.load("exam_uploads", upload_id)
     
-    if not upload_result.data:
+    if not upload:
         raise HTTPException(status_code=404, detail="Upload not found")
     
-    upload = upload_result.data[0]
-    
     if upload["processing_status"] != "processed":
         raise HTTPException(status_code=400, detail="Upload not ready for grading")
     
-    # Start grading in background
-    background_tasks.add_task(grade_upload_async, upload_id)
+    # Graded by `python -m app.worker`; the job survives API restarts
+    job_id = await job_queue.submit(
+        JOB_GRADE_UPLOAD,
+        {"upload_id": upload_id},
+        priority=settings.JOB_PRIORITY_GRADE_UPLOAD,
+        dedupe_key=f"{JOB_GRADE_UPLOAD}:{upload_id}"
+    )
     
     return {
         "message": "Grading started",
         "upload_id": upload_id,
+        "job_id": job_id,
         "status": "grading_in_progress"
     }
 
 # =====================================================
-# Async Grading Function
+# Exam-wide Grading Route
 # =====================================================
+@router.post("/grade/exam/{exam_id}")
+async def start_exam_grading(
+    exam_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """Grade every processed, not yet graded upload of an exam in one batch (teachers only)"""
+    
+    user_type = current_user.get("user_type", current_user.get("role"))
+    if user_type != "teacher":
+        raise HTTPException(status_code=403, detail="Only teachers can grade exams")
+    
+    teacher_id = current_user.get("user_id", current_user.get("id"))
+    exam = await metadata_cache.exam(exam_id)
+    if not exam or exam["created_by"] != teacher_id:
+        raise HTTPException(status_code=404, detail="Exam not found or access denied")
+    
+    job_id = await job_queue.submit(
+        JOB_GRADE_EXAM,
+        {"exam_id": exam_id},
+        priority=settings.JOB_PRIORITY_GRADE_EXAM,
+        dedupe_key=f"{JOB_GRADE_EXAM}:{exam_id}"
+    )
+    
+    return {
+        "message": "Exam grading started",
+        "exam_id": exam_id,
+        "job_id": job_id,
+        "status": "grading_in_progress"
+    }
+
+@router.get("/jobs/{job_id}")
+async def get_job_status(
+    job_id: int,
+    current_user: dict = Depends(get_current_user),
+    loader: DataLoader = Depends(get_loader)
+):
+    """Status of a queued upload-processing or grading job"""
+    # SQLite read; keep it off the event loop
+    loop = asyncio.get_running_loop()
+    job = await loop.run_in_executor(None, job_queue.get, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    payload = job.pop("payload")
+    user_type = current_user.get("user_type", current_user.get("role"))
+    if user_type != "teacher":
+        # Students only see the processing of their own uploads
+        upload = await loader.load("exam_uploads", payload["upload_id"]) if job["kind"] == JOB_PROCESS_UPLOAD else None
+        if not upload or upload["student_id"] != current_user.get("user_id", current_user.get("id")):
+            raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+# =====================================================
+# Async Grading Functions
+# =====================================================
+def build_grading_row(answer: dict, upload: dict, question: dict, result) -> dict:
+    """grading_results row for one graded student answer"""
+    extracted_answer = answer["extracted_answer"] or ""
+    grading_data = {
+        "student_answer_id": answer["id"],
+        "exam_id": upload["exam_id"],
+        "student_id": upload["student_id"],
+        "question_id": question["id"],
+        "ai_assigned_marks": float(result.marks_obtained),
+        "final_marks": float(result.marks_obtained),  # Initially same as AI marks
+        "ai_feedback": result.feedback,
+        "similarity_score": result.similarity_score,
+        "ai_confidence": float(result.confidence_score)
+    }
+    # Which grading tier settled the score (empty, exact, mcq_option, numeric or embedding)
+    grading_data["grading_criteria_met"] = {"decided_by": result.decided_by}
+    if extracted_answer.strip():
+        grading_data["grading_criteria_met"].update({
+            "keywords_found": result.keywords_found or [],
+            "length_appropriate": len(extracted_answer.split()) > 10
+        })
+    return grading_data
+
 async def grade_upload_async(upload_id: str):
     """Enhanced grading with proper schema alignment"""
-    supabase_admin = get_supabase_admin()
+    repository = get_repository()
     
     try:
-        # Get all student answers for this upload
-        answers_result = supabase_admin.table("student_answers").select("""
-            *,
-            questions (
-                id,
-                question_number,
-                question_text,
-                max_marks,
-                marking_scheme,
-                sample_answer,
-                keywords
-            )
-        """).eq("upload_id", upload_id).execute()
+        # The upload with all its answers in one read; questions come from the metadata cache
+        upload = await repository.get_upload(upload_id, include_answers=True)
         
-        if not answers_result.data:
+        if not upload:
+            print(f"Upload {upload_id} not found")
+            return
+        upload = dict(upload)
+        questions = {question["id"]: question for question in await metadata_cache.exam_questions(upload["exam_id"])}
+        answers = [answer for answer in upload.pop("student_answers") or [] if answer["question_id"] in questions]
+        
+        if not answers:
             print(f"No student answers found for upload {upload_id}")
             return
         
-        # Get upload info for exam and student details
-        upload_result = supabase_admin.table("exam_uploads").select("*").eq("id", upload_id).execute()
-        upload = upload_result.data[0]
+        # Grade every answer of the upload with one batched embedding pass
+        ai_service = grading_service.ai_service
+        question_datas = [ai_service.question_data_from_row(questions[answer["question_id"]]) for answer in answers]
+        plan = ai_service.plan([
+            (question_data, answer["extracted_answer"] or "")
+            for question_data, answer in zip(question_datas, answers)
+        ])
+        await ai_service.embed([plan])
+        results = ai_service.finish(plan)
+        await record_grading_stats(repository, plan, [upload["exam_id"]] * len(answers))
         
-        # Grade each answer
-        for answer in answers_result.data:
-            question = answer["questions"]
-            
-            if not answer["extracted_answer"] or not answer["extracted_answer"].strip():
-                # Create record for unanswered question
-                grading_data = {
-                    "student_answer_id": answer["id"],
-                    "exam_id": upload["exam_id"],
-                    "student_id": upload["student_id"],
-                    "question_id": question["id"],
-                    "ai_assigned_marks": 0,
-                    "final_marks": 0,
-                    "ai_feedback": "No answer provided",
-                    "similarity_score": 0.0,
-                    "ai_confidence": 1.0
-                }
-                supabase_admin.table("grading_results").insert(grading_data).execute()
-                continue
-            
-            # Grade the answer using AI
-            marks, feedback, confidence = await grading_service.grade_answer(
-                question["question_text"],
-                answer["extracted_answer"],
-                question.get("sample_answer", ""),
-                question.get("keywords", {}) if question.get("keywords") else {},
-                float(question["max_marks"])
-            )
-            
-            # Calculate similarity score (this would be done in grading service)
-            similarity_score = grading_service._calculate_similarity(
-                answer["extracted_answer"], 
-                question.get("sample_answer", "")
-            )
-            
-            # Create grading result record
-            grading_data = {
-                "student_answer_id": answer["id"],
-                "exam_id": upload["exam_id"],
-                "student_id": upload["student_id"],
-                "question_id": question["id"],
-                "ai_assigned_marks": float(marks),
-                "final_marks": float(marks),  # Initially same as AI marks
-                "ai_feedback": feedback,
-                "similarity_score": similarity_score,
-                "ai_confidence": float(confidence),
-                "grading_criteria_met": {
-                    "keywords_found": grading_service._check_keywords(
-                        answer["extracted_answer"], 
-                        question.get("keywords", {}).get("required", []) if question.get("keywords") else []
-                    ),
-                    "length_appropriate": len(answer["extracted_answer"].split()) > 10
-                }
-            }
-            
-            supabase_admin.table("grading_results").insert(grading_data).execute()
+        # Re-grading replaces earlier results instead of duplicating them
+        await repository.delete_grading_results([answer["id"] for answer in answers])
+        
+        await repository.create_grading_results([
+            build_grading_row(answer, upload, questions[answer["question_id"]], result)
+            for answer, result in zip(answers, results)
+        ])
         
         print(f"Grading completed for upload {upload_id}")
         
     except Exception as e:
         print(f"Grading failed for upload {upload_id}: {str(e)}")
+        raise
+
+async def grade_exam_async(exam_id: str):
+    """Grade all ungraded answers of an exam with one embedding and scoring pass"""
+    repository = get_repository()
+    
+    try:
+        uploads = {
+            upload["id"]: upload
+            for upload in await repository.list_uploads(exam_id=exam_id, processing_status="processed")
+        }
+        if not uploads:
+            print(f"No processed uploads found for exam {exam_id}")
+            return
+        
+        questions = {question["id"]: question for question in await metadata_cache.exam_questions(exam_id)}
+        
+        # One payload per question, shared by every student's answer to it
+        ai_service = grading_service.ai_service
+        question_datas = {
+            question_id: ai_service.question_data_from_row(question)
+            for question_id, question in questions.items()
+        }
+        
+        graded_ids = await repository.list_graded_answer_ids(exam_id)
+        
+        # Fetched in chunks of upload ids by the repository
+        answers = [
+            answer for answer in await repository.list_answers(list(uploads))
+            if answer["id"] not in graded_ids and answer["question_id"] in questions
+        ]
+        
+        if not answers:
+            print(f"No ungraded answers found for exam {exam_id}")
+            return
+        
+        plan = ai_service.plan([
+            (question_datas[answer["question_id"]], answer["extracted_answer"] or "")
+            for answer in answers
+        ])
+        await ai_service.embed([plan])
+        results = ai_service.finish(plan)
+        
+        rows = [
+            build_grading_row(
+                answer,
+                uploads[answer["upload_id"]],
+                questions[answer["question_id"]],
+                result
+            )
+            for answer, result in zip(answers, results)
+        ]
+        await repository.create_grading_results(rows)
+        
+        # Identical answers to a question are graded once; add how much that saved to the exam's totals
+        await record_grading_stats(repository, plan, [exam_id] * len(answers))
+        
+        print(f"Grading completed for exam {exam_id}: {len(rows)} answers from {len(uploads)} uploads")
+        
+    except Exception as e:
+        print(f"Grading failed for exam {exam_id}: {str(e)}")
+        raise
 
 
 # =====================================================
 # Grading Status Route (FIXED)
 # =====================================================
 @router.get("/grade/status/{upload_id}")
-async def get_grading_status(upload_id: str):
+async def get_grading_status(upload_id: str, loader: DataLoader = Depends(get_loader)):
     """Get grading status for an upload"""
     
     supabase_admin = get_supabase_admin()
     
-    # First get the upload to verify it exists
-    upload = supabase_admin.table("exam_uploads").select("*").eq("id", upload_id).execute()
+    # The upload and its answers are looked up together
+    upload, answers = await asyncio.gather(
+        loader.load("exam_uploads", upload_id),
+        loader.load_all("student_answers", upload_id, column="upload_id")
+    )
     
-    if not upload.data:
+    if not upload:
         raise HTTPException(status_code=404, detail="Upload not found")
     
-    # Get student answers for this upload
-    answers = supabase_admin.table("student_answers").select("id").eq("upload_id", upload_id).execute()
-    
-    if not answers.data:
+    if not answers:
         return {
             "upload_id": upload_id,
             "total_questions": 0,
@@ -166,13 +270,13 @@ async def get_grading_status(upload_id: str):
             "results_available": False
         }
     
-    answer_ids = [ans["id"] for ans in answers.data]
+    answer_ids = [ans["id"] for ans in answers]
     
     # Get grading results for these answers
-    results = supabase_admin.table("grading_results").select("""
+    results = await db.execute(supabase_admin.table("grading_results").select("""
         *,
         questions (question_number, max_marks)
-    """).in_("student_answer_id", answer_ids).execute()
+    """).in_("student_answer_id", answer_ids))
     
     total_questions = len(results.data) if results.data else 0
     
@@ -194,7 +298,8 @@ async def create_subject(
 ):
     """Create a new subject"""
     try:
-        result = supabase_client.table("subjects").insert(subject_data.dict()).execute()
+        result = await db.execute(supabase_client.table("subjects").insert(subject_data.dict()))
+        await metadata_cache.invalidate_subjects(subject_data.subject_code)
         return result.data[0]
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to create subject: {str(e)}")
@@ -206,7 +311,8 @@ async def create_exam(
 ):
     """Create a new exam"""
     try:
-        result = supabase_client.table("exams").insert(exam_data.dict()).execute()
+        result = await db.execute(supabase_client.table("exams").insert(exam_data.dict()))
+        await metadata_cache.invalidate_exam(result.data[0]["id"])
         return result.data[0]
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to create exam: {str(e)}")
@@ -218,7 +324,13 @@ async def create_question(
 ):
     """Create a new question"""
     try:
-        result = supabase_client.table("questions").insert(question_data.dict()).execute()
+        question_dict = question_data.dict()
+        ai_service = grading_service.ai_service
+        question_dict["sample_answer_embedding"] = (
+            await ai_service.try_embed_model_answers([question_data.sample_answer])
+        )[0]
+        result = await db.execute(supabase_client.table("questions").insert(question_dict))
+        await metadata_cache.invalidate_questions(question_data.exam_id)
         return result.data[0]
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to create question: {str(e)}")
@@ -230,7 +342,7 @@ async def create_marking_scheme(
 ):
     """Create a marking scheme"""
     try:
-        result = supabase_client.table("marking_schemes").insert(scheme_data.dict()).execute()
+        result = await db.execute(supabase_client.table("marking_schemes").insert(scheme_data.dict()))
         return result.data[0]
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to create marking scheme: {str(e)}")
@@ -242,7 +354,7 @@ async def enroll_student(
 ):
     """Enroll student in exam"""
     try:
-        result = supabase_client.table("student_exam_enrollments").insert(enrollment_data.dict()).execute()
+        result = await db.execute(supabase_client.table("student_exam_enrollments").insert(enrollment_data.dict()))
         return result.data[0]
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to enroll student: {str(e)}")
@@ -254,7 +366,7 @@ async def assign_teacher(
 ):
     """Assign teacher to exam"""
     try:
-        result = supabase_client.table("teacher_exam_assignments").insert(assignment_data.dict()).execute()
+        result = await db.execute(supabase_client.table("teacher_exam_assignments").insert(assignment_data.dict()))
         return result.data[0]
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to assign teacher: {str(e)}")
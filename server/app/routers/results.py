@@ -1,5 +1,7 @@
 from fastapi import APIRouter, HTTPException, Depends
 from app.database.connection import get_supabase
+from app.database.async_db import db
+from app.services.metadata_cache import metadata_cache
 from app.routers.auth import get_current_user  # ADD THIS IMPORT
 from typing import List, Dict, Any
 
@@ -21,7 +23,7 @@ async def get_current_student_results(
     student_id = current_user["user_id"]
     
     # Query grading_results directly with nested relations
-    results = supabase_admin.table("grading_results").select("""
+    results = await db.execute(supabase_admin.table("grading_results").select("""
         *,
         exams (
             exam_name, 
@@ -34,7 +36,7 @@ async def get_current_student_results(
             question_text, 
             max_marks
         )
-    """).eq("student_id", student_id).execute()
+    """).eq("student_id", student_id))
     
     if not results.data:
         return {"student_id": student_id, "exams": []}
@@ -73,7 +75,7 @@ async def get_current_student_results(
 async def get_student_results(student_id: str, supabase_client = Depends(get_supabase)):
     """Get all results for a student with enhanced schema support"""
     
-    results = supabase_client.table("grading_results").select("""
+    results = await db.execute(supabase_client.table("grading_results").select("""
         *,
         exams (
             exam_name, 
@@ -84,7 +86,7 @@ async def get_student_results(student_id: str, supabase_client = Depends(get_sup
         ),
         questions (question_number, question_text, max_marks),
         student_answers (extracted_answer, confidence_score)
-    """).eq("student_id", student_id).execute()
+    """).eq("student_id", student_id))
     
     if not results.data:
         return {"student_id": student_id, "exams": []}
@@ -153,23 +155,18 @@ async def get_exam_summary(exam_id: str, supabase_client = Depends(get_supabase)
     """Get comprehensive exam summary with statistics"""
     
     # Get basic exam info
-    exam_result = supabase_client.table("exams").select("""
-        *,
-        subjects (subject_name, subject_code)
-    """).eq("id", exam_id).execute()
+    exam = await metadata_cache.exam(exam_id)
     
-    if not exam_result.data:
+    if not exam:
         raise HTTPException(status_code=404, detail="Exam not found")
     
-    exam = exam_result.data[0]
-    
     # Get all results for this exam
-    results = supabase_client.table("grading_results").select("""
+    results = await db.execute(supabase_client.table("grading_results").select("""
         *,
         student_answers (
             students (student_id, full_name)
         )
-    """).eq("exam_id", exam_id).execute()
+    """).eq("exam_id", exam_id))
     
     # Calculate statistics
     total_students = len(set([r["student_id"] for r in results.data]))
@@ -13,6 +13,9 @@ class QuestionResult(BaseModel):
     max_marks: float
     feedback: Optional[str] = None
     confidence_score: float
+    similarity_score: Optional[float] = None
+    keywords_found: Optional[List[str]] = None
+    decided_by: Optional[str] = None  # Grading tier: empty, exact, mcq_option, numeric or embedding
 
 class GradingResult(BaseModel):
     exam_session_id: str
@@ -0,0 +1,41 @@
+from pydantic import BaseModel
+from typing import Dict, List, Optional
+
+class PageExtraction(BaseModel):
+    page_number: int
+    method: str  # "text_layer" or "ocr"
+    text: str = ""
+    line_confidences: List[float] = []  # Tesseract confidence (0-1) of each line of text; empty for text layer pages
+
+    def line_confidence(self, index: int) -> float:
+        """Confidence of one line of text; text layer lines are exact"""
+        if index < len(self.line_confidences):
+            return self.line_confidences[index]
+        return 1.0
+
+class ExtractedAnswer(BaseModel):
+    question_number: int
+    text: str
+    confidence: Optional[float] = None  # mean confidence of the answer's lines
+    pages: List[int] = []  # pages the answer was read from
+
+class OCRExtraction(BaseModel):
+    answers: List[ExtractedAnswer] = []
+    pages: List[PageExtraction] = []
+
+    def answer_texts(self) -> Dict[str, str]:
+        """Answers keyed "question_<n>", as marking schemes refer to them"""
+        return {f"question_{answer.question_number}": answer.text for answer in self.answers}
+
+    def display_text(self) -> str:
+        """One "Q<n>: <answer>" line per answer, for display only"""
+        return "\n".join(f"Q{answer.question_number}: {answer.text}" for answer in self.answers)
+
+    def confidence(self) -> float:
+        """Mean confidence over the extracted answers"""
+        scores = [answer.confidence for answer in self.answers if answer.confidence is not None]
+        return round(sum(scores) / len(scores), 2) if scores else 0.0
+
+    def page_methods(self) -> List[Dict[str, object]]:
+        """Compact per-page record of how each page was read"""
+        return [{"page": page.page_number, "method": page.method} for page in self.pages]
@@ -1,158 +1,232 @@
 # app/services/ai_service.py
-from typing import Dict, Any, List
-import asyncio
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
+from collections import Counter
+from typing import Dict, Any, List, Optional, Tuple
+import numpy as np
+from app.core.config import settings
+from app.repositories.base import Repository
+from app.services.model_registry import ModelRegistry, model_registry
+from app.services.embedding_batcher import EmbeddingBatcher, embedding_batcher
+from app.services.embedding_cache import EmbeddingCache, embedding_cache
+from app.services.scoring_engine import TIER_EMBEDDING, ScoringEngine, answer_key, collapse_whitespace, scoring_engine
 from app.schema.grading import QuestionResult
-import re
+from app.utils.embedding_codec import pack_embedding, unpack_embedding
+
+class GradingPlan:
+    """Distinct answers of a grading batch; rule-decided results are filled in, the rest await similarity"""
+
+    def __init__(
+        self,
+        items: List[Tuple[Dict[str, Any], str]],
+        questions: List[Dict[str, Any]],
+        question_index: np.ndarray,
+        student_answers: List[str],
+        item_groups: List[int],
+        results: List[Optional[QuestionResult]]
+    ):
+        self.items = items
+        self.questions = questions
+        self.question_index = question_index
+        self.student_answers = student_answers
+        self.item_groups = item_groups
+        self.results = results
+        self.pending = [i for i, result in enumerate(results) if result is None]
+        self.pending_index = question_index[self.pending]
+        self.pending_texts = [student_answers[i] for i in self.pending]
+        self.similarities: Optional[np.ndarray] = None
+        self.final_results: Optional[List[QuestionResult]] = None
+
+    def dedup_counts(self, item_keys: List[Any]) -> Dict[Any, Dict[str, Any]]:
+        """Answers, distinct answers and answers per grading tier, per key (e.g. exam id) of each item"""
+        counts: Dict[Any, Dict[str, Any]] = {}
+        for key, group in zip(item_keys, self.item_groups):
+            entry = counts.setdefault(key, {"total_answers": 0, "groups": set(), "decided_by": Counter()})
+            entry["total_answers"] += 1
+            entry["groups"].add(group)
+            # Whatever the rule tiers left is decided by embedding similarity
+            result = self.results[group]
+            entry["decided_by"][result.decided_by if result is not None else TIER_EMBEDDING] += 1
+        return {
+            key: {
+                "total_answers": entry["total_answers"],
+                "distinct_answers": len(entry["groups"]),
+                "decided_by": dict(entry["decided_by"])
+            }
+            for key, entry in counts.items()
+        }
+
+
+async def record_grading_stats(repository: Repository, plan: GradingPlan, exam_ids: List[str]):
+    """Add a graded plan's counts to each exam's grading stats; exam_ids has one entry per plan item
+
+    A failed stats write is logged and doesn't fail the grading it describes.
+    """
+    for exam_id, counts in plan.dedup_counts(exam_ids).items():
+        try:
+            await repository.add_exam_grading_stats(exam_id, counts)
+        except Exception as e:
+            print(f"Could not record grading stats for exam {exam_id}: {str(e)}")
+
 
 class AIGradingService:
-    def __init__(self):
-        self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+    def __init__(
+        self,
+        registry: ModelRegistry = None,
+        batcher: EmbeddingBatcher = None,
+        cache: EmbeddingCache = None,
+        engine: ScoringEngine = None
+    ):
+        # Models live in the process-wide registry, so creating a service is cheap
+        self.registry = registry or model_registry
+        # Concurrent grading requests share forward passes through one batcher
+        self.batcher = batcher or embedding_batcher
+        # Repeated answers (MCQ letters, one-word definitions) are embedded once
+        self.cache = cache or (embedding_cache if settings.EMBEDDING_CACHE_ENABLED else None)
+        self.scoring_engine = engine or scoring_engine
+        self.model_name = self.registry.embedding_model_id
         self.similarity_threshold = 0.7
 
+    def question_data_from_row(self, question: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the grading payload for a `questions` table row"""
+        keywords = question.get("keywords") or []
+        if isinstance(keywords, dict):
+            keywords = keywords.get("required", [])
+        model_answer = question.get("sample_answer") or ""
+        return {
+            # Answers to the same question are deduplicated across uploads by this id
+            "question_id": question.get("id"),
+            "question": question.get("question_text", ""),
+            "model_answer": model_answer,
+            "marks": question.get("max_marks", 0),
+            "question_number": question.get("question_number", 0),
+            "type": question.get("question_type") or "descriptive",
+            "keywords": keywords,
+            # Precomputed at question creation; ignored if stale for this model or answer text
+            "model_answer_embedding": unpack_embedding(
+                question.get("sample_answer_embedding"), self.model_name, model_answer
+            )
+        }
+
+    async def embed_model_answers(self, sample_answers: List[Optional[str]]) -> List[Optional[Dict[str, Any]]]:
+        """Compute storable embeddings for question sample answers (None where there is no answer)"""
+        present = [i for i, answer in enumerate(sample_answers) if answer and answer.strip()]
+        embeddings = await self.encode([sample_answers[i] for i in present])
+        records: List[Optional[Dict[str, Any]]] = [None] * len(sample_answers)
+        for i, embedding in zip(present, embeddings):
+            records[i] = pack_embedding(
+                embedding, self.model_name, sample_answers[i], settings.EMBEDDING_STORAGE_DTYPE
+            )
+        return records
+
+    async def try_embed_model_answers(self, sample_answers: List[Optional[str]]) -> List[Optional[Dict[str, Any]]]:
+        """embed_model_answers, or all None if the model fails; grading embeds missing ones on first use"""
+        try:
+            return await self.embed_model_answers(sample_answers)
+        except Exception as e:
+            print(f"Could not embed model answers, storing them without embeddings: {str(e)}")
+            return [None] * len(sample_answers)
+
     async def grade_question(
         self, 
         question_data: Dict[str, Any], 
         student_answer: str
     ) -> QuestionResult:
         """Grade a single question using AI"""
-        question_text = question_data.get("question", "")
-        model_answer = question_data.get("model_answer", "")
-        max_marks = question_data.get("marks", 0)
-        question_number = question_data.get("question_number", 0)
-        
-        if not student_answer.strip():
-            return QuestionResult(
-                question_number=question_number,
-                extracted_answer=student_answer,
-                marks_obtained=0,
-                max_marks=max_marks,
-                feedback="No answer provided",
-                confidence_score=1.0
-            )
-        
-        # Calculate semantic similarity asynchronously
-        similarity_score = await self._calculate_similarity(model_answer, student_answer)
-        
-        # Calculate marks and feedback
-        marks_obtained, feedback, confidence = await self._calculate_marks(
-            question_data, student_answer, model_answer, similarity_score
-        )
-        
-        return QuestionResult(
-            question_number=question_number,
-            extracted_answer=student_answer,
-            marks_obtained=round(marks_obtained, 2),
-            max_marks=max_marks,
-            feedback=feedback,
-            confidence_score=round(confidence, 2)
-        )
-
-    async def _calculate_similarity(self, model_answer: str, student_answer: str) -> float:
-        """Calculate semantic similarity between model and student answers asynchronously"""
-        loop = asyncio.get_running_loop()
-        model_embedding = await loop.run_in_executor(None, self.embedding_model.encode, [model_answer])
-        student_embedding = await loop.run_in_executor(None, self.embedding_model.encode, [student_answer])
-        similarity = cosine_similarity(model_embedding, student_embedding)[0][0]
-        return float(similarity)
-    
-    async def _calculate_marks(
-        self, 
-        question_data: Dict[str, Any], 
-        student_answer: str, 
-        model_answer: str, 
-        similarity_score: float
-    ) -> tuple:
-        """Calculate marks, feedback, and confidence"""
-        max_marks = question_data.get("marks", 0)
-        question_type = question_data.get("type", "descriptive")
-        keywords = question_data.get("keywords", [])
-        
-        # Base scoring based on similarity
-        if similarity_score >= 0.9:
-            marks_ratio = 1.0
-            feedback = "Excellent answer"
-        elif similarity_score >= 0.7:
-            marks_ratio = 0.8
-            feedback = "Good answer with minor gaps"
-        elif similarity_score >= 0.5:
-            marks_ratio = 0.6
-            feedback = "Partial answer, missing key points"
-        elif similarity_score >= 0.3:
-            marks_ratio = 0.4
-            feedback = "Basic understanding shown, needs improvement"
-        else:
-            marks_ratio = 0.2
-            feedback = "Answer needs significant improvement"
-        
-        # Adjust for keywords
-        if keywords:
-            keyword_score = await self._check_keywords(student_answer, keywords)
-            marks_ratio = (marks_ratio * 0.7) + (keyword_score * 0.3)
-            if keyword_score > 0.8:
-                feedback += " - Contains most key terms"
-            elif keyword_score > 0.5:
-                feedback += " - Contains some key terms"
-            else:
-                feedback += " - Missing important key terms"
-        
-        # Question type adjustments
-        if question_type == "numerical":
-            marks_ratio = await self._grade_numerical_answer(student_answer, model_answer, marks_ratio)
-        elif question_type == "mcq":
-            marks_ratio = 1.0 if similarity_score > 0.8 else 0.0
-            feedback = "Correct" if marks_ratio == 1.0 else "Incorrect"
+        results = await self.grade_questions([(question_data, student_answer)])
+        return results[0]
+
+    async def grade_questions(
+        self,
+        items: List[Tuple[Dict[str, Any], str]]
+    ) -> List[QuestionResult]:
+        """Grade a batch of (question_data, student_answer) pairs with one embedding pass"""
+        plan = self.plan(items)
+        await self.embed([plan])
+        return self.finish(plan)
+
+    def plan(self, items: List[Tuple[Dict[str, Any], str]]) -> GradingPlan:
+        """Deduplicate a batch and settle what the cheap rule tiers can decide
+
+        Items for the same question (same question_id, or the same question_data
+        object when there is no id) share its model-answer embedding, and
+        identical answers to the same question are graded once, across every
+        student in the batch. Answers are
+        graded with whitespace collapsed, the text answer_key hashes.
+        """
+        questions: List[Dict[str, Any]] = []
+        positions: Dict[Any, int] = {}
+        groups: Dict[Tuple[int, str], int] = {}  # (question position, answer key) -> distinct answer
+        question_index, student_answers, item_groups = [], [], []
+        for question_data, student_answer in items:
+            question_key = question_data.get("question_id") or id(question_data)
+            if question_key not in positions:
+                positions[question_key] = len(questions)
+                questions.append(question_data)
+            key = (positions[question_key], answer_key(student_answer))
+            if key not in groups:
+                groups[key] = len(student_answers)
+                question_index.append(key[0])
+                student_answers.append(collapse_whitespace(student_answer))
+            item_groups.append(groups[key])
+        question_index = np.array(question_index, dtype=np.int64)
+        self.scoring_engine.record_submitted(len(items))
         
-        marks_obtained = max_marks * marks_ratio
-        confidence = max(0.1, min(0.9, similarity_score + 0.1))
+        # Cheap rule tiers first; only what they cannot decide reaches the model
+        results = self.scoring_engine.cascade(questions, question_index, student_answers)
+        return GradingPlan(items, questions, question_index, student_answers, item_groups, results)
+
+    async def embed(self, plans: List[GradingPlan]) -> None:
+        """Compute similarities for the pending answers of several plans in one encode call"""
+        texts: List[str] = []
+        slices = []
+        for plan in plans:
+            # Only model answers without a stored embedding need the model, once per question
+            used = sorted(set(plan.pending_index.tolist()))
+            missing = [q for q in used if plan.questions[q].get("model_answer_embedding") is None]
+            slices.append((used, missing, len(texts)))
+            texts.extend(plan.questions[q].get("model_answer", "") for q in missing)
+            texts.extend(plan.pending_texts)
         
-        return marks_obtained, feedback, confidence
+        embeddings = await self.encode(texts) if texts else None
+        for plan, (used, missing, offset) in zip(plans, slices):
+            if not plan.pending:
+                plan.similarities = np.zeros(0, dtype=np.float32)
+                continue
+            model_rows = embeddings[offset:offset + len(missing)]
+            student_embeddings = embeddings[offset + len(missing):offset + len(missing) + len(plan.pending)]
+            
+            model_embeddings = np.zeros((len(plan.questions), student_embeddings.shape[1]), dtype=np.float32)
+            for q in used:
+                if plan.questions[q].get("model_answer_embedding") is not None:
+                    model_embeddings[q] = plan.questions[q]["model_answer_embedding"]
+            model_embeddings[missing] = model_rows
+            plan.similarities = self.scoring_engine.similarities(model_embeddings, student_embeddings, plan.pending_index)
 
-    async def _check_keywords(self, student_answer: str, keywords: List[str]) -> float:
-        """Check for presence of keywords in student answer"""
-        student_answer_lower = student_answer.lower()
-        found_keywords = sum(1 for keyword in keywords if keyword.lower() in student_answer_lower)
-        return found_keywords / len(keywords) if keywords else 0
+    def finish(self, plan: GradingPlan) -> List[QuestionResult]:
+        """Score the embedded answers and fan each distinct answer's grade out to its items
 
-    async def _grade_numerical_answer(self, student_answer: str, model_answer: str, base_ratio: float) -> float:
-        """Grade numerical answers with tolerance"""
-        try:
-            student_nums = self._extract_numbers(student_answer)
-            model_nums = self._extract_numbers(model_answer)
-            if not student_nums or not model_nums:
-                return base_ratio
-
-            student_primary = student_nums[-1]
-            model_primary = model_nums[-1]
-
-            if model_primary != 0:
-                percentage_diff = abs(student_primary - model_primary) / abs(model_primary)
-                if percentage_diff <= 0.01:
-                    return 1.0
-                elif percentage_diff <= 0.05:
-                    return 0.9
-                elif percentage_diff <= 0.1:
-                    return 0.7
-                else:
-                    return 0.3
-            else:
-                return 1.0 if student_primary == model_primary else 0.0
-        except Exception:
-            return base_ratio
-
-    def _extract_numbers(self, text: str) -> List[float]:
-        """Extract numbers from text"""
-        pattern = r'-?\d+\.?\d*'
-        matches = re.findall(pattern, text)
-        numbers = []
-        for match in matches:
-            try:
-                numbers.append(float(match))
-            except ValueError:
-                continue
-        return numbers
+        A plan shared by several uploads is scored once; later calls return the same results.
+        """
+        if plan.final_results is not None:
+            return plan.final_results
+        results = list(plan.results)
+        scored = self.scoring_engine.score(plan.questions, plan.pending_index, plan.pending_texts, plan.similarities)
+        for i, result in zip(plan.pending, scored):
+            results[i] = result
+        
+        # Everyone who gave the same answer gets its grade, keeping their own text
+        plan.final_results = [
+            results[group] if student_answer == plan.student_answers[group]
+            else results[group].model_copy(update={"extracted_answer": student_answer})
+            for (_, student_answer), group in zip(plan.items, plan.item_groups)
+        ]
+        return plan.final_results
 
+    async def encode(self, texts: List[str]) -> np.ndarray:
+        """Embed texts through the embedding cache and shared micro-batcher; rows are L2-normalized"""
+        if self.cache is None:
+            return await self.batcher.encode(texts)
+        return await self.cache.get_or_compute(self.model_name, texts, self.batcher.encode)
+    
     async def generate_overall_feedback(self, question_results: List[QuestionResult], percentage: float) -> str:
         """Generate overall feedback for the exam"""
         if percentage >= 90:
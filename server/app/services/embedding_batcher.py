@@ -0,0 +1,144 @@
+# app/services/embedding_batcher.py
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from typing import Any, Dict, List, NamedTuple, Optional
+import asyncio
+import time
+import numpy as np
+from app.core.config import settings
+from app.services.model_registry import ModelRegistry, model_registry
+
+
+class _EncodeRequest(NamedTuple):
+    texts: List[str]
+    future: asyncio.Future
+    enqueued_at: float
+
+
+class EmbeddingBatcher:
+    """Collects encode requests from concurrent coroutines into batched forward passes
+
+    Requests are gathered until max_batch_size texts are pending or max_wait_ms
+    has passed since the first one arrived, then encoded together on a single
+    dedicated thread and each caller's future is resolved with its own rows.
+    """
+
+    def __init__(
+        self,
+        registry: ModelRegistry = None,
+        max_batch_size: int = None,
+        max_wait_ms: float = None
+    ):
+        self.registry = registry or model_registry
+        self.max_batch_size = max_batch_size or settings.EMBEDDING_MAX_BATCH_SIZE
+        self.max_wait = (max_wait_ms if max_wait_ms is not None else settings.EMBEDDING_MAX_WAIT_MS) / 1000
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding")
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._latencies = deque(maxlen=1000)
+        self._stats = {
+            "requests": 0,
+            "texts": 0,
+            "batches": 0,
+            "max_batch_texts": 0,
+            "encode_seconds": 0.0,
+            "errors": 0,
+        }
+
+    async def encode(self, texts: List[str]) -> np.ndarray:
+        """Embed texts (L2-normalized rows), sharing a forward pass with concurrent callers"""
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        self._ensure_worker()
+        future = self._loop.create_future()
+        await self._queue.put(_EncodeRequest(list(texts), future, time.perf_counter()))
+        return await future
+
+    def _ensure_worker(self):
+        loop = asyncio.get_running_loop()
+        # Restart the collector if it belongs to a previous event loop (e.g. a new asyncio.run)
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._collect())
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            batch_texts = len(batch[0].texts)
+            deadline = loop.time() + self.max_wait
+
+            while batch_texts < self.max_batch_size:
+                timeout = deadline - loop.time()
+                try:
+                    request = self._queue.get_nowait() if timeout <= 0 else await asyncio.wait_for(self._queue.get(), timeout)
+                except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                    break
+                batch.append(request)
+                batch_texts += len(request.texts)
+
+            await self._encode_batch(batch)
+
+    async def _encode_batch(self, batch: List[_EncodeRequest]):
+        batch = [request for request in batch if not request.future.done()]
+        if not batch:
+            return
+        texts = [text for request in batch for text in request.texts]
+
+        started_at = time.perf_counter()
+        try:
+            embeddings = await self._loop.run_in_executor(self._executor, self._encode, texts)
+        except Exception as e:
+            self._stats["errors"] += 1
+            for request in batch:
+                if not request.future.done():
+                    request.future.set_exception(e)
+            return
+        finished_at = time.perf_counter()
+
+        self._stats["batches"] += 1
+        self._stats["requests"] += len(batch)
+        self._stats["texts"] += len(texts)
+        self._stats["max_batch_texts"] = max(self._stats["max_batch_texts"], len(texts))
+        self._stats["encode_seconds"] += finished_at - started_at
+
+        offset = 0
+        for request in batch:
+            rows = embeddings[offset:offset + len(request.texts)]
+            offset += len(request.texts)
+            self._latencies.append(finished_at - request.enqueued_at)
+            if not request.future.done():
+                request.future.set_result(rows)
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        # A single exam-wide request can be far larger than max_batch_size; cap padded batch memory
+        embeddings = self.registry.embedding_model.encode(
+            texts, batch_size=min(len(texts), self.max_batch_size), normalize_embeddings=True
+        )
+        return np.asarray(embeddings, dtype=np.float32)
+
+    def stats(self) -> Dict[str, Any]:
+        """Batching, throughput and latency figures"""
+        latencies = np.array(self._latencies) * 1000 if self._latencies else None
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            **self._stats,
+            "encode_seconds": round(self._stats["encode_seconds"], 3),
+            "avg_batch_texts": round(self._stats["texts"] / self._stats["batches"], 2) if self._stats["batches"] else 0.0,
+            "texts_per_second": round(self._stats["texts"] / self._stats["encode_seconds"], 1) if self._stats["encode_seconds"] else 0.0,
+            "latency_ms_p50": round(float(np.percentile(latencies, 50)), 2) if latencies is not None else None,
+            "latency_ms_p95": round(float(np.percentile(latencies, 95)), 2) if latencies is not None else None,
+            "latency_ms_p99": round(float(np.percentile(latencies, 99)), 2) if latencies is not None else None,
+        }
+
+    def shutdown(self):
+        if self._worker is not None:
+            self._worker.cancel()
+        self._executor.shutdown(wait=False)
+
+
+embedding_batcher = EmbeddingBatcher()
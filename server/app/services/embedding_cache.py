@@ -0,0 +1,167 @@
+# app/services/embedding_cache.py
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import asyncio
+import hashlib
+import sqlite3
+import time
+import numpy as np
+from app.core.config import settings
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace (and case, for uncased models) so trivially different answers share an entry"""
+    text = " ".join((text or "").split())
+    return text.lower() if settings.EMBEDDING_CACHE_LOWERCASE else text
+
+
+class EmbeddingCache:
+    """Two-tier embedding cache: an in-memory LRU in front of a SQLite store
+
+    Keys are the model id plus the normalized text, so switching models or
+    backends never returns vectors from another embedding space.
+    """
+
+    def __init__(self, path: str = None, memory_items: int = None, disk_max_mb: int = None):
+        self.path = Path(path or settings.EMBEDDING_CACHE_PATH)
+        self.memory_items = memory_items if memory_items is not None else settings.EMBEDDING_CACHE_MEMORY_ITEMS
+        self.disk_max_bytes = (disk_max_mb if disk_max_mb is not None else settings.EMBEDDING_CACHE_DISK_MAX_MB) * 1024 * 1024
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        # SQLite connections are used from a single dedicated thread
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding-cache")
+        self._connection: Optional[sqlite3.Connection] = None
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "disk_evictions": 0}
+
+    @staticmethod
+    def key_for(model_id: str, text: str) -> str:
+        return hashlib.sha256(f"{model_id}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+    async def get_or_compute(
+        self,
+        model_id: str,
+        texts: List[str],
+        compute: Callable[[List[str]], Awaitable[np.ndarray]]
+    ) -> np.ndarray:
+        """Return embeddings for texts, computing (and caching) only the ones never seen before"""
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        keys = [self.key_for(model_id, text) for text in texts]
+        found: Dict[str, np.ndarray] = {}
+
+        for key in set(keys):
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                found[key] = vector
+        memory_keys = set(found)
+
+        disk_keys = [key for key in set(keys) if key not in found]
+        if disk_keys:
+            loop = asyncio.get_running_loop()
+            from_disk = await loop.run_in_executor(self._executor, self._read, disk_keys)
+            for key, vector in from_disk.items():
+                found[key] = vector
+                self._remember(key, vector)
+
+        # Identical texts in one call are embedded once
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+
+        for key in keys:
+            if key in missing:
+                self._stats["misses"] += 1
+            elif key in memory_keys:
+                self._stats["memory_hits"] += 1
+            else:
+                self._stats["disk_hits"] += 1
+
+        if missing:
+            vectors = await compute(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            for key, vector in computed.items():
+                found[key] = vector
+                self._remember(key, vector)
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self._executor, self._write, computed)
+
+        return np.stack([found[key] for key in keys]).astype(np.float32, copy=False)
+
+    def _remember(self, key: str, vector: np.ndarray):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _db(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+            connection.commit()
+            self._connection = connection
+        return self._connection
+
+    def _read(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        db = self._db()
+        found = {}
+        # Stay under SQLite's bound-parameter limit
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows = db.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk
+            ).fetchall()
+            for key, blob in rows:
+                found[key] = np.frombuffer(blob, dtype=np.float32)
+        if found:
+            now = time.time()
+            db.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, key) for key in found])
+            db.commit()
+        return found
+
+    def _write(self, vectors: Dict[str, np.ndarray]):
+        db = self._db()
+        now = time.time()
+        db.executemany(
+            "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+            [(key, np.asarray(vector, dtype=np.float32).tobytes(), now) for key, vector in vectors.items()]
+        )
+        # Size-based eviction: keep the most recently used rows that fit in the budget
+        row_bytes = len(next(iter(vectors.values()))) * 4 + 100  # vector + key and row overhead
+        max_rows = max(1, self.disk_max_bytes // row_bytes)
+        (rows,) = db.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        if rows > max_rows:
+            db.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                (rows - max_rows,)
+            )
+            self._stats["disk_evictions"] += rows - max_rows
+        db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit ratios per tier"""
+        lookups = self._stats["memory_hits"] + self._stats["disk_hits"] + self._stats["misses"]
+        hits = self._stats["memory_hits"] + self._stats["disk_hits"]
+        return {
+            **self._stats,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_hit_ratio": round(self._stats["memory_hits"] / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "memory_max_entries": self.memory_items,
+            "disk_max_mb": round(self.disk_max_bytes / (1024 * 1024), 1),
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+embedding_cache = EmbeddingCache()
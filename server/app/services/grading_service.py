@@ -4,6 +4,7 @@ from datetime import datetime
 from fastapi import HTTPException
 from app.core.config import settings
 from app.database.session import DatabaseSession
+from app.database.async_db import db
 from app.services.ocr_service import OCRService
 from app.services.ai_service import AIGradingService
 from app.schema.grading import GradingResult, QuestionResult
@@ -28,21 +29,14 @@ class GradingService:
         # Extract answers using OCR
         extracted_answers = await self.ocr_service.extract_answers(session_data["file_path"])
 
-        # Grade each question
-        question_results = []
-        total_marks = 0
-        max_total_marks = 0
-
-        for question_num, question_data in marking_scheme.items():
-            if question_num.startswith("question_"):
-                extracted_answer = extracted_answers.get(question_num, "")
-
-                # Grade this question
-                question_result = await self.ai_service.grade_question(question_data, extracted_answer)
-
-                question_results.append(question_result)
-                total_marks += question_result.marks_obtained
-                max_total_marks += question_result.max_marks
+        # Grade all questions together so answers are embedded in one batch
+        question_results = await self.ai_service.grade_questions([
+            (question_data, extracted_answers.get(question_num, ""))
+            for question_num, question_data in marking_scheme.items()
+            if question_num.startswith("question_")
+        ])
+        total_marks = sum(result.marks_obtained for result in question_results)
+        max_total_marks = sum(result.max_marks for result in question_results)
 
         # Calculate percentage
         percentage = (total_marks / max_total_marks * 100) if max_total_marks > 0 else 0
@@ -71,11 +65,10 @@ class GradingService:
     async def get_grading_status(self, exam_session_id: str) -> Dict[str, Any]:
         """Get grading status for an exam session"""
         try:
-            result = (
+            result = await db.execute(
                 self.db_session.client.table("exam_sessions")
                 .select("id,status,graded_at")
                 .eq("id", exam_session_id)
-                .execute()
             )
 
             if not result.data:
@@ -89,12 +82,11 @@ class GradingService:
     async def get_user_results(self, user_id: str) -> List[Dict[str, Any]]:
         """Get all results for a user"""
         try:
-            result = (
+            result = await db.execute(
                 self.db_session.client.table("grading_results")
                 .select("*")
                 .eq("student_id", user_id)
                 .order("graded_at", desc=True)
-                .execute()
             )
 
             return result.data or []
@@ -105,13 +97,12 @@ class GradingService:
     async def get_detailed_result(self, exam_session_id: str, user_id: str) -> Dict[str, Any]:
         """Get detailed result for an exam session"""
         try:
-            result = (
+            result = await db.execute(
                 self.db_session.client.table("grading_results")
                 .select("*")
                 .eq("exam_session_id", exam_session_id)
                 .eq("student_id", user_id)
                 .single()
-                .execute()
             )
 
             if not result.data:
@@ -125,11 +116,10 @@ class GradingService:
     async def get_exam_analytics(self, exam_id: str) -> Dict[str, Any]:
         """Get analytics for an exam"""
         try:
-            sessions = (
+            sessions = await db.execute(
                 self.db_session.client.table("exam_sessions")
                 .select("id,status,total_marks,max_marks")
                 .eq("exam_id", exam_id)
-                .execute()
             )
 
             if not sessions.data:
@@ -143,12 +133,11 @@ class GradingService:
             for session in sessions.data:
                 if session["status"] == "graded":
                     # Assume detailed results stored in grading_results
-                    result = (
+                    result = await db.execute(
                         self.db_session.client.table("grading_results")
                         .select("question_results")
                         .eq("exam_session_id", session["id"])
                         .single()
-                        .execute()
                     )
                     if result.data and "question_results" in result.data:
                         for q in result.data["question_results"]:
@@ -224,12 +213,11 @@ class GradingService:
     async def _get_exam_session(self, exam_session_id: str, user_id: str) -> Dict[str, Any]:
         """Get exam session data"""
         try:
-            result = (
+            result = await db.execute(
                 self.db_session.client.table("exam_sessions")
                 .select("*")
                 .eq("id", exam_session_id)
                 .eq("student_id", user_id)
-                .execute()
             )
 
             if not result.data:
@@ -255,9 +243,9 @@ class GradingService:
                 "graded_at": datetime.utcnow().isoformat() if status == "graded" else None,
             }
 
-            self.db_session.client.table("exam_sessions").update(update_data).eq(
+            await db.execute(self.db_session.client.table("exam_sessions").update(update_data).eq(
                 "id", exam_session_id
-            ).execute()
+            ))
 
         except Exception as e:
             raise HTTPException(
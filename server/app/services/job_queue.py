@@ -0,0 +1,237 @@
+# app/services/job_queue.py
+from functools import partial
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from app.core.config import settings
+
+# Job kinds run by app.worker
+JOB_PROCESS_UPLOAD = "process_upload"
+JOB_GRADE_UPLOAD = "grade_upload"
+JOB_GRADE_EXAM = "grade_exam"
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+
+class Job(NamedTuple):
+    id: int
+    kind: str
+    payload: Dict[str, Any]
+    priority: int
+    attempts: int
+    lease_owner: str
+
+
+class JobQueue:
+    """Durable job queue in a local SQLite file, shared by the API and worker processes
+
+    Workers claim the highest-priority due job with a lease that they renew while
+    working. A job whose lease runs out (worker crashed or was restarted) becomes
+    claimable again; failures are retried with backoff up to max_attempts.
+    """
+
+    def __init__(self, path: str = None, lease_seconds: int = None, max_attempts: int = None):
+        self.path = Path(path or settings.JOB_QUEUE_PATH)
+        self.lease_seconds = lease_seconds or settings.JOB_LEASE_SECONDS
+        self.max_attempts = max_attempts or settings.JOB_MAX_ATTEMPTS
+        self._local = threading.local()
+
+    def _db(self) -> sqlite3.Connection:
+        # One connection per thread; SQLite serializes writers across processes
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "kind TEXT NOT NULL, "
+                "payload TEXT NOT NULL, "
+                "priority INTEGER NOT NULL DEFAULT 0, "
+                "dedupe_key TEXT, "
+                "status TEXT NOT NULL, "
+                "attempts INTEGER NOT NULL DEFAULT 0, "
+                "available_at REAL NOT NULL, "
+                "lease_owner TEXT, "
+                "lease_expires_at REAL, "
+                "last_error TEXT, "
+                "created_at REAL NOT NULL, "
+                "finished_at REAL)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (status, priority DESC, available_at, id)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS jobs_dedupe ON jobs (dedupe_key, status)")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS worker_stats ("
+                "worker_id TEXT PRIMARY KEY, stats TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._local.connection = connection
+        return connection
+
+    def enqueue(self, kind: str, payload: Dict[str, Any], priority: int = 0, dedupe_key: str = None) -> int:
+        """Add a job; with dedupe_key, an identical queued or running job is returned instead"""
+        db = self._db()
+        now = time.time()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            if dedupe_key:
+                row = db.execute(
+                    "SELECT id FROM jobs WHERE dedupe_key = ? AND status IN (?, ?)",
+                    (dedupe_key, STATUS_QUEUED, STATUS_RUNNING)
+                ).fetchone()
+                if row:
+                    db.execute("COMMIT")
+                    return row["id"]
+            cursor = db.execute(
+                "INSERT INTO jobs (kind, payload, priority, dedupe_key, status, available_at, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (kind, json.dumps(payload), priority, dedupe_key, STATUS_QUEUED, now, now)
+            )
+            db.execute("COMMIT")
+            return cursor.lastrowid
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+
+    async def submit(self, kind: str, payload: Dict[str, Any], priority: int = 0, dedupe_key: str = None) -> int:
+        """enqueue() without blocking the event loop on the SQLite write lock"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, partial(self.enqueue, kind, payload, priority, dedupe_key))
+
+    def claim(self, worker_id: str, kinds: List[str] = None) -> Optional[Job]:
+        """Lease the next due job (highest priority, then oldest), or None if there is none"""
+        db = self._db()
+        now = time.time()
+        kind_filter = f" AND kind IN ({','.join('?' * len(kinds))})" if kinds else ""
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            # Jobs whose worker died without finishing are claimable again once the lease is out
+            expired = db.execute(
+                "SELECT id, attempts FROM jobs WHERE status = ? AND lease_expires_at < ?",
+                (STATUS_RUNNING, now)
+            ).fetchall()
+            for row in expired:
+                if row["attempts"] >= self.max_attempts:
+                    db.execute(
+                        "UPDATE jobs SET status = ?, lease_owner = NULL, last_error = ?, finished_at = ? WHERE id = ?",
+                        (STATUS_FAILED, "Lease expired too many times", now, row["id"])
+                    )
+                else:
+                    db.execute(
+                        "UPDATE jobs SET status = ?, lease_owner = NULL WHERE id = ?",
+                        (STATUS_QUEUED, row["id"])
+                    )
+
+            row = db.execute(
+                "SELECT * FROM jobs WHERE status = ? AND available_at <= ?" + kind_filter +
+                " ORDER BY priority DESC, available_at, id LIMIT 1",
+                (STATUS_QUEUED, now, *(kinds or []))
+            ).fetchone()
+            if row is None:
+                db.execute("COMMIT")
+                return None
+
+            db.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, lease_owner = ?, lease_expires_at = ? WHERE id = ?",
+                (STATUS_RUNNING, worker_id, now + self.lease_seconds, row["id"])
+            )
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        return Job(row["id"], row["kind"], json.loads(row["payload"]), row["priority"], row["attempts"] + 1, worker_id)
+
+    def heartbeat(self, job: Job) -> bool:
+        """Extend the lease; False if the job was reclaimed by another worker meanwhile"""
+        cursor = self._db().execute(
+            "UPDATE jobs SET lease_expires_at = ? WHERE id = ? AND lease_owner = ? AND status = ?",
+            (time.time() + self.lease_seconds, job.id, job.lease_owner, STATUS_RUNNING)
+        )
+        return cursor.rowcount == 1
+
+    def complete(self, job: Job) -> None:
+        self._db().execute(
+            "UPDATE jobs SET status = ?, lease_owner = NULL, finished_at = ? WHERE id = ? AND lease_owner = ?",
+            (STATUS_DONE, time.time(), job.id, job.lease_owner)
+        )
+
+    def fail(self, job: Job, error: str) -> None:
+        """Requeue with exponential backoff, or mark failed after max_attempts"""
+        now = time.time()
+        if job.attempts >= self.max_attempts:
+            self._db().execute(
+                "UPDATE jobs SET status = ?, lease_owner = NULL, last_error = ?, finished_at = ? "
+                "WHERE id = ? AND lease_owner = ?",
+                (STATUS_FAILED, error, now, job.id, job.lease_owner)
+            )
+            return
+        delay = settings.JOB_RETRY_BACKOFF_SECONDS * 2 ** (job.attempts - 1)
+        self._db().execute(
+            "UPDATE jobs SET status = ?, lease_owner = NULL, last_error = ?, available_at = ? "
+            "WHERE id = ? AND lease_owner = ?",
+            (STATUS_QUEUED, error, now + delay, job.id, job.lease_owner)
+        )
+
+    def purge_finished(self, older_than_seconds: float) -> int:
+        """Delete done and failed jobs that finished longer ago than older_than_seconds"""
+        cursor = self._db().execute(
+            "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+            (STATUS_DONE, STATUS_FAILED, time.time() - older_than_seconds)
+        )
+        return cursor.rowcount
+
+    def report_worker_stats(self, worker_id: str, stats: Dict[str, Any]) -> None:
+        """Publish a worker process's metrics so the API process can serve them"""
+        self._db().execute(
+            "INSERT OR REPLACE INTO worker_stats (worker_id, stats, updated_at) VALUES (?, ?, ?)",
+            (worker_id, json.dumps(stats), time.time())
+        )
+
+    def worker_stats(self, max_age_seconds: float = 300) -> Dict[str, Any]:
+        """Latest metrics of every worker that reported recently"""
+        db = self._db()
+        db.execute("DELETE FROM worker_stats WHERE updated_at < ?", (time.time() - max_age_seconds * 10,))
+        rows = db.execute(
+            "SELECT worker_id, stats, updated_at FROM worker_stats WHERE updated_at >= ?",
+            (time.time() - max_age_seconds,)
+        ).fetchall()
+        return {
+            row["worker_id"]: {**json.loads(row["stats"]), "age_seconds": round(time.time() - row["updated_at"], 1)}
+            for row in rows
+        }
+
+    def get(self, job_id: int) -> Optional[Dict[str, Any]]:
+        row = self._db().execute(
+            "SELECT id, kind, payload, status, attempts, last_error, created_at, finished_at FROM jobs WHERE id = ?",
+            (job_id,)
+        ).fetchone()
+        return {**dict(row), "payload": json.loads(row["payload"])} if row else None
+
+    def stats(self) -> Dict[str, Any]:
+        """Job counts per status and kind, and the age of the oldest queued job"""
+        db = self._db()
+        counts = db.execute("SELECT kind, status, COUNT(*) AS jobs FROM jobs GROUP BY kind, status").fetchall()
+        oldest = db.execute("SELECT MIN(created_at) FROM jobs WHERE status = ?", (STATUS_QUEUED,)).fetchone()[0]
+        by_status: Dict[str, int] = {}
+        by_kind: Dict[str, Dict[str, int]] = {}
+        for row in counts:
+            by_status[row["status"]] = by_status.get(row["status"], 0) + row["jobs"]
+            by_kind.setdefault(row["kind"], {})[row["status"]] = row["jobs"]
+        return {
+            "by_status": by_status,
+            "by_kind": by_kind,
+            "oldest_queued_seconds": round(time.time() - oldest, 1) if oldest else 0.0,
+        }
+
+
+job_queue = JobQueue()
@@ -0,0 +1,136 @@
+# app/services/keyword_matcher.py
+from collections import deque
+from functools import lru_cache
+from typing import Dict, List, Sequence, Tuple
+import re
+from app.core.config import settings
+
+WORD_PATTERN = re.compile(r"\w+")
+VOWELS = set("aeiou")
+
+
+def stem(word: str) -> str:
+    """Light suffix stripping (Porter steps 1a/1b) so 'cells'/'cell' and 'running'/'run' compare equal"""
+    if word.endswith("sses"):
+        word = word[:-2]
+    elif word.endswith("ies"):
+        word = word[:-2]
+    elif word.endswith("s") and not word.endswith("ss") and len(word) > 3:
+        word = word[:-1]
+
+    for suffix in ("ing", "ed"):
+        base = word[:-len(suffix)]
+        if word.endswith(suffix) and len(base) >= 3 and VOWELS & set(base):
+            word = base
+            # running -> runn -> run
+            if len(word) > 3 and word[-1] == word[-2] and word[-1] not in VOWELS | set("lsz"):
+                word = word[:-1]
+            break
+    return word
+
+
+class KeywordMatcher:
+    """Aho-Corasick automaton over a question's keywords
+
+    One linear pass over the answer reports every keyword it contains. Matching
+    is case-insensitive on characters by default; with word_boundary, matches
+    must not sit inside a longer word, and with stemming, keywords and answer
+    are compared as sequences of stemmed words (which implies word boundaries).
+    """
+
+    def __init__(self, keywords: Sequence[str], word_boundary: bool = False, stemming: bool = False):
+        self.keywords = list(keywords)
+        self.word_boundary = word_boundary
+        self.stemming = stemming
+
+        self._goto: List[Dict[object, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[int]] = [[]]  # pattern ids ending at each state
+
+        patterns: Dict[Tuple, List[int]] = {}
+        self._always: List[int] = []  # empty keywords match every answer, as a substring test would
+        for i, keyword in enumerate(self.keywords):
+            pattern = tuple(self._symbols(keyword))
+            if pattern:
+                patterns.setdefault(pattern, []).append(i)
+            else:
+                self._always.append(i)
+        self._patterns = list(patterns.items())
+
+        for pattern_id, (pattern, _) in enumerate(self._patterns):
+            state = 0
+            for symbol in pattern:
+                if symbol not in self._goto[state]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                    self._goto[state][symbol] = len(self._goto) - 1
+                state = self._goto[state][symbol]
+            self._output[state].append(pattern_id)
+        self._build_failure_links()
+
+    def _symbols(self, text: str) -> Sequence:
+        text = (text or "").lower()
+        if self.stemming:
+            return [stem(word) for word in WORD_PATTERN.findall(text)]
+        return text
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for symbol, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and symbol not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(symbol, 0)
+                if self._fail[next_state] == next_state:
+                    self._fail[next_state] = 0
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def match(self, text: str) -> List[str]:
+        """Keywords found in text, in the order they were given"""
+        if not self.keywords:
+            return []
+        symbols = self._symbols(text)
+        check_boundaries = self.word_boundary and not self.stemming
+        matched = set()
+        state = 0
+        for position, symbol in enumerate(symbols):
+            while state and symbol not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(symbol, 0)
+            for pattern_id in self._output[state]:
+                if pattern_id in matched:
+                    continue
+                if check_boundaries:
+                    start = position - len(self._patterns[pattern_id][0]) + 1
+                    if (start > 0 and symbols[start - 1].isalnum()) or (
+                        position + 1 < len(symbols) and symbols[position + 1].isalnum()
+                    ):
+                        continue
+                matched.add(pattern_id)
+            if len(matched) == len(self._patterns):
+                break
+
+        found = set(self._always)
+        for pattern_id in matched:
+            found.update(self._patterns[pattern_id][1])
+        return [keyword for i, keyword in enumerate(self.keywords) if i in found]
+
+    def score(self, found: List[str]) -> float:
+        """Fraction of keywords found"""
+        return len(found) / len(self.keywords) if self.keywords else 0
+
+
+@lru_cache(maxsize=4096)
+def _compile(keywords: Tuple[str, ...], word_boundary: bool, stemming: bool) -> KeywordMatcher:
+    return KeywordMatcher(keywords, word_boundary, stemming)
+
+
+def get_keyword_matcher(keywords: Sequence[str]) -> KeywordMatcher:
+    """Compiled matcher for a keyword list, reused until the question's keywords change"""
+    return _compile(
+        tuple(keywords or ()), settings.KEYWORD_MATCH_WORD_BOUNDARY, settings.KEYWORD_MATCH_STEMMING
+    )
@@ -0,0 +1,241 @@
+# app/services/metadata_cache.py
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import asyncio
+import sqlite3
+import time
+from app.core.config import settings
+from app.repositories.base import Repository, get_repository
+
+# Cached reads; each is invalidated as a whole namespace or by its key
+NS_EXAM = "exam"  # exam row with its subject, by exam id
+NS_EXAM_QUESTIONS = "exam_questions"  # questions of an exam, by exam id
+NS_ACTIVE_EXAMS = "active_exams"  # every active exam with its subject
+NS_TEACHER_EXAMS = "teacher_exams"  # exams created by a teacher, by teacher id
+NS_SUBJECT = "subject"  # subject row, by subject code
+
+# Invalidation log rows are kept this long; far longer than any process takes to poll
+INVALIDATION_LOG_RETENTION_SECONDS = 86400
+
+
+class InvalidationLog:
+    """Invalidations shared through a SQLite file by the API and worker processes on one host
+
+    A local stand-in for a pub/sub channel: writers append (namespace, key)
+    rows, and every process applies the rows it has not seen yet when it polls.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._connection: Optional[sqlite3.Connection] = None
+        self._last_id = 0
+
+    def _db(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS invalidations ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, namespace TEXT NOT NULL, key TEXT, created_at REAL NOT NULL)"
+            )
+            connection.commit()
+            # Start from now: this process has nothing cached from before
+            self._last_id = connection.execute("SELECT COALESCE(MAX(id), 0) FROM invalidations").fetchone()[0]
+            self._connection = connection
+        return self._connection
+
+    def publish(self, namespace: str, key: Optional[str]):
+        db = self._db()
+        now = time.time()
+        with db:
+            cursor = db.execute(
+                "INSERT INTO invalidations (namespace, key, created_at) VALUES (?, ?, ?)", (namespace, key, now)
+            )
+            db.execute("DELETE FROM invalidations WHERE created_at < ?", (now - INVALIDATION_LOG_RETENTION_SECONDS,))
+        # Our own invalidation was already applied locally
+        if cursor.lastrowid == self._last_id + 1:
+            self._last_id = cursor.lastrowid
+
+    def poll(self) -> List[Tuple[str, Optional[str]]]:
+        rows = self._db().execute(
+            "SELECT id, namespace, key FROM invalidations WHERE id > ? ORDER BY id", (self._last_id,)
+        ).fetchall()
+        if rows:
+            self._last_id = rows[-1][0]
+        return [(namespace, key) for _, namespace, key in rows]
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+class MetadataCache:
+    """Read-through TTL cache for exam, question and subject metadata
+
+    These rows change rarely but are read by every upload, grading run and
+    exam listing. Entries live for ttl_seconds; endpoints that create or
+    update them call the invalidate_* methods, which also publish to the
+    invalidation log so other processes drop their copies within one poll
+    interval. Callers get shallow copies of the cached rows.
+    """
+
+    def __init__(
+        self,
+        repository: Repository = None,
+        ttl_seconds: float = None,
+        max_items: int = None,
+        invalidation_log: InvalidationLog = None
+    ):
+        self._repository = repository
+        self.ttl = ttl_seconds if ttl_seconds is not None else settings.METADATA_CACHE_TTL_SECONDS
+        self.max_items = max_items or settings.METADATA_CACHE_MAX_ITEMS
+        self.invalidation_log = invalidation_log
+        # (namespace, key) -> (value, expires_at), least recently used first
+        self._entries: "OrderedDict[Tuple[str, Optional[str]], Tuple[Any, float]]" = OrderedDict()
+        self._inflight: Dict[Tuple[str, Optional[str]], asyncio.Future] = {}
+        # The invalidation log's SQLite connection is used from a single dedicated thread
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="metadata-cache")
+        self._next_poll = 0.0
+        self._stats = {"hits": 0, "misses": 0, "coalesced": 0, "expired": 0, "invalidations": 0, "remote_invalidations": 0}
+
+    @property
+    def repository(self) -> Repository:
+        if self._repository is None:
+            self._repository = get_repository()
+        return self._repository
+
+    async def exam(self, exam_id: str) -> Optional[Dict[str, Any]]:
+        """Exam row with its subject, or None"""
+        exam = await self._get(NS_EXAM, exam_id, lambda: self.repository.get_exam(exam_id))
+        return dict(exam) if exam else None
+
+    async def exam_questions(self, exam_id: str) -> List[Dict[str, Any]]:
+        """Questions of an exam ordered by question number"""
+        async def fetch():
+            questions = await self.repository.list_questions(exam_id)
+            return sorted(questions, key=lambda question: question["question_number"])
+        return [dict(question) for question in await self._get(NS_EXAM_QUESTIONS, exam_id, fetch)]
+
+    async def active_exams(self) -> List[Dict[str, Any]]:
+        """Every active exam with its subject"""
+        exams = await self._get(NS_ACTIVE_EXAMS, None, lambda: self.repository.list_exams(status="active"))
+        return [dict(exam) for exam in exams]
+
+    async def teacher_exams(self, teacher_id: str) -> List[Dict[str, Any]]:
+        """Exams created by a teacher, with their subjects"""
+        exams = await self._get(NS_TEACHER_EXAMS, teacher_id, lambda: self.repository.list_exams(created_by=teacher_id))
+        return [dict(exam) for exam in exams]
+
+    async def subject_by_code(self, subject_code: str) -> Optional[Dict[str, Any]]:
+        """Subject row for a subject code, or None"""
+        subject = await self._get(NS_SUBJECT, subject_code, lambda: self.repository.get_subject_by_code(subject_code))
+        return dict(subject) if subject else None
+
+    async def invalidate_exam(self, exam_id: str = None, teacher_id: str = None):
+        """After an exam is created or changed"""
+        if exam_id is not None:
+            await self.invalidate(NS_EXAM, exam_id)
+        await self.invalidate(NS_TEACHER_EXAMS, teacher_id)
+        await self.invalidate(NS_ACTIVE_EXAMS)
+
+    async def invalidate_questions(self, exam_id: str = None):
+        """After questions of an exam are added or changed"""
+        await self.invalidate(NS_EXAM_QUESTIONS, exam_id)
+
+    async def invalidate_subjects(self, subject_code: str = None):
+        """After a subject is created or changed"""
+        await self.invalidate(NS_SUBJECT, subject_code)
+
+    async def invalidate(self, namespace: str, key: str = None):
+        """Drop one entry, or the whole namespace when key is None, here and in other processes"""
+        self._drop(namespace, key)
+        self._stats["invalidations"] += 1
+        if self.invalidation_log is not None:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self._executor, self.invalidation_log.publish, namespace, key)
+
+    async def _get(self, namespace: str, key: Optional[str], fetch: Callable[[], Awaitable[Any]]) -> Any:
+        await self._apply_remote_invalidations()
+        entry_key = (namespace, key)
+        entry = self._entries.get(entry_key)
+        if entry is not None:
+            value, expires_at = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(entry_key)
+                self._stats["hits"] += 1
+                return value
+            del self._entries[entry_key]
+            self._stats["expired"] += 1
+
+        # Concurrent misses for the same entry share one query
+        inflight = self._inflight.get(entry_key)
+        if inflight is not None:
+            self._stats["coalesced"] += 1
+            return await asyncio.shield(inflight)
+
+        self._stats["misses"] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[entry_key] = future
+        try:
+            value = await fetch()
+        except Exception as e:
+            if self._inflight.get(entry_key) is future:
+                del self._inflight[entry_key]
+            future.set_exception(e)
+            # Waiters receive the error; don't warn if there were none
+            future.exception()
+            raise
+
+        # An invalidation during the fetch removed us from _inflight: the result may predate the write
+        if self._inflight.get(entry_key) is future:
+            del self._inflight[entry_key]
+            self._entries[entry_key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(entry_key)
+            while len(self._entries) > self.max_items:
+                self._entries.popitem(last=False)
+        future.set_result(value)
+        return value
+
+    def _drop(self, namespace: str, key: Optional[str]):
+        for cache in (self._entries, self._inflight):
+            for entry_key in [k for k in cache if k[0] == namespace and (key is None or k[1] == key)]:
+                del cache[entry_key]
+
+    async def _apply_remote_invalidations(self):
+        if self.invalidation_log is None or time.monotonic() < self._next_poll:
+            return
+        self._next_poll = time.monotonic() + settings.METADATA_INVALIDATION_POLL_SECONDS
+        loop = asyncio.get_running_loop()
+        try:
+            invalidations = await loop.run_in_executor(self._executor, self.invalidation_log.poll)
+        except Exception as e:
+            # Fall back to TTL expiry rather than failing the read
+            print(f"Metadata invalidation poll failed: {str(e)}")
+            return
+        for namespace, key in invalidations:
+            self._drop(namespace, key)
+            self._stats["remote_invalidations"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Hits, misses and invalidations"""
+        lookups = self._stats["hits"] + self._stats["misses"] + self._stats["coalesced"]
+        return {
+            **self._stats,
+            "entries": len(self._entries),
+            "hit_ratio": round((self._stats["hits"] + self._stats["coalesced"]) / lookups, 4) if lookups else 0.0,
+        }
+
+    def shutdown(self):
+        if self.invalidation_log is not None:
+            self._executor.submit(self.invalidation_log.close)
+        self._executor.shutdown(wait=True)
+
+
+metadata_cache = MetadataCache(
+    invalidation_log=InvalidationLog(settings.METADATA_INVALIDATION_LOG_PATH)
+    if settings.METADATA_INVALIDATION_LOG_PATH else None
+)
@@ -0,0 +1,81 @@
+# app/services/model_registry.py
+from typing import Any, Dict, Optional
+import threading
+import time
+from app.core.config import settings
+from app.services.embedding_backends import OnnxEmbeddingBackend, SentenceTransformerBackend
+
+
+class ModelRegistry:
+    """Process-wide registry of ML models, loaded once on first use and shared by every grading path"""
+
+    def __init__(self, embedding_model_name: str = None, embedding_backend: str = None):
+        self.embedding_model_name = embedding_model_name or settings.EMBEDDING_MODEL_NAME
+        self.embedding_backend = embedding_backend or settings.EMBEDDING_BACKEND
+        self._lock = threading.Lock()
+        self._embedding_model = None
+        self._load_seconds: Optional[float] = None
+        self._warmed_up = False
+        self._error: Optional[str] = None
+
+    @property
+    def embedding_model_id(self) -> str:
+        """Identifies the vectors this registry produces; int8 vectors differ slightly from fp32 ones"""
+        if self.embedding_backend == "onnx" and settings.EMBEDDING_ONNX_QUANTIZED:
+            return f"{self.embedding_model_name}+onnx-int8"
+        return self.embedding_model_name
+
+    @property
+    def embedding_model(self):
+        """The shared sentence embedding model"""
+        if self._embedding_model is None:
+            with self._lock:
+                # Another thread may have finished loading while we waited
+                if self._embedding_model is None:
+                    self._embedding_model = self._load_embedding_model()
+        return self._embedding_model
+
+    def _load_embedding_model(self):
+        started_at = time.perf_counter()
+        try:
+            if self.embedding_backend == "onnx":
+                model = OnnxEmbeddingBackend(
+                    settings.EMBEDDING_ONNX_DIR,
+                    quantized=settings.EMBEDDING_ONNX_QUANTIZED,
+                    num_threads=settings.EMBEDDING_ONNX_THREADS
+                )
+            elif self.embedding_backend == "torch":
+                model = SentenceTransformerBackend(self.embedding_model_name)
+            else:
+                raise ValueError(f"Unknown EMBEDDING_BACKEND '{self.embedding_backend}' (expected 'torch' or 'onnx')")
+        except Exception as e:
+            self._error = str(e)
+            raise
+        self._load_seconds = time.perf_counter() - started_at
+        self._error = None
+        return model
+
+    def warmup(self) -> None:
+        """Load the model and run one forward pass so the first real request is not slow"""
+        self.embedding_model.encode(["warmup"], normalize_embeddings=True)
+        self._warmed_up = True
+
+    @property
+    def is_ready(self) -> bool:
+        # Without a startup warmup nothing ever calls warmup(); a loaded model is enough
+        warmed_up = self._warmed_up or not settings.EMBEDDING_WARMUP_ON_STARTUP
+        return self._embedding_model is not None and warmed_up
+
+    def status(self) -> Dict[str, Any]:
+        """Readiness details for health checks"""
+        return {
+            "ready": self.is_ready,
+            "embedding_model": self.embedding_model_id,
+            "backend": self.embedding_backend,
+            "loaded": self._embedding_model is not None,
+            "load_seconds": round(self._load_seconds, 2) if self._load_seconds is not None else None,
+            "error": self._error
+        }
+
+
+model_registry = ModelRegistry()
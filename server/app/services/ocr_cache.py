@@ -0,0 +1,129 @@
+# app/services/ocr_cache.py
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+import hashlib
+import json
+import os
+import threading
+from app.core.config import settings
+from app.schema.ocr import OCRExtraction
+
+
+class OCRResultCache:
+    """On-disk OCR results keyed by file content hash plus the OCR settings used"""
+
+    def __init__(self, cache_dir: str = None, max_bytes: int = None):
+        self.cache_dir = Path(cache_dir or settings.OCR_CACHE_DIR)
+        self.max_bytes = max_bytes if max_bytes is not None else settings.OCR_CACHE_MAX_MB * 1024 * 1024
+        self._lock = threading.Lock()
+        self._index: "OrderedDict[str, int]" = OrderedDict()  # key -> size, least recently used first
+        self._total_bytes = 0
+        self._loaded = False
+        self._stats = {"hits": 0, "misses": 0, "writes": 0, "write_errors": 0, "evictions": 0}
+
+    def key_for(self, file_path: str, fingerprint: Dict[str, Any]) -> str:
+        """Hash the file contents together with the settings that shape the OCR output"""
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        digest.update(json.dumps(fingerprint, sort_keys=True).encode())
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[OCRExtraction]:
+        """Return the cached extraction for key, if any"""
+        self._load_index()
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                extraction = OCRExtraction.model_validate_json(f.read())
+        except (OSError, ValueError):
+            with self._lock:
+                self._stats["misses"] += 1
+                self._forget(key)
+            return None
+
+        os.utime(path)  # Keep the on-disk order in step with recency for the next process start
+        with self._lock:
+            self._stats["hits"] += 1
+            if key in self._index:
+                self._index.move_to_end(key)
+        return extraction
+
+    def put(self, key: str, extraction: OCRExtraction) -> None:
+        """Store an extraction and evict least recently used entries beyond the size limit"""
+        data = extraction.model_dump_json().encode("utf-8")
+        path = self._path(key)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            self._load_index()
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            # Full disk or no permission: the extraction is still good, only caching is lost
+            print(f"OCR cache write failed: {str(e)}")
+            with self._lock:
+                self._stats["write_errors"] += 1
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+
+        with self._lock:
+            self._stats["writes"] += 1
+            self._forget(key)
+            self._index[key] = len(data)
+            self._total_bytes += len(data)
+            while self._total_bytes > self.max_bytes and len(self._index) > 1:
+                old_key, _ = next(iter(self._index.items()))
+                self._forget(old_key)
+                try:
+                    os.remove(self._path(old_key))
+                except OSError:
+                    pass
+                self._stats["evictions"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size"""
+        lookups = self._stats["hits"] + self._stats["misses"]
+        return {
+            **self._stats,
+            "hit_ratio": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+            "entries": len(self._index),
+            "size_mb": round(self._total_bytes / (1024 * 1024), 2),
+            "max_size_mb": round(self.max_bytes / (1024 * 1024), 2),
+        }
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def _forget(self, key: str) -> None:
+        size = self._index.pop(key, None)
+        if size is not None:
+            self._total_bytes -= size
+
+    def _load_index(self) -> None:
+        """Rebuild the LRU index from the cache directory on first use"""
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            entries = []
+            for path in self.cache_dir.glob("*.json"):
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, path.stem, stat.st_size))
+            for _, key, size in sorted(entries):
+                self._index[key] = size
+                self._total_bytes += size
+            self._loaded = True
+
+
+ocr_cache = OCRResultCache()
@@ -0,0 +1,218 @@
+# app/services/ocr_executor.py
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+import asyncio
+import multiprocessing
+import time
+from app.core.config import settings
+from app.utils.exceptions import ProcessingError, ServiceBusyError
+
+
+def _init_worker(tesseract_cmd: Optional[str]):
+    """Configure pytesseract inside each worker process"""
+    if tesseract_cmd:
+        import pytesseract
+        pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+
+
+class MemoryBudget:
+    """Byte budget shared by all in-flight OCR jobs, granted in FIFO order"""
+
+    def __init__(self, limit_bytes: int):
+        self.limit_bytes = limit_bytes
+        self.in_use = 0
+        self.peak = 0
+        self._waiters = deque()
+
+    async def acquire(self, nbytes: int) -> int:
+        """Wait until nbytes fit in the budget; returns the amount actually reserved"""
+        if self.limit_bytes <= 0:
+            return 0
+        # A job larger than the whole budget still runs, just on its own
+        nbytes = min(max(nbytes, 0), self.limit_bytes)
+        if not self._waiters and self.in_use + nbytes <= self.limit_bytes:
+            self._grant(nbytes)
+            return nbytes
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append((nbytes, waiter))
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release(nbytes)
+            raise
+        return nbytes
+
+    def release(self, nbytes: int):
+        """Return bytes to the budget and wake waiters that now fit"""
+        self.in_use -= nbytes
+        while self._waiters:
+            waiting_bytes, waiter = self._waiters[0]
+            if waiter.cancelled():
+                self._waiters.popleft()
+                continue
+            if self.in_use + waiting_bytes > self.limit_bytes:
+                break
+            self._waiters.popleft()
+            self._grant(waiting_bytes)
+            waiter.set_result(None)
+
+    def _grant(self, nbytes: int):
+        self.in_use += nbytes
+        self.peak = max(self.peak, self.in_use)
+
+
+class OCRExecutor:
+    """Runs CPU-bound OCR jobs in a dedicated process pool, off the event loop"""
+
+    def __init__(
+        self,
+        max_workers: int = None,
+        max_queue_depth: int = None,
+        job_timeout: float = None,
+        memory_limit_mb: int = None
+    ):
+        self.max_workers = max_workers or settings.OCR_WORKERS
+        self.max_queue_depth = max_queue_depth if max_queue_depth is not None else settings.OCR_MAX_QUEUE_DEPTH
+        self.job_timeout = job_timeout or settings.OCR_JOB_TIMEOUT_SECONDS
+        self.memory = MemoryBudget(
+            (memory_limit_mb if memory_limit_mb is not None else settings.OCR_MEMORY_LIMIT_MB) * 1024 * 1024
+        )
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._waiting = 0
+        self._running = 0
+        self._stats = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "timed_out": 0,
+            "rejected": 0,
+            "queue_wait_total": 0.0,
+            "queue_wait_max": 0.0,
+            "run_time_total": 0.0,
+            "run_time_max": 0.0,
+        }
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        """Create the worker pool on first use so importing the app stays cheap"""
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(settings.TESSERACT_CMD,)
+            )
+        return self._pool
+
+    async def run(self, func: Callable, *args, memory_bytes: int = 0) -> Any:
+        """Run a picklable function in the pool without blocking the event loop
+
+        memory_bytes is the job's estimated peak footprint; jobs wait until it
+        fits in the OCR memory budget before being handed to a worker.
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_workers)
+
+        # Every worker busy and too many jobs already waiting: shed load
+        if self._slots.locked() and self._waiting >= self.max_queue_depth:
+            self._stats["rejected"] += 1
+            raise ServiceBusyError("OCR queue is full, please retry later")
+
+        self._stats["submitted"] += 1
+        queued_at = time.perf_counter()
+        self._waiting += 1
+        reserved = 0
+        try:
+            reserved = await self.memory.acquire(memory_bytes)
+            await self._slots.acquire()
+        except BaseException:
+            self.memory.release(reserved)
+            raise
+        finally:
+            self._waiting -= 1
+
+        started_at = time.perf_counter()
+        self._record("queue_wait", started_at - queued_at)
+
+        try:
+            future = self.pool.submit(func, *args)
+        except BrokenProcessPool:
+            self._slots.release()
+            self.memory.release(reserved)
+            self._reset_pool()
+            self._stats["failed"] += 1
+            raise ProcessingError("OCR worker pool crashed, please retry")
+
+        # Hold the slot until the worker is really free, even if we stop waiting on a timeout
+        self._running += 1
+        loop = asyncio.get_running_loop()
+        future.add_done_callback(lambda _: loop.call_soon_threadsafe(self._release_slot, reserved))
+
+        try:
+            result = await asyncio.wait_for(asyncio.wrap_future(future), timeout=self.job_timeout)
+        except asyncio.TimeoutError:
+            self._stats["timed_out"] += 1
+            raise ProcessingError(f"OCR job timed out after {self.job_timeout}s")
+        except BrokenProcessPool:
+            self._reset_pool()
+            self._stats["failed"] += 1
+            raise ProcessingError("OCR worker pool crashed, please retry")
+        except Exception:
+            self._stats["failed"] += 1
+            raise
+        finally:
+            self._record("run_time", time.perf_counter() - started_at)
+
+        self._stats["completed"] += 1
+        return result
+
+    def _release_slot(self, reserved: int):
+        self._running -= 1
+        self._slots.release()
+        self.memory.release(reserved)
+
+    def _record(self, metric: str, seconds: float):
+        self._stats[f"{metric}_total"] += seconds
+        self._stats[f"{metric}_max"] = max(self._stats[f"{metric}_max"], seconds)
+
+    def _reset_pool(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue and run-time metrics for monitoring"""
+        finished = self._stats["completed"] + self._stats["failed"] + self._stats["timed_out"]
+        started = self._stats["submitted"] - self._waiting
+        return {
+            "workers": self.max_workers,
+            "max_queue_depth": self.max_queue_depth,
+            "waiting": self._waiting,
+            "running": self._running,
+            "submitted": self._stats["submitted"],
+            "completed": self._stats["completed"],
+            "failed": self._stats["failed"],
+            "timed_out": self._stats["timed_out"],
+            "rejected": self._stats["rejected"],
+            "memory_limit_mb": round(self.memory.limit_bytes / (1024 * 1024), 1),
+            "memory_in_use_mb": round(self.memory.in_use / (1024 * 1024), 1),
+            "memory_peak_mb": round(self.memory.peak / (1024 * 1024), 1),
+            "avg_queue_wait_seconds": round(self._stats["queue_wait_total"] / started, 4) if started else 0.0,
+            "max_queue_wait_seconds": round(self._stats["queue_wait_max"], 4),
+            "avg_run_time_seconds": round(self._stats["run_time_total"] / finished, 4) if finished else 0.0,
+            "max_run_time_seconds": round(self._stats["run_time_max"], 4),
+        }
+
+    def shutdown(self):
+        """Stop worker processes (called on application shutdown)"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+
+ocr_executor = OCRExecutor()
@@ -2,107 +2,260 @@ import pytesseract
 from PIL import Image
 import cv2
 import numpy as np
-from typing import Dict, List
+from typing import Any, Dict, List, Tuple
 import PyPDF2
 import io
+import asyncio
+from fastapi import HTTPException
+from app.core.config import settings
+from app.services.ocr_executor import OCRExecutor, ocr_executor
+from app.services.ocr_cache import OCRResultCache, ocr_cache
+from app.schema.ocr import ExtractedAnswer, OCRExtraction, PageExtraction
+
+
+# Bump whenever preprocessing or answer parsing changes so cached results are not reused
+OCR_PIPELINE_VERSION = 2
+
+# Raster + blurred + thresholded copies plus Tesseract's own buffer, per pixel
+OCR_BYTES_PER_PIXEL = 4
+
+
+def preprocess_image(image):
+    """Preprocess image for better OCR results"""
+    
+    # Convert to grayscale (streamed PDF pages are already rasterized in grayscale)
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    
+    # Apply Gaussian blur
+    blurred = cv2.GaussianBlur(gray, (5, 5), 0)
+    
+    # Apply threshold
+    _, threshold = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    
+    return threshold
+
+
+def estimate_ocr_bytes(width_px: float, height_px: float) -> int:
+    """Estimate the peak memory needed to preprocess and OCR one image"""
+    return int(width_px * height_px * OCR_BYTES_PER_PIXEL)
+
+
+def read_text(processed_image) -> Tuple[str, List[float]]:
+    """Text of an image line by line, with the mean word confidence (0-1) of each line"""
+    data = pytesseract.image_to_data(
+        processed_image, config=settings.TESSERACT_CONFIG, output_type=pytesseract.Output.DICT
+    )
+    
+    # Words arrive in reading order tagged with the block/paragraph/line they belong to
+    lines: Dict[Tuple[int, int, int], List[Tuple[str, float]]] = {}
+    for i, word in enumerate(data["text"]):
+        word = word.strip()
+        if not word:
+            continue
+        key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        lines.setdefault(key, []).append((word, max(float(data["conf"][i]), 0.0)))
+    
+    text = "\n".join(" ".join(word for word, _ in words) for words in lines.values())
+    confidences = [
+        round(sum(conf for _, conf in words) / len(words) / 100, 3) for words in lines.values()
+    ]
+    return text, confidences
+
+
+def ocr_image_file(image_path: str) -> Tuple[str, List[float]]:
+    """Run OCR on an image file (executed in an OCR worker process)"""
+    
+    # Load and preprocess image
+    image = cv2.imread(image_path)
+    processed_image = preprocess_image(image)
+    del image
+    
+    # Extract text
+    return read_text(processed_image)
+
+
+def inspect_pdf(pdf_path: str) -> List[Dict[str, Any]]:
+    """Page sizes (in points) and embedded text layer of each page (executed in an OCR worker process)"""
+    reader = PyPDF2.PdfReader(pdf_path)
+    pages = []
+    for page in reader.pages:
+        try:
+            text = page.extract_text() or ""
+        except Exception:
+            # Malformed content streams: treat the page as a scan
+            text = ""
+        pages.append({
+            "width": float(page.mediabox.width),
+            "height": float(page.mediabox.height),
+            "text": text,
+        })
+    return pages
+
+
+def ocr_pdf_page(pdf_path: str, page_number: int, dpi: int) -> Tuple[str, List[float]]:
+    """Rasterize and OCR a single PDF page (executed in an OCR worker process)"""
+    from pdf2image import convert_from_path
+    
+    # Convert only the requested page, in grayscale, so one page is in memory at a time
+    images = convert_from_path(
+        pdf_path, dpi=dpi, first_page=page_number, last_page=page_number, grayscale=True
+    )
+    if not images:
+        return "", []
+    
+    # Convert PIL image to numpy array for preprocessing, then drop the PIL copy
+    image = images.pop()
+    image_np = np.array(image)
+    image.close()
+    
+    # Preprocess
+    processed_image = preprocess_image(image_np)
+    del image_np
+    
+    # Extract text
+    return read_text(processed_image)
+
 
 class OCRService:
-    def __init__(self):
+    def __init__(self, executor: OCRExecutor = None, cache: OCRResultCache = None):
         self.confidence_threshold = 30
+        self.executor = executor or ocr_executor
+        self.cache = cache or (ocr_cache if settings.OCR_CACHE_ENABLED else None)
 
     async def extract_answers(self, file_path: str) -> Dict[str, str]:
         """Extract answers from exam copy"""
+        extraction = await self.extract(file_path)
+        return extraction.answer_texts()
+
+    async def extract(self, file_path: str) -> OCRExtraction:
+        """Extract answers along with how each page was read, reusing cached results for known files"""
+        loop = asyncio.get_running_loop()
+        cache_key = None
+        
+        if self.cache is not None:
+            cache_key = await loop.run_in_executor(None, self.cache.key_for, file_path, self._settings_fingerprint())
+            cached = await loop.run_in_executor(None, self.cache.get, cache_key)
+            if cached is not None:
+                return cached
         
         if file_path.lower().endswith('.pdf'):
-            return await self._extract_from_pdf(file_path)
+            extraction = await self._extract_from_pdf(file_path)
         else:
-            return await self._extract_from_image(file_path)
+            extraction = await self._extract_from_image(file_path)
+        
+        # Failed extractions have no pages; never cache those
+        if cache_key is not None and extraction.pages:
+            await loop.run_in_executor(None, self.cache.put, cache_key, extraction)
+        
+        return extraction
+
+    def _settings_fingerprint(self) -> Dict[str, Any]:
+        """Settings that change OCR output and therefore belong in the cache key"""
+        return {
+            "pipeline_version": OCR_PIPELINE_VERSION,
+            "dpi": settings.OCR_PDF_DPI,
+            "tesseract_config": settings.TESSERACT_CONFIG,
+            "min_text_layer_chars": settings.OCR_MIN_TEXT_LAYER_CHARS,
+        }
 
-    async def _extract_from_image(self, image_path: str) -> Dict[str, str]:
+    async def _extract_from_image(self, image_path: str) -> OCRExtraction:
         """Extract text from image using OCR"""
         
-        # Load and preprocess image
-        image = cv2.imread(image_path)
-        processed_image = self._preprocess_image(image)
-        
-        # Extract text
-        text = pytesseract.image_to_string(processed_image)
+        # Tesseract runs in the OCR worker pool so the event loop stays free
+        with Image.open(image_path) as header:
+            width, height = header.size
+        # cv2 loads images as 3-channel BGR
+        text, confidences = await self.executor.run(
+            ocr_image_file, image_path, memory_bytes=estimate_ocr_bytes(width, height) * 3
+        )
         
         # Parse text to extract question-wise answers
-        return self._parse_answers(text)
+        pages = [PageExtraction(page_number=1, method="ocr", text=text, line_confidences=confidences)]
+        return OCRExtraction(answers=self._parse_answers(pages), pages=pages)
 
-    async def _extract_from_pdf(self, pdf_path: str) -> Dict[str, str]:
-        """Extract text from PDF by converting to images first"""
+    async def _extract_from_pdf(self, pdf_path: str) -> OCRExtraction:
+        """Extract text from PDF, using the embedded text layer where present and OCR elsewhere"""
     
         try:
-            from pdf2image import convert_from_path
-            import tempfile
-        
-            # Convert PDF pages to images
-            images = convert_from_path(pdf_path)
-        
-            all_text = ""
-        
-            # Process each page
-            for page_num, image in enumerate(images, start=1):
-                # Convert PIL image to numpy array for preprocessing
-                image_np = np.array(image)
+            dpi = settings.OCR_PDF_DPI
+            page_infos = await self.executor.run(inspect_pdf, pdf_path)
             
-                # Preprocess
-                processed_image = self._preprocess_image(image_np)
+            # Cap how many pages of this upload are rasterized/OCR'd at once
+            page_slots = asyncio.Semaphore(settings.OCR_MAX_PAGES_PER_UPLOAD)
             
-                # Extract text
-                page_text = pytesseract.image_to_string(processed_image)
-                all_text += f"\n--- Page {page_num} ---\n{page_text}"
-        
-            return self._parse_answers(all_text)
+            async def read_page(page_num: int, page_info: Dict[str, Any]) -> PageExtraction:
+                # Digitally produced pages already carry their text
+                if len("".join(page_info["text"].split())) >= settings.OCR_MIN_TEXT_LAYER_CHARS:
+                    return PageExtraction(page_number=page_num, method="text_layer", text=page_info["text"])
+                
+                # Points are 1/72 inch, so the raster is (size / 72 * dpi) pixels per side
+                page_bytes = estimate_ocr_bytes(
+                    page_info["width"] / 72 * dpi, page_info["height"] / 72 * dpi
+                )
+                async with page_slots:
+                    page_text, confidences = await self.executor.run(
+                        ocr_pdf_page, pdf_path, page_num, dpi, memory_bytes=page_bytes
+                    )
+                return PageExtraction(
+                    page_number=page_num, method="ocr", text=page_text, line_confidences=confidences
+                )
+            
+            # gather keeps results in page order regardless of completion order
+            pages = await asyncio.gather(
+                *[read_page(page_num, page_info) for page_num, page_info in enumerate(page_infos, start=1)]
+            )
+            
+            return OCRExtraction(answers=self._parse_answers(pages), pages=pages)
         
+        except HTTPException:
+            # Queue full / timeout: let the caller record the real reason
+            raise
         except Exception as e:
             print(f"PDF OCR Error: {str(e)}")
-            return {}
-
-    def _preprocess_image(self, image):
-        """Preprocess image for better OCR results"""
-        
-        # Convert to grayscale
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        
-        # Apply Gaussian blur
-        blurred = cv2.GaussianBlur(gray, (5, 5), 0)
-        
-        # Apply threshold
-        _, threshold = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-        
-        return threshold
+            return OCRExtraction()
 
-    def _parse_answers(self, text: str) -> Dict[str, str]:
-        """Parse extracted text to identify question-wise answers"""
+    def _parse_answers(self, pages: List[PageExtraction]) -> List[ExtractedAnswer]:
+        """Split the pages' text into question-wise answers, keeping line confidences and pages"""
         
-        answers = {}
-        lines = text.split('\n')
+        answers: Dict[int, ExtractedAnswer] = {}
         current_question = None
-        current_answer = []
+        current_lines: List[str] = []
+        current_confidences: List[float] = []
+        current_pages: List[int] = []
         
-        for line in lines:
-            line = line.strip()
-            
-            # Check if line contains question number
-            if self._is_question_line(line):
-                # Save previous question's answer
-                if current_question:
-                    answers[current_question] = ' '.join(current_answer)
+        def save():
+            answers[current_question] = ExtractedAnswer(
+                question_number=current_question,
+                text=' '.join(current_lines),
+                confidence=round(sum(current_confidences) / len(current_confidences), 3) if current_confidences else None,
+                pages=current_pages
+            )
+        
+        # Answers may run across page breaks, so pages are walked as one stream of lines
+        for page in pages:
+            for index, line in enumerate(page.text.split('\n')):
+                line = line.strip()
                 
-                # Start new question
-                current_question = self._extract_question_number(line)
-                current_answer = []
-            elif current_question and line:
-                current_answer.append(line)
+                # Check if line contains question number
+                if self._is_question_line(line):
+                    # Save previous question's answer
+                    if current_question is not None:
+                        save()
+                    
+                    # Start new question
+                    current_question = self._extract_question_number(line)
+                    current_lines, current_confidences, current_pages = [], [], [page.page_number]
+                elif current_question is not None and line:
+                    current_lines.append(line)
+                    current_confidences.append(page.line_confidence(index))
+                    if page.page_number not in current_pages:
+                        current_pages.append(page.page_number)
         
         # Save last question's answer
-        if current_question:
-            answers[current_question] = ' '.join(current_answer)
+        if current_question is not None:
+            save()
         
-        return answers
+        return list(answers.values())
 
     def _is_question_line(self, line: str) -> bool:
         """Check if line contains question number"""
@@ -111,11 +264,8 @@ class OCRService:
         pattern = r'^\s*(?:Q\.?|Question|Ans\.?|Answer)?\s*(\d+)[.:]?\s*$'
         return bool(re.match(pattern, line, re.IGNORECASE))
 
-    def _extract_question_number(self, line: str) -> str:
-        """Extract question number from line"""
+    def _extract_question_number(self, line: str) -> int:
+        """Extract question number from a line that passed _is_question_line"""
         import re
         pattern = r'^\s*(?:Q\.?|Question|Ans\.?|Answer)?\s*(\d+)[.:]?\s*'
-        match = re.match(pattern, line, re.IGNORECASE)
-        if match:
-            return f"question_{match.group(1)}"
-        return "question_unknown"
\ No newline at end of file
+        return int(re.match(pattern, line, re.IGNORECASE).group(1))
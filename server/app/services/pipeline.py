@@ -0,0 +1,341 @@
+# app/services/pipeline.py
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import asyncio
+import time
+from app.core.config import settings
+from app.repositories.base import Repository, get_repository
+from app.schema.ocr import ExtractedAnswer, OCRExtraction
+from app.services.ai_service import AIGradingService, GradingPlan, record_grading_stats
+from app.services.metadata_cache import MetadataCache, metadata_cache
+from app.services.ocr_service import OCRService
+
+
+class UploadWork:
+    """One upload moving through the pipeline; each stage fills in its part"""
+
+    def __init__(self, upload_id: str, file_path: str, file_extension: str, future: asyncio.Future):
+        self.upload_id = upload_id
+        self.file_path = file_path
+        self.file_extension = file_extension
+        self.future = future
+        self.extraction: Optional[OCRExtraction] = None
+        self.upload: Dict[str, Any] = {}
+        self.previous_answer_ids: List[str] = []
+        self.answer_rows: List[Dict[str, Any]] = []
+        self.graded_rows: List[int] = []  # answer_rows positions that are graded
+        self.grading_items: List[tuple] = []
+        self.plan: Optional[GradingPlan] = None  # shared by every upload of its embed batch
+        self.plan_items = slice(0)  # this upload's items in the plan
+        self.results: List[Any] = []
+
+
+class Stage:
+    """A pool of workers reading from a bounded queue and feeding the next stage"""
+
+    def __init__(
+        self,
+        name: str,
+        workers: int,
+        handler: Callable[[List[UploadWork]], Awaitable[None]],
+        max_batch: int = 1
+    ):
+        self.name = name
+        self.workers = max(1, workers)
+        self.handler = handler
+        self.max_batch = max_batch
+        self.queue: Optional[asyncio.Queue] = None
+        self.next: Optional["Stage"] = None
+        self._tasks: List[asyncio.Task] = []
+        self._stats = {"uploads": 0, "batches": 0, "errors": 0, "busy_seconds": 0.0, "max_queue_depth": 0}
+
+    def start(self, queue_size: int):
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self._tasks = [asyncio.get_running_loop().create_task(self._run()) for _ in range(self.workers)]
+
+    def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+    async def put(self, work: UploadWork):
+        # Blocks while the queue is full, which holds back the stage upstream
+        await self.queue.put(work)
+        self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], self.queue.qsize())
+
+    async def _run(self):
+        while True:
+            batch = [await self.queue.get()]
+            while len(batch) < self.max_batch and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            # Nobody waits for a cancelled upload (e.g. its job lost its lease); don't write for it
+            batch = [work for work in batch if not work.future.cancelled()]
+            if not batch:
+                continue
+
+            started_at = time.perf_counter()
+            try:
+                await self.handler(batch)
+            except Exception as e:
+                self._stats["errors"] += 1
+                for work in batch:
+                    if not work.future.done():
+                        work.future.set_exception(e)
+                continue
+            finally:
+                self._stats["busy_seconds"] += time.perf_counter() - started_at
+            self._stats["batches"] += 1
+            self._stats["uploads"] += len(batch)
+
+            for work in batch:
+                if work.future.done():
+                    continue
+                if self.next is None:
+                    work.future.set_result(work)
+                else:
+                    await self.next.put(work)
+
+    def stats(self) -> Dict[str, Any]:
+        busy = self._stats["busy_seconds"]
+        return {
+            "workers": self.workers,
+            "queue_depth": self.queue.qsize() if self.queue is not None else 0,
+            **self._stats,
+            "busy_seconds": round(busy, 3),
+            "uploads_per_busy_second": round(self._stats["uploads"] / busy, 2) if busy else 0.0,
+            "avg_batch_uploads": round(self._stats["uploads"] / self._stats["batches"], 2) if self._stats["batches"] else 0.0,
+        }
+
+
+class UploadPipeline:
+    """OCR -> segment -> embed -> score -> persist, as stages joined by bounded queues
+
+    Each stage has its own worker count, so OCR of one upload overlaps with
+    embedding and database writes of others; a slow stage fills its queue and
+    holds back the ones before it. The embed stage takes several waiting
+    uploads at once, grades identical answers among them once and embeds the
+    rest in a single model call, and the
+    persist stage writes several uploads' rows with one insert per table.
+    """
+
+    def __init__(
+        self,
+        ai_service: AIGradingService = None,
+        ocr_service: OCRService = None,
+        repository: Repository = None,
+        metadata: MetadataCache = None
+    ):
+        self.ai_service = ai_service or AIGradingService()
+        self.ocr_service = ocr_service or OCRService()
+        self._repository = repository
+        self.metadata = metadata or metadata_cache
+        self.stages = [
+            Stage("ocr", settings.PIPELINE_OCR_WORKERS, self._ocr),
+            Stage("segment", settings.PIPELINE_SEGMENT_WORKERS, self._segment),
+            Stage("embed", settings.PIPELINE_EMBED_WORKERS, self._embed, settings.PIPELINE_EMBED_MAX_UPLOADS),
+            Stage("score", settings.PIPELINE_SCORE_WORKERS, self._score),
+            Stage("persist", settings.PIPELINE_PERSIST_WORKERS, self._persist, settings.PIPELINE_PERSIST_MAX_UPLOADS),
+        ]
+        for stage, next_stage in zip(self.stages, self.stages[1:]):
+            stage.next = next_stage
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._latencies = deque(maxlen=1000)
+        self._stats = {"submitted": 0, "completed": 0, "failed": 0, "persist_fallbacks": 0}
+
+    @property
+    def repository(self) -> Repository:
+        if self._repository is None:
+            self._repository = get_repository()
+        return self._repository
+
+    async def run(self, upload_id: str, file_path: str, file_extension: str) -> UploadWork:
+        """Process one upload end to end; raises if any stage fails"""
+        self._ensure_started()
+        self._stats["submitted"] += 1
+        work = UploadWork(upload_id, file_path, file_extension, self._loop.create_future())
+        started_at = time.perf_counter()
+        await self.stages[0].put(work)
+        try:
+            await work.future
+        except asyncio.CancelledError:
+            # Stages drop the upload before their next write
+            work.future.cancel()
+            raise
+        except Exception as e:
+            self._stats["failed"] += 1
+            try:
+                await self.repository.update_upload(upload_id, {
+                    "processing_status": "failed",
+                    "error_message": str(e)
+                })
+            except Exception as status_error:
+                # The stage error is the one the job should report
+                print(f"Could not mark upload {upload_id} as failed: {str(status_error)}")
+            raise
+        self._stats["completed"] += 1
+        self._latencies.append(time.perf_counter() - started_at)
+        return work
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self.shutdown()
+            self._loop = loop
+            for stage in self.stages:
+                stage.start(settings.PIPELINE_QUEUE_SIZE)
+
+    async def _ocr(self, batch: List[UploadWork]):
+        work = batch[0]
+        await self.repository.update_upload(work.upload_id, {
+            "processing_status": "processing"
+        })
+
+        work.extraction = await self.ocr_service.extract(work.file_path)
+
+    async def _segment(self, batch: List[UploadWork]):
+        work = batch[0]
+        # One read for the upload and any answers from an earlier attempt; questions come from the metadata cache
+        upload = await self.repository.get_upload(work.upload_id, include_answers=True)
+        if not upload:
+            raise ValueError(f"Upload {work.upload_id} not found")
+        work.upload = dict(upload)
+        questions = await self.metadata.exam_questions(work.upload["exam_id"])
+        work.previous_answer_ids = [answer["id"] for answer in work.upload.pop("student_answers") or []]
+
+        # Structured answers go straight into rows; nothing is re-parsed from text
+        answers = {answer.question_number: answer for answer in work.extraction.answers}
+        work.answer_rows = [
+            self._answer_row(work, question, answers.get(question["question_number"]))
+            for question in questions
+        ]
+        # Only answered questions are graded
+        work.graded_rows = [i for i, row in enumerate(work.answer_rows) if row["extracted_answer"]]
+        work.grading_items = [
+            (self.ai_service.question_data_from_row(questions[i]), work.answer_rows[i]["extracted_answer"])
+            for i in work.graded_rows
+        ]
+
+    @staticmethod
+    def _answer_row(work: UploadWork, question: Dict[str, Any], answer: Optional[ExtractedAnswer]) -> Dict[str, Any]:
+        notes = f"Extracted from question {question['question_number']}"
+        if answer is not None and answer.pages:
+            notes += f" on page {', '.join(str(page) for page in answer.pages)}"
+        return {
+            "upload_id": work.upload_id,
+            "question_id": question["id"],
+            "student_id": work.upload["student_id"],
+            "extracted_answer": answer.text if answer is not None else "",
+            "raw_image_path": work.upload["file_path"],
+            "confidence_score": answer.confidence if answer is not None else None,
+            "processing_notes": notes
+        }
+
+    async def _embed(self, batch: List[UploadWork]):
+        # One plan for the whole batch, so students giving the same answer are graded once
+        items, exam_ids = [], []
+        for work in batch:
+            work.plan_items = slice(len(items), len(items) + len(work.grading_items))
+            items.extend(work.grading_items)
+            exam_ids.extend([work.upload["exam_id"]] * len(work.grading_items))
+        plan = self.ai_service.plan(items)
+        for work in batch:
+            work.plan = plan
+        # One model call for the answers of every upload in the batch
+        await self.ai_service.embed([plan])
+        await record_grading_stats(self.repository, plan, exam_ids)
+
+    async def _score(self, batch: List[UploadWork]):
+        work = batch[0]
+        # The first upload of a plan scores it; the rest reuse its results
+        work.results = self.ai_service.finish(work.plan)[work.plan_items]
+
+    async def _persist(self, batch: List[UploadWork]):
+        try:
+            await self._write(batch)
+        except Exception as e:
+            if len(batch) == 1:
+                raise
+            # One bad upload shouldn't fail the others it happened to be batched with
+            print(f"Persisting {len(batch)} uploads together failed, retrying one at a time: {str(e)}")
+            self._stats["persist_fallbacks"] += 1
+            for work in batch:
+                if work.future.cancelled():
+                    continue
+                try:
+                    # Rows the failed batch may have written count as an earlier attempt's
+                    upload = await self.repository.get_upload(work.upload_id, include_answers=True)
+                    work.previous_answer_ids = [answer["id"] for answer in (upload or {}).get("student_answers") or []]
+                    await self._write([work])
+                except Exception as upload_error:
+                    if not work.future.done():
+                        work.future.set_exception(upload_error)
+
+    async def _write(self, batch: List[UploadWork]):
+        batch = [work for work in batch if not work.future.cancelled()]
+        if not batch:
+            return
+        upload_ids = [work.upload_id for work in batch]
+
+        # A retried job starts from scratch: drop rows a previous attempt left behind
+        previous_ids = [answer_id for work in batch for answer_id in work.previous_answer_ids]
+        if previous_ids:
+            await self.repository.delete_grading_results(previous_ids)
+            await self.repository.delete_answers(upload_ids)
+
+        # One multi-row insert per table for every upload in the batch
+        stored_answers = await self.repository.create_answers(
+            [row for work in batch for row in work.answer_rows]
+        )
+        answer_ids = {(answer["upload_id"], answer["question_id"]): answer["id"] for answer in stored_answers}
+
+        grading_rows = []
+        for work in batch:
+            for i, result in zip(work.graded_rows, work.results):
+                grading_rows.append({
+                    "question_id": work.answer_rows[i]["question_id"],
+                    "student_id": work.upload["student_id"],
+                    "exam_id": work.upload["exam_id"],
+                    "student_answer_id": answer_ids[(work.upload_id, work.answer_rows[i]["question_id"])],
+                    "ai_assigned_marks": result.marks_obtained,
+                    "final_marks": result.marks_obtained,
+                    "ai_feedback": result.feedback,
+                    "ai_confidence": result.confidence_score,
+                    "similarity_score": result.similarity_score,
+                    "grading_criteria_met": {
+                        "decided_by": result.decided_by,
+                        "keywords_found": result.keywords_found or []
+                    },
+                    "is_reviewed_by_teacher": False
+                })
+        await self.repository.create_grading_results(grading_rows)
+
+        # Marked processed only once answers and grades are stored
+        for work in batch:
+            update_data = {
+                "processing_status": "processed" if work.extraction.answers else "failed",
+                "ocr_extracted_text": work.extraction.display_text(),
+                "confidence_score": work.extraction.confidence(),
+                "ocr_pages": work.extraction.page_methods(),
+                "processed_at": "now()"
+            }
+            if not work.extraction.answers:
+                update_data["error_message"] = "No text extracted"
+            await self.repository.update_upload(work.upload_id, update_data)
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-stage throughput and queue depth, plus end-to-end latency"""
+        latencies = sorted(self._latencies)
+        return {
+            **self._stats,
+            "in_flight": self._stats["submitted"] - self._stats["completed"] - self._stats["failed"],
+            "latency_s_p50": round(latencies[len(latencies) // 2], 2) if latencies else None,
+            "latency_s_p95": round(latencies[int(len(latencies) * 0.95)], 2) if latencies else None,
+            "stages": {stage.name: stage.stats() for stage in self.stages},
+        }
+
+    def shutdown(self):
+        for stage in self.stages:
+            stage.stop()
+
+
+upload_pipeline = UploadPipeline()
@@ -0,0 +1,304 @@
+# app/services/scoring_engine.py
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+import re
+import numpy as np
+from app.schema.grading import QuestionResult
+from app.services.keyword_matcher import get_keyword_matcher
+from app.utils.embedding_codec import text_fingerprint
+
+# Similarity band lower edges and the share of marks each band earns
+SIMILARITY_BANDS = np.array([0.3, 0.5, 0.7, 0.9])
+BAND_RATIOS = np.array([0.2, 0.4, 0.6, 0.8, 1.0])
+BAND_FEEDBACK = [
+    "Answer needs significant improvement",
+    "Basic understanding shown, needs improvement",
+    "Partial answer, missing key points",
+    "Good answer with minor gaps",
+    "Excellent answer",
+]
+KEYWORD_FEEDBACK = [" - Missing important key terms", " - Contains some key terms", " - Contains most key terms"]
+
+NUMBER_PATTERN = re.compile(r'-?\d+\.?\d*')
+# "B", "(b)", "C.", "option d", "a) mitochondria" -- but not "a cell"
+MCQ_OPTION_PATTERN = re.compile(r"^(?:(?:option|answer)\s*[:\-]?\s*)?\(?([a-h])\s*(?:[).:]\s*.*)?$", re.S)
+
+# Grading tiers, cheapest first; only "embedding" needs the model
+TIER_EMPTY = "empty"
+TIER_EXACT = "exact"
+TIER_MCQ_OPTION = "mcq_option"
+TIER_NUMERIC = "numeric"
+TIER_EMBEDDING = "embedding"
+NUMERIC_FEEDBACK = {1.0: "Correct answer", 0.9: "Very close to the expected value", 0.7: "Close to the expected value"}
+
+
+def extract_numbers(text: str) -> List[float]:
+    """Extract numbers from text"""
+    numbers = []
+    for match in NUMBER_PATTERN.findall(text or ""):
+        try:
+            numbers.append(float(match))
+        except ValueError:
+            continue
+    return numbers
+
+
+def collapse_whitespace(text: str) -> str:
+    """The answer text every grading tier sees: runs of whitespace become one space"""
+    return " ".join((text or "").split())
+
+
+def normalize_answer(text: str) -> str:
+    """Whitespace- and case-insensitive form used to compare answers
+
+    Grading rules own this rather than sharing the embedding cache's key
+    normalization, so cache settings can never change a grade.
+    """
+    return collapse_whitespace(text).lower()
+
+
+def answer_key(text: str) -> str:
+    """Hash of the text the grading tiers see
+
+    Case is kept: keyword matching ignores it, but a cased embedding model
+    does not. Answers with equal keys are graded from identical text, so
+    they receive the same grade.
+    """
+    return text_fingerprint(collapse_whitespace(text))
+
+
+def mcq_option(text: str) -> Optional[str]:
+    """Option letter an MCQ answer refers to, if it names one"""
+    match = MCQ_OPTION_PATTERN.match((text or "").strip().lower())
+    return match.group(1) if match else None
+
+
+class ScoringEngine:
+    """Turns similarity scores into marks, feedback and confidence for a whole batch at once
+
+    Answers are addressed by an index into a list of distinct questions, so a
+    full exam (every student x every question) is scored with array operations
+    instead of one Python call per answer. `cascade` settles whatever cheap
+    rules can decide before any embeddings are computed.
+    """
+
+    def __init__(self):
+        self._tiers = Counter()
+        self._submitted = 0  # answers before identical ones are merged
+
+    def cascade(
+        self,
+        questions: List[Dict[str, Any]],
+        question_index: np.ndarray,
+        student_answers: List[str]
+    ) -> List[Optional[QuestionResult]]:
+        """Results for answers decided without the model; None where embedding similarity is needed
+
+        Tiers: empty answer -> exact match with the model answer (after
+        whitespace/case normalization) -> MCQ option letter -> numeric tolerance.
+        """
+        question_index = np.asarray(question_index, dtype=np.int64)
+        types = [question.get("type", "descriptive") for question in questions]
+        model_answers = [question.get("model_answer", "") or "" for question in questions]
+        normalized_models = [normalize_answer(answer) for answer in model_answers]
+        model_options = [mcq_option(answer) if kind == "mcq" else None for kind, answer in zip(types, model_answers)]
+
+        results: List[Optional[QuestionResult]] = [None] * len(student_answers)
+        exact, numeric = [], []
+        for i, student_answer in enumerate(student_answers):
+            q = question_index[i]
+            question = questions[q]
+            if not student_answer.strip():
+                results[i] = self._rule_result(question, student_answer, 0.0, "No answer provided", TIER_EMPTY, [])
+            elif normalized_models[q] and normalize_answer(student_answer) == normalized_models[q]:
+                exact.append(i)
+            elif model_options[q] and mcq_option(student_answer):
+                correct = mcq_option(student_answer) == model_options[q]
+                results[i] = self._rule_result(
+                    question, student_answer, 1.0 if correct else 0.0,
+                    "Correct" if correct else "Incorrect", TIER_MCQ_OPTION
+                )
+            elif types[q] == "numerical" and extract_numbers(model_answers[q]) and extract_numbers(student_answer):
+                numeric.append(i)
+
+        if exact:
+            # Identical text embeds identically, so similarity is 1 by definition
+            exact_results = self.score(
+                questions, question_index[exact], [student_answers[i] for i in exact],
+                np.ones(len(exact)), decided_by=TIER_EXACT
+            )
+            for i, result in zip(exact, exact_results):
+                results[i] = result
+
+        if numeric:
+            numeric_answers = [student_answers[i] for i in numeric]
+            ratios = self.numerical_ratios(questions, question_index[numeric], numeric_answers, np.zeros(len(numeric)))
+            for i, ratio in zip(numeric, ratios):
+                results[i] = self._rule_result(
+                    questions[question_index[i]], student_answers[i], float(ratio),
+                    NUMERIC_FEEDBACK.get(float(ratio), "Incorrect value"), TIER_NUMERIC
+                )
+
+        self._tiers.update(
+            result.decided_by for result in results
+            if result is not None and result.decided_by != TIER_EXACT  # counted by score()
+        )
+        return results
+
+    def _rule_result(
+        self,
+        question: Dict[str, Any],
+        student_answer: str,
+        ratio: float,
+        feedback: str,
+        decided_by: str,
+        keywords_found: List[str] = None
+    ) -> QuestionResult:
+        if keywords_found is None:
+            keywords_found = get_keyword_matcher(question.get("keywords") or []).match(student_answer)
+        return QuestionResult(
+            question_number=question.get("question_number", 0),
+            extracted_answer=student_answer,
+            marks_obtained=round(question.get("marks", 0) * ratio, 2),
+            max_marks=question.get("marks", 0),
+            feedback=feedback,
+            # Rules are deterministic; there is no similarity to report
+            confidence_score=1.0,
+            similarity_score=0.0 if decided_by == TIER_EMPTY else None,
+            keywords_found=keywords_found,
+            decided_by=decided_by
+        )
+
+    def similarities(
+        self,
+        model_embeddings: np.ndarray,
+        student_embeddings: np.ndarray,
+        question_index: np.ndarray
+    ) -> np.ndarray:
+        """Cosine similarity of every answer with its question's model answer (rows are unit vectors)"""
+        if len(question_index) == 0:
+            return np.zeros(0, dtype=np.float32)
+        return np.einsum("ij,ij->i", model_embeddings[question_index], student_embeddings)
+
+    def score(
+        self,
+        questions: List[Dict[str, Any]],
+        question_index: np.ndarray,
+        student_answers: List[str],
+        similarities: np.ndarray,
+        decided_by: str = TIER_EMBEDDING
+    ) -> List[QuestionResult]:
+        """Score answers; student_answers[i] answers questions[question_index[i]]"""
+        question_index = np.asarray(question_index, dtype=np.int64)
+        # float64 so confidence and marks match the scalar formulas exactly
+        similarity = np.asarray(similarities, dtype=np.float64)
+
+        max_marks = np.array([question.get("marks", 0) for question in questions], dtype=np.float64)
+        is_numerical = np.array([question.get("type", "descriptive") == "numerical" for question in questions], dtype=bool)
+        is_mcq = np.array([question.get("type", "descriptive") == "mcq" for question in questions], dtype=bool)
+
+        # Base scoring based on similarity
+        bands = np.digitize(similarity, SIMILARITY_BANDS)
+        ratios = BAND_RATIOS[bands]
+
+        # Adjust for keywords
+        keyword_scores, keywords_found = self.keyword_scores(questions, question_index, student_answers)
+        has_keywords = ~np.isnan(keyword_scores)
+        ratios = np.where(has_keywords, ratios * 0.7 + np.nan_to_num(keyword_scores) * 0.3, ratios)
+        keyword_levels = np.select([keyword_scores > 0.8, keyword_scores > 0.5], [2, 1], 0)
+
+        # Question type adjustments
+        numerical = is_numerical[question_index]
+        if numerical.any():
+            ratios = np.where(numerical, self.numerical_ratios(questions, question_index, student_answers, ratios), ratios)
+        mcq = is_mcq[question_index]
+        ratios = np.where(mcq, (similarity > 0.8).astype(np.float64), ratios)
+
+        marks = max_marks[question_index] * ratios
+        confidence = np.clip(similarity + 0.1, 0.1, 0.9)
+
+        results = []
+        for i, student_answer in enumerate(student_answers):
+            question = questions[question_index[i]]
+            if mcq[i]:
+                feedback = "Correct" if ratios[i] == 1.0 else "Incorrect"
+            else:
+                feedback = BAND_FEEDBACK[bands[i]]
+                if has_keywords[i]:
+                    feedback += KEYWORD_FEEDBACK[keyword_levels[i]]
+            results.append(QuestionResult(
+                question_number=question.get("question_number", 0),
+                extracted_answer=student_answer,
+                marks_obtained=round(float(marks[i]), 2),
+                max_marks=question.get("marks", 0),
+                feedback=feedback,
+                confidence_score=round(float(confidence[i]), 2),
+                similarity_score=round(float(similarity[i]), 4),
+                keywords_found=keywords_found[i],
+                decided_by=decided_by
+            ))
+        self._tiers[decided_by] += len(results)
+        return results
+
+    def keyword_scores(
+        self,
+        questions: List[Dict[str, Any]],
+        question_index: np.ndarray,
+        student_answers: List[str]
+    ) -> Tuple[np.ndarray, List[List[str]]]:
+        """Fraction of each question's keywords found in the answer (NaN where the question has none)
+        and the keywords themselves, from one automaton pass per answer"""
+        matchers = [get_keyword_matcher(question.get("keywords") or []) for question in questions]
+        scores = np.full(len(student_answers), np.nan)
+        found = []
+        for i, student_answer in enumerate(student_answers):
+            matcher = matchers[question_index[i]]
+            found.append(matcher.match(student_answer))
+            if matcher.keywords:
+                scores[i] = matcher.score(found[-1])
+        return scores, found
+
+    def numerical_ratios(
+        self,
+        questions: List[Dict[str, Any]],
+        question_index: np.ndarray,
+        student_answers: List[str],
+        base_ratios: np.ndarray
+    ) -> np.ndarray:
+        """Tolerance-based ratios on the last number in each answer; base ratio where either side has none"""
+        model_numbers = np.array([self._last_number(question.get("model_answer", "")) for question in questions])
+        student_numbers = np.array([self._last_number(answer) for answer in student_answers])
+        expected = model_numbers[question_index]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            difference = np.abs(student_numbers - expected) / np.abs(expected)
+        tolerance_ratios = np.select(
+            [difference <= 0.01, difference <= 0.05, difference <= 0.1], [1.0, 0.9, 0.7], 0.3
+        )
+        exact_ratios = (student_numbers == expected).astype(np.float64)
+        ratios = np.where(expected != 0, tolerance_ratios, exact_ratios)
+        return np.where(np.isnan(student_numbers) | np.isnan(expected), base_ratios, ratios)
+
+    @staticmethod
+    def _last_number(text: str) -> float:
+        numbers = extract_numbers(text)
+        return numbers[-1] if numbers else np.nan
+
+    def record_submitted(self, count: int):
+        """Count answers submitted for grading, before identical ones are merged"""
+        self._submitted += count
+
+    def stats(self) -> Dict[str, Any]:
+        """Answers decided per tier and the share that never needed the model"""
+        total = sum(self._tiers.values())
+        return {
+            "decided_by": dict(self._tiers),
+            "answers": total,
+            # Across the pipeline, per-upload and exam-wide grading alike
+            "submitted_answers": self._submitted,
+            "dedup_ratio": round(1 - total / self._submitted, 4) if self._submitted else 0.0,
+            "model_free_ratio": round(1 - self._tiers[TIER_EMBEDDING] / total, 4) if total else 0.0,
+        }
+
+
+scoring_engine = ScoringEngine()
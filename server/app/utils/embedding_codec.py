@@ -0,0 +1,35 @@
+# app/utils/embedding_codec.py
+from typing import Any, Dict, Optional
+import base64
+import hashlib
+import numpy as np
+
+def text_fingerprint(text: str) -> str:
+    """Short stable hash used to detect that the embedded text has changed"""
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()[:16]
+
+def pack_embedding(vector: np.ndarray, model_name: str, source_text: str, dtype: str = "float16") -> Dict[str, Any]:
+    """Serialize an embedding to a compact JSON-friendly record"""
+    array = np.asarray(vector, dtype=np.dtype(dtype).newbyteorder("<"))
+    return {
+        "model": model_name,
+        "text_hash": text_fingerprint(source_text),
+        "dtype": dtype,
+        "dim": int(array.shape[0]),
+        "vector": base64.b64encode(array.tobytes()).decode("ascii")
+    }
+
+def unpack_embedding(record: Optional[Dict[str, Any]], model_name: str, source_text: str) -> Optional[np.ndarray]:
+    """Decode a stored embedding, or None if it is missing or stale for this model/text"""
+    if not record or not isinstance(record, dict):
+        return None
+    if record.get("model") != model_name or record.get("text_hash") != text_fingerprint(source_text):
+        return None
+    try:
+        dtype = np.dtype(record["dtype"]).newbyteorder("<")
+        vector = np.frombuffer(base64.b64decode(record["vector"]), dtype=dtype)
+    except (KeyError, TypeError, ValueError):
+        return None
+    if vector.shape[0] != record.get("dim"):
+        return None
+    return vector.astype(np.float32)
@@ -20,3 +20,6 @@ class ProcessingError(HTTPException):
     def __init__(self, detail: str = "Processing failed"):
         super().__init__(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=detail)
 
+class ServiceBusyError(HTTPException):
+    def __init__(self, detail: str = "Service is busy, please retry later"):
+        super().__init__(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=detail)
@@ -0,0 +1,191 @@
+# app/worker.py
+"""Background job worker: python -m app.worker
+
+Runs JOB_WORKER_PROCESSES processes, each executing up to
+JOB_WORKER_CONCURRENCY jobs from the durable job queue at a time. The API
+process only enqueues; uploads and grading survive API restarts, and jobs
+left running by a crashed worker are picked up again once their lease expires.
+"""
+import asyncio
+import multiprocessing
+import os
+import signal
+import socket
+import time
+import traceback
+from app.core.config import settings
+from app.services.job_queue import (
+    JOB_GRADE_EXAM,
+    JOB_GRADE_UPLOAD,
+    JOB_PROCESS_UPLOAD,
+    Job,
+    JobQueue,
+)
+
+PURGE_INTERVAL_SECONDS = 3600
+
+
+def _handlers():
+    # Imported in the worker process so the parent does not load models or routers
+    from app.routers.upload import process_upload_async
+    from app.routers.grading import grade_upload_async, grade_exam_async
+
+    return {
+        JOB_PROCESS_UPLOAD: lambda payload: process_upload_async(
+            payload["upload_id"], payload["file_path"], payload["file_extension"]
+        ),
+        JOB_GRADE_UPLOAD: lambda payload: grade_upload_async(payload["upload_id"]),
+        JOB_GRADE_EXAM: lambda payload: grade_exam_async(payload["exam_id"]),
+    }
+
+
+class Worker:
+    """Claims jobs and runs them with bounded concurrency in one process"""
+
+    def __init__(self, queue: JobQueue = None, concurrency: int = None):
+        self.queue = queue or JobQueue()
+        self.concurrency = concurrency or settings.JOB_WORKER_CONCURRENCY
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.handlers = _handlers()
+        self._stopping = asyncio.Event()
+
+    def stop(self):
+        self._stopping.set()
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        slots = asyncio.Semaphore(self.concurrency)
+        running = set()
+        next_purge = 0.0
+        reporter = asyncio.create_task(self._report_stats())
+        print(f"Worker {self.worker_id} started with concurrency {self.concurrency}")
+
+        while not self._stopping.is_set():
+            if time.time() >= next_purge:
+                await loop.run_in_executor(None, self.queue.purge_finished, settings.JOB_RETENTION_HOURS * 3600)
+                next_purge = time.time() + PURGE_INTERVAL_SECONDS
+
+            await slots.acquire()
+            # stop() may have been called while every slot was busy
+            if self._stopping.is_set():
+                slots.release()
+                break
+            job = await loop.run_in_executor(None, self.queue.claim, self.worker_id, list(self.handlers))
+            if job is None:
+                slots.release()
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), settings.JOB_POLL_INTERVAL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            task = asyncio.create_task(self._run_job(job))
+            running.add(task)
+            task.add_done_callback(running.discard)
+            task.add_done_callback(lambda _: slots.release())
+
+        # Let in-flight jobs finish; anything cut short is retried after its lease expires
+        if running:
+            print(f"Worker {self.worker_id} waiting for {len(running)} running jobs")
+            await asyncio.gather(*running, return_exceptions=True)
+        reporter.cancel()
+        print(f"Worker {self.worker_id} stopped")
+
+    async def _run_job(self, job: Job):
+        loop = asyncio.get_running_loop()
+        work = asyncio.ensure_future(self.handlers[job.kind](job.payload))
+        lease_lost = asyncio.Event()
+        heartbeat = asyncio.create_task(self._heartbeat(job, work, lease_lost))
+        started_at = time.perf_counter()
+        try:
+            await work
+        except asyncio.CancelledError:
+            if not lease_lost.is_set():
+                raise
+            # Another worker may own the job now; leave its status to that worker
+            print(f"Job {job.id} ({job.kind}) cancelled after losing its lease")
+        except Exception as e:
+            traceback.print_exc()
+            await loop.run_in_executor(None, self.queue.fail, job, f"{type(e).__name__}: {str(e)}")
+            print(f"Job {job.id} ({job.kind}) failed on attempt {job.attempts}: {str(e)}")
+        else:
+            await loop.run_in_executor(None, self.queue.complete, job)
+            print(f"Job {job.id} ({job.kind}) done in {time.perf_counter() - started_at:.1f}s")
+        finally:
+            heartbeat.cancel()
+
+    async def _report_stats(self):
+        from app.database.async_db import db
+        from app.database.batch_writer import batch_writer
+        from app.repositories.base import get_repository
+        from app.services.embedding_batcher import embedding_batcher
+        from app.services.embedding_cache import embedding_cache
+        from app.services.metadata_cache import metadata_cache
+        from app.services.ocr_executor import ocr_executor
+        from app.services.pipeline import upload_pipeline
+        from app.services.scoring_engine import scoring_engine
+
+        loop = asyncio.get_running_loop()
+        while True:
+            stats = {
+                "pipeline": upload_pipeline.stats(),
+                "ocr_executor": ocr_executor.stats(),
+                "embedding_batcher": embedding_batcher.stats(),
+                "embedding_cache": embedding_cache.stats(),
+                "metadata_cache": metadata_cache.stats(),
+                "scoring_engine": scoring_engine.stats(),
+                "batch_writer": batch_writer.stats(),
+                "db": db.stats(),
+                "repository": get_repository().stats(),
+            }
+            try:
+                await loop.run_in_executor(None, self.queue.report_worker_stats, self.worker_id, stats)
+            except Exception as e:
+                print(f"Could not publish worker stats: {str(e)}")
+            await asyncio.sleep(settings.JOB_WORKER_STATS_SECONDS)
+
+    async def _heartbeat(self, job: Job, work: asyncio.Future, lease_lost: asyncio.Event):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.queue.lease_seconds / 3)
+            if not await loop.run_in_executor(None, self.queue.heartbeat, job):
+                # The job can be claimed again; cancelling stops its pipeline stages from
+                # starting further writes, though a write already in flight still completes
+                print(f"Lost the lease on job {job.id} ({job.kind})")
+                lease_lost.set()
+                work.cancel()
+                return
+
+
+def run_worker_process():
+    worker = Worker()
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, worker.stop)
+        await worker.run()
+        from app.repositories.base import get_repository
+        await get_repository().close()
+
+    asyncio.run(main())
+
+
+def main():
+    if settings.JOB_WORKER_PROCESSES <= 1:
+        run_worker_process()
+        return
+
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=run_worker_process) for _ in range(settings.JOB_WORKER_PROCESSES)]
+    for process in processes:
+        process.start()
+    # Children receive SIGINT/SIGTERM from the process group and drain on their own
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda *_: [process.terminate() for process in processes if process.is_alive()])
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
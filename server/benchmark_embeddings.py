@@ -0,0 +1,221 @@
+# benchmark_embeddings.py
+"""Export, validate and benchmark the ONNX embedding backend.
+
+    python benchmark_embeddings.py export      # write model.onnx, model.int8.onnx and tokenizer.json
+    python benchmark_embeddings.py parity      # compare ONNX similarity scores with PyTorch
+    python benchmark_embeddings.py benchmark   # latency, throughput and peak RSS per backend
+
+Set EMBEDDING_BACKEND=onnx in .env once parity passes.
+"""
+import argparse
+import inspect
+import json
+import multiprocessing
+import resource
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.embedding_backends import (
+    ONNX_MODEL_FILE,
+    ONNX_QUANTIZED_MODEL_FILE,
+    OnnxEmbeddingBackend,
+    SentenceTransformerBackend,
+)
+
+# Same similarity bands AIGradingService uses to award marks
+SCORE_BANDS = [0.3, 0.5, 0.7, 0.9]
+
+SAMPLE_PAIRS = [
+    ("Photosynthesis converts light energy into chemical energy stored in glucose.",
+     "Plants use sunlight to make glucose, storing the energy chemically."),
+    ("Photosynthesis converts light energy into chemical energy stored in glucose.",
+     "It is when animals breathe in oxygen."),
+    ("The mitochondria is the powerhouse of the cell and produces ATP.",
+     "mitochondria make ATP"),
+    ("Newton's second law states that force equals mass times acceleration.",
+     "F = ma, force is mass multiplied by acceleration"),
+    ("Newton's second law states that force equals mass times acceleration.",
+     "Every action has an equal and opposite reaction."),
+    ("A stack is a last-in first-out data structure.",
+     "LIFO structure where the last element pushed is the first popped"),
+    ("A stack is a last-in first-out data structure.",
+     "A queue processes elements in first-in first-out order."),
+    ("The French Revolution began in 1789 and ended the absolute monarchy.",
+     "It started in 1789 and overthrew the king's absolute power"),
+    ("B", "B"),
+    ("B", "C"),
+    ("Osmosis is the diffusion of water across a semi-permeable membrane from low to high solute concentration.",
+     "water moves through a membrane"),
+    ("The derivative of x squared is 2x.", "2x"),
+]
+
+BACKENDS = ["torch", "onnx-fp32", "onnx-int8"]
+
+
+def make_backend(kind: str):
+    if kind == "torch":
+        return SentenceTransformerBackend(settings.EMBEDDING_MODEL_NAME)
+    return OnnxEmbeddingBackend(
+        settings.EMBEDDING_ONNX_DIR,
+        quantized=kind == "onnx-int8",
+        num_threads=settings.EMBEDDING_ONNX_THREADS
+    )
+
+
+def pair_similarities(backend, pairs) -> np.ndarray:
+    model_embeddings = backend.encode([model for model, _ in pairs], normalize_embeddings=True)
+    student_embeddings = backend.encode([student for _, student in pairs], normalize_embeddings=True)
+    return np.einsum("ij,ij->i", model_embeddings, student_embeddings)
+
+
+def load_pairs(path: str):
+    if not path:
+        return SAMPLE_PAIRS
+    with open(path, "r", encoding="utf-8") as f:
+        return [(row["model_answer"], row["student_answer"]) for row in map(json.loads, f) if row]
+
+
+def export(args):
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    out_dir = Path(settings.EMBEDDING_ONNX_DIR)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    model = SentenceTransformer(settings.EMBEDDING_MODEL_NAME, device="cpu")
+    transformer = model[0].auto_model.eval()
+    tokenizer = model.tokenizer
+
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+
+    class TokenEmbeddings(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.transformer = transformer
+
+        def forward(self, *inputs):
+            return self.transformer(**dict(zip(input_names, inputs))).last_hidden_state
+
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names + ["last_hidden_state"]}
+    # Newer torch defaults to the dynamo exporter, which does not take dynamic_axes
+    exporter_options = {"dynamo": False} if "dynamo" in inspect.signature(torch.onnx.export).parameters else {}
+    with torch.no_grad():
+        torch.onnx.export(
+            TokenEmbeddings(),
+            tuple(sample[name] for name in input_names),
+            str(out_dir / ONNX_MODEL_FILE),
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=args.opset,
+            **exporter_options
+        )
+    tokenizer.save_pretrained(str(out_dir))
+
+    quantize_dynamic(
+        str(out_dir / ONNX_MODEL_FILE),
+        str(out_dir / ONNX_QUANTIZED_MODEL_FILE),
+        weight_type=QuantType.QInt8
+    )
+    print(f"Exported {settings.EMBEDDING_MODEL_NAME} to {out_dir}")
+
+
+def parity(args):
+    pairs = load_pairs(args.pairs)
+    reference = pair_similarities(make_backend("torch"), pairs)
+    reference_bands = np.digitize(reference, SCORE_BANDS)
+
+    failed = False
+    for kind in ("onnx-fp32", "onnx-int8"):
+        scores = pair_similarities(make_backend(kind), pairs)
+        diff = np.abs(scores - reference)
+        band_agreement = float(np.mean(np.digitize(scores, SCORE_BANDS) == reference_bands))
+        ok = diff.max() <= args.tolerance
+        failed = failed or not ok
+        print(
+            f"{kind:10s} max|diff|={diff.max():.4f} mean|diff|={diff.mean():.4f} "
+            f"band agreement={band_agreement:.1%} -> {'PASS' if ok else 'FAIL'}"
+        )
+    if failed:
+        raise SystemExit(1)
+
+
+def _benchmark_backend(kind: str, runs: int, batch_size: int, queue):
+    texts = [student for _, student in SAMPLE_PAIRS]
+    started_at = time.perf_counter()
+    backend = make_backend(kind)
+    load_seconds = time.perf_counter() - started_at
+    backend.encode(texts[:2])  # warm up
+
+    latencies = []
+    for i in range(runs):
+        started_at = time.perf_counter()
+        backend.encode([texts[i % len(texts)]], batch_size=1)
+        latencies.append(time.perf_counter() - started_at)
+
+    batch = (texts * (batch_size // len(texts) + 1))[:batch_size]
+    started_at = time.perf_counter()
+    for _ in range(max(1, runs // 10)):
+        backend.encode(batch, batch_size=batch_size)
+    elapsed = time.perf_counter() - started_at
+
+    queue.put({
+        "backend": kind,
+        "load_s": load_seconds,
+        "p50_ms": float(np.percentile(latencies, 50)) * 1000,
+        "p95_ms": float(np.percentile(latencies, 95)) * 1000,
+        "texts_per_s": batch_size * max(1, runs // 10) / elapsed,
+        # ru_maxrss is reported in kilobytes on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    })
+
+
+def benchmark(args):
+    context = multiprocessing.get_context("spawn")
+    print(f"{'backend':10s} {'load s':>7s} {'p50 ms':>7s} {'p95 ms':>7s} {'texts/s':>9s} {'RSS MB':>7s}")
+    for kind in args.backends:
+        # Fresh process per backend so peak RSS is not polluted by the others
+        queue = context.Queue()
+        process = context.Process(target=_benchmark_backend, args=(kind, args.runs, args.batch_size, queue))
+        process.start()
+        process.join()
+        if process.exitcode != 0:
+            print(f"{kind:10s} failed (exit code {process.exitcode})")
+            continue
+        row = queue.get()
+        print(
+            f"{row['backend']:10s} {row['load_s']:7.2f} {row['p50_ms']:7.2f} {row['p95_ms']:7.2f} "
+            f"{row['texts_per_s']:9.1f} {row['peak_rss_mb']:7.1f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="export the PyTorch model to ONNX and quantize it")
+    export_parser.add_argument("--opset", type=int, default=14)
+    export_parser.set_defaults(func=export)
+
+    parity_parser = subparsers.add_parser("parity", help="compare ONNX scores against PyTorch")
+    parity_parser.add_argument("--pairs", help="JSONL file of {model_answer, student_answer} rows")
+    parity_parser.add_argument("--tolerance", type=float, default=0.02, help="max allowed |score difference|")
+    parity_parser.set_defaults(func=parity)
+
+    benchmark_parser = subparsers.add_parser("benchmark", help="latency, throughput and RSS per backend")
+    benchmark_parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=BACKENDS)
+    benchmark_parser.add_argument("--runs", type=int, default=200)
+    benchmark_parser.add_argument("--batch-size", type=int, default=64)
+    benchmark_parser.set_defaults(func=benchmark)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
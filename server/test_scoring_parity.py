@@ -0,0 +1,125 @@
+"""The vectorized ScoringEngine must grade exactly like the per-answer scoring it replaced.
+
+Scores thousands of random answers (descriptive, numerical and MCQ questions,
+with and without keywords, similarities on and around every band edge) both
+ways and compares marks, feedback, confidence and similarity. No model is
+needed:
+
+    python test_scoring_parity.py   (or: python -m pytest test_scoring_parity.py)
+"""
+import random
+import re
+import numpy as np
+from app.services.scoring_engine import ScoringEngine
+
+CASES = 5000
+WORDS = ["cell", "cells", "membrane", "energy", "mitochondria", "force", "mass", "velocity", "the", "is", "of", "Photosynthesis"]
+EDGES = [0.3, 0.5, 0.7, 0.8, 0.9]
+
+
+# The per-answer scoring ScoringEngine replaced, kept as the reference
+def legacy_marks(question_data, student_answer, model_answer, similarity_score):
+    max_marks = question_data.get("marks", 0)
+    question_type = question_data.get("type", "descriptive")
+    keywords = question_data.get("keywords", [])
+
+    if similarity_score >= 0.9:
+        marks_ratio, feedback = 1.0, "Excellent answer"
+    elif similarity_score >= 0.7:
+        marks_ratio, feedback = 0.8, "Good answer with minor gaps"
+    elif similarity_score >= 0.5:
+        marks_ratio, feedback = 0.6, "Partial answer, missing key points"
+    elif similarity_score >= 0.3:
+        marks_ratio, feedback = 0.4, "Basic understanding shown, needs improvement"
+    else:
+        marks_ratio, feedback = 0.2, "Answer needs significant improvement"
+
+    if keywords:
+        student_answer_lower = student_answer.lower()
+        keyword_score = sum(1 for keyword in keywords if keyword.lower() in student_answer_lower) / len(keywords)
+        marks_ratio = (marks_ratio * 0.7) + (keyword_score * 0.3)
+        if keyword_score > 0.8:
+            feedback += " - Contains most key terms"
+        elif keyword_score > 0.5:
+            feedback += " - Contains some key terms"
+        else:
+            feedback += " - Missing important key terms"
+
+    if question_type == "numerical":
+        marks_ratio = legacy_numerical(student_answer, model_answer, marks_ratio)
+    elif question_type == "mcq":
+        marks_ratio = 1.0 if similarity_score > 0.8 else 0.0
+        feedback = "Correct" if marks_ratio == 1.0 else "Incorrect"
+
+    marks_obtained = max_marks * marks_ratio
+    confidence = max(0.1, min(0.9, similarity_score + 0.1))
+    return round(marks_obtained, 2), feedback, round(confidence, 2), round(similarity_score, 4)
+
+
+def legacy_numerical(student_answer, model_answer, base_ratio):
+    student_nums = [float(match) for match in re.findall(r'-?\d+\.?\d*', student_answer)]
+    model_nums = [float(match) for match in re.findall(r'-?\d+\.?\d*', model_answer)]
+    if not student_nums or not model_nums:
+        return base_ratio
+    student_primary, model_primary = student_nums[-1], model_nums[-1]
+    if model_primary != 0:
+        percentage_diff = abs(student_primary - model_primary) / abs(model_primary)
+        if percentage_diff <= 0.01:
+            return 1.0
+        elif percentage_diff <= 0.05:
+            return 0.9
+        elif percentage_diff <= 0.1:
+            return 0.7
+        return 0.3
+    return 1.0 if student_primary == model_primary else 0.0
+
+
+def random_text(rng: random.Random, with_number: bool) -> str:
+    words = rng.choices(WORDS, k=rng.randint(1, 8))
+    if with_number:
+        value = rng.choice([0, 0.0, rng.uniform(-100, 100), rng.randint(-50, 50)])
+        words.insert(rng.randint(0, len(words)), str(round(value, rng.randint(0, 3))))
+    return " ".join(words)
+
+
+def random_cases(seed: int, count: int):
+    rng = random.Random(seed)
+    questions, question_index, answers, similarities = [], [], [], []
+    for number in range(1, count // 10 + 1):
+        question_type = rng.choice(["descriptive", "numerical", "mcq"])
+        questions.append({
+            "question_number": number,
+            "type": question_type,
+            "marks": rng.choice([1, 2, 5, 7.5, 10]),
+            "model_answer": random_text(rng, question_type == "numerical" and rng.random() < 0.9),
+            "keywords": rng.sample(WORDS, rng.randint(0, 4)) if rng.random() < 0.7 else []
+        })
+    for _ in range(count):
+        q = rng.randrange(len(questions))
+        question_index.append(q)
+        answers.append(random_text(rng, questions[q]["type"] == "numerical" and rng.random() < 0.8))
+        # Similarities come out of the model as float32: band edges and their float32 neighbours, or anything
+        edge = np.float32(rng.choice(EDGES))
+        similarities.append(rng.choice([
+            edge, np.nextafter(edge, np.float32(0)), np.nextafter(edge, np.float32(1)), np.float32(rng.uniform(-0.2, 1.0))
+        ]))
+    return questions, np.array(question_index), answers, np.array(similarities, dtype=np.float32)
+
+
+def test_scoring_engine_matches_per_answer_scoring():
+    questions, question_index, answers, similarities = random_cases(seed=12, count=CASES)
+    results = ScoringEngine().score(questions, question_index, answers, similarities)
+
+    mismatches = []
+    for i, result in enumerate(results):
+        question = questions[question_index[i]]
+        expected = legacy_marks(question, answers[i], question["model_answer"], float(similarities[i]))
+        actual = (result.marks_obtained, result.feedback, result.confidence_score, result.similarity_score)
+        if actual != expected:
+            mismatches.append((question, answers[i], float(similarities[i]), expected, actual))
+    assert not mismatches, f"{len(mismatches)} of {CASES} differ, e.g. {mismatches[0]}"
+
+
+if __name__ == "__main__":
+    test_scoring_engine_matches_per_answer_scoring()
+    print(f"✓ ScoringEngine matches per-answer scoring on {CASES} random answers")
@@ -0,0 +1,212 @@
+"""Database round-trips per upload must not grow with the number of questions.
+
+Runs the upload pipeline against an in-memory stand-in for the Supabase client
+that counts every executed request. No server, database or model is needed:
+
+    python test_upload_roundtrips.py   (or: python -m pytest test_upload_roundtrips.py)
+"""
+import asyncio
+import numpy as np
+from app.repositories import supabase_repository
+from app.schema.ocr import ExtractedAnswer, OCRExtraction, PageExtraction
+from app.services import pipeline
+from app.services.ai_service import AIGradingService
+from app.database.batch_writer import BatchWriter
+from app.services.metadata_cache import MetadataCache
+from app.repositories.supabase_repository import SupabaseRepository
+
+
+# PostgREST's default max-rows
+MAX_ROWS = supabase_repository.PAGE_SIZE
+
+
+class CountingResult:
+    def __init__(self, data):
+        self.data = data
+
+
+class CountingQuery:
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.filters = []
+        self.operation = "select"
+        self.columns = "*"
+        self.payload = None
+        self.offset, self.limit = 0, MAX_ROWS
+
+    def select(self, columns="*"):
+        self.columns = columns
+        return self
+
+    def insert(self, payload):
+        self.operation, self.payload = "insert", payload
+        return self
+
+    def update(self, payload):
+        self.operation, self.payload = "update", payload
+        return self
+
+    def delete(self):
+        self.operation = "delete"
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def in_(self, column, values):
+        values = set(values)
+        self.filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def order(self, *args, **kwargs):
+        return self
+
+    def range(self, start, end):
+        self.offset, self.limit = start, min(end - start + 1, MAX_ROWS)
+        return self
+
+    def execute(self):
+        self.client.round_trips += 1
+        rows = self.client.tables.setdefault(self.table, [])
+        matched = [row for row in rows if all(f(row) for f in self.filters)]
+
+        if self.operation == "insert":
+            payload = self.payload if isinstance(self.payload, list) else [self.payload]
+            for row in payload:
+                row.setdefault("id", f"{self.table}-{len(rows)}")
+                rows.append(row)
+            return CountingResult(payload)
+        if self.operation == "update":
+            for row in matched:
+                row.update(self.payload)
+            return CountingResult(matched)
+        if self.operation == "delete":
+            for row in matched:
+                rows.remove(row)
+            return CountingResult(matched)
+
+        if self.table == "exam_uploads" and "student_answers(" in self.columns:
+            # Embedded resources as PostgREST returns them
+            return CountingResult([
+                {
+                    **row,
+                    "student_answers": [
+                        {"id": a["id"]} for a in self.client.tables.get("student_answers", []) if a["upload_id"] == row["id"]
+                    ],
+                }
+                for row in matched
+            ])
+        # Like PostgREST, a read returns at most MAX_ROWS rows
+        return CountingResult(matched[self.offset:self.offset + self.limit])
+
+
+class CountingClient:
+    def __init__(self, tables):
+        self.tables = tables
+        self.round_trips = 0
+
+    def table(self, name):
+        return CountingQuery(self, name)
+
+
+class FakeOCRService:
+    def __init__(self, question_count):
+        self.question_count = question_count
+
+    async def extract(self, file_path):
+        return OCRExtraction(
+            answers=[
+                ExtractedAnswer(question_number=n, text=f"answer number {n}", confidence=0.9, pages=[1])
+                for n in range(1, self.question_count + 1)
+            ],
+            pages=[PageExtraction(page_number=1, method="text_layer")]
+        )
+
+
+class FakeBatcher:
+    async def encode(self, texts):
+        vectors = np.random.default_rng(0).normal(size=(len(texts), 8)).astype(np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def count_round_trips(question_count: int, attempts: int = 1) -> int:
+    """Round-trips of the last of `attempts` runs over one upload of an exam with question_count questions"""
+    client = CountingClient({
+        "exam_uploads": [{
+            "id": "upload-1", "exam_id": "exam-1", "student_id": "student-1",
+            "file_path": "uploads/sheet.pdf", "processing_status": "uploaded"
+        }],
+        "questions": [
+            {
+                "id": f"question-{n}", "exam_id": "exam-1", "question_number": n, "question_text": f"Q{n}",
+                "question_type": "descriptive", "max_marks": 5, "sample_answer": f"model answer {n}", "keywords": []
+            }
+            for n in range(1, question_count + 1)
+        ],
+    })
+    repository = SupabaseRepository(lambda: client, BatchWriter(lambda: client))
+    upload_pipeline = pipeline.UploadPipeline(
+        ai_service=AIGradingService(batcher=FakeBatcher()),
+        ocr_service=FakeOCRService(question_count),
+        repository=repository,
+        metadata=MetadataCache(repository)
+    )
+    upload_pipeline.ai_service.cache = None  # embed every run instead of hitting the on-disk cache
+
+    async def run():
+        for _ in range(attempts):
+            client.round_trips = 0
+            await upload_pipeline.run("upload-1", "uploads/sheet.pdf", "pdf")
+        upload_pipeline.shutdown()
+
+    asyncio.run(run())
+    assert len(client.tables["student_answers"]) == question_count
+    assert len(client.tables["grading_results"]) == question_count
+    return client.round_trips
+
+
+def test_round_trips_do_not_grow_with_questions():
+    counts = {n: count_round_trips(n) for n in (1, 5, 30, 120)}
+    assert len(set(counts.values())) == 1, counts
+
+
+def test_retried_upload_round_trips_do_not_grow_with_questions():
+    # A retry deletes the earlier attempt's rows by id, IN_CHUNK_SIZE ids per request (they go in the URL)
+    counts = {n: count_round_trips(n, attempts=2) for n in (1, 5, 30, supabase_repository.IN_CHUNK_SIZE)}
+    assert len(set(counts.values())) == 1, counts
+
+
+def test_exam_wide_reads_are_not_truncated():
+    # 500 uploads x 20 questions, all graded: more rows than one page or one `in` chunk returns
+    uploads, questions = 500, 20
+    client = CountingClient({
+        "student_answers": [
+            {"id": f"answer-{u}-{q}", "upload_id": f"upload-{u}", "question_id": f"question-{q}"}
+            for u in range(uploads) for q in range(questions)
+        ],
+        "grading_results": [
+            {"id": f"result-{u}-{q}", "exam_id": "exam-1", "student_answer_id": f"answer-{u}-{q}"}
+            for u in range(uploads) for q in range(questions)
+        ],
+    })
+    repository = SupabaseRepository(lambda: client, BatchWriter(lambda: client))
+
+    async def run():
+        answers = await repository.list_answers([f"upload-{u}" for u in range(uploads)])
+        graded_ids = await repository.list_graded_answer_ids("exam-1")
+        return answers, graded_ids
+
+    answers, graded_ids = asyncio.run(run())
+    assert len(answers) == uploads * questions
+    assert len(graded_ids) == uploads * questions
+
+
+if __name__ == "__main__":
+    for n in (1, 5, 30, 120):
+        print(f"{n:4d} questions: {count_round_trips(n)} round-trips, {count_round_trips(n, attempts=2)} on retry")
+    test_round_trips_do_not_grow_with_questions()
+    test_retried_upload_round_trips_do_not_grow_with_questions()
+    test_exam_wide_reads_are_not_truncated()
+    print("✓ Round-trips per upload are constant")